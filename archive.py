@@ -0,0 +1,341 @@
+""" All-time results archive - every processed series appended to one directory as a columnar store, so career stats
+come from a few memory-mapped arrays instead of re-reading every past season's workbook.
+
+There is one record per season, series, week and driver, kept as one int32 file per column (see COLUMNS) plus
+index.json. The index holds the string tables - season labels, series names, driver names (shared by every season, so
+the same driver is the same id all time) and non-numeric results - and the row range of each archived season and series.
+Archiving a season and series again (e.g. the same season a week later) appends it afresh and points the index at the
+new rows. The old rows are just no longer read until compact rewrites the store.
+
+    python archive.py archive_dir career "Driver Name" --drop-weeks 1
+    python archive.py archive_dir h2h "Driver Name" "Other Driver"
+
+Runs are added by python main.py ... --archive archive_dir (see ChampWorkBook.archive_series)."""
+import argparse
+import array
+import contextlib
+import json
+import mmap
+import os
+import time
+
+import rules
+from scoring import DROPPED_WEEKS, POINTS
+
+# Record columns - season, series and driver are ids into the index's string tables, finish is the numerical position
+# and result the id of a non-numeric raw result (-1 for a plain finishing position)
+COLUMNS = ("season", "series", "week", "driver", "finish", "result")
+
+# Typed array code of every column file
+TYPECODE = "i"
+
+# Bump whenever the layout of the column files or index changes so old archives are never misread
+FORMAT_VERSION = 1
+
+# Numerical position given to any string result (DNF, DNS etc.) - matches Driver.create_print_position
+STRING_POSITION = 1000
+
+# Seconds to wait for another process archiving into the same directory
+LOCK_TIMEOUT = 30
+
+
+class Archive(object):
+    """
+    One archive directory - appends under a lock file so several processes can archive into it, and reads through
+    memory maps of the column files.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open an archive, creating an empty one if the directory has none.
+
+        :param path: archive directory
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.maps = {}
+        self.driver_index = None
+        self.load_index()
+
+    def load_index(self) -> None:
+        """
+        (Re)read index.json - everything written since this archive was opened becomes visible.
+
+        :raises ValueError: for an archive written by a different FORMAT_VERSION
+        """
+        self.close()
+        index_path = os.path.join(self.path, "index.json")
+        index = {"version": FORMAT_VERSION, "rows": 0, "seasons": [], "series": [], "drivers": [], "results": [],
+                 "blocks": []}
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            if index["version"] != FORMAT_VERSION:
+                raise ValueError(self.path + " is an archive format " + str(index["version"]) + " - expected "
+                                 + str(FORMAT_VERSION))
+        self.index = index
+        # string: id for each string table
+        self.ids = {table: {value: i for i, value in enumerate(index[table])}
+                    for table in ("seasons", "series", "drivers", "results")}
+        # (season id, series id): [first row, end row, number of weeks] of every live season and series
+        self.blocks = {(block[0], block[1]): block[2:] for block in index["blocks"]}
+        self.driver_index = None
+
+    def save_index(self) -> None:
+        """
+        Write index.json through a temporary file so a crash never leaves a half written index.
+        """
+        self.index["blocks"] = [list(key) + value for key, value in self.blocks.items()]
+        index_path = os.path.join(self.path, "index.json")
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(self.index, f)
+        os.replace(index_path + ".tmp", index_path)
+
+    def close(self) -> None:
+        """
+        Release the memory maps - reopened on the next read.
+        """
+        for data, view, column in self.maps.values():
+            column.release()
+            view.release()
+            data.close()
+        self.maps = {}
+
+    @contextlib.contextmanager
+    def locked(self):
+        """
+        Hold the archive's lock file for a write and pick up anything other processes wrote first.
+
+        :raises TimeoutError: if the lock is still held after LOCK_TIMEOUT seconds - delete the lock file if no other
+            process is archiving
+        """
+        lock_path = os.path.join(self.path, "lock")
+        give_up = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                if time.monotonic() > give_up:
+                    raise TimeoutError("archive still locked by " + lock_path)
+                time.sleep(0.05)
+        try:
+            self.load_index()
+            yield
+        finally:
+            os.remove(lock_path)
+
+    def intern(self, table: str, value: str) -> int:
+        """
+        :param table: "seasons", "series", "drivers" or "results"
+        :param value: string to look up
+        :return: its id in that table - added to the table if new
+        """
+        value_id = self.ids[table].get(value)
+        if value_id is None:
+            value_id = self.ids[table][value] = len(self.index[table])
+            self.index[table].append(value)
+        return value_id
+
+    def add_series(self, season: str, series_name: str, series) -> None:
+        """
+        Archive one calculated (or loaded) series, replacing anything already archived for that season and series.
+
+        :param season: season label, e.g. "2023"
+        :param series_name: series name, e.g. the raw data sheet name without the prefix
+        :param series: Series with drivers read
+        """
+        with self.locked():
+            season_id = self.intern("seasons", str(season))
+            series_id = self.intern("series", str(series_name))
+            columns = {name: array.array(TYPECODE) for name in COLUMNS}
+            driver_ids = [self.intern("drivers", str(driver.name).strip()) for driver in series.drivers]
+            for week in range(series.get_num_weeks()):
+                for driver, driver_id in zip(series.drivers, driver_ids):
+                    result = driver.all_results[week][1]
+                    columns["season"].append(season_id)
+                    columns["series"].append(series_id)
+                    columns["week"].append(week + 1)
+                    columns["driver"].append(driver_id)
+                    columns["finish"].append(driver.positions[week])
+                    columns["result"].append(-1 if type(result) is int else self.intern("results", str(result)))
+
+            start = self.index["rows"]
+            for name in COLUMNS:
+                self.write_column(name, start, columns[name])
+            self.index["rows"] = start + len(columns["season"])
+            self.blocks[(season_id, series_id)] = [start, self.index["rows"], series.get_num_weeks()]
+            self.save_index()
+        self.close()
+        self.driver_index = None
+
+    def write_column(self, name: str, start: int, values: array.array) -> None:
+        """
+        Write values into a column file from row start on, cutting off anything a failed write left past them.
+
+        :param name: column name
+        :param start: first row to write
+        :param values: typed array of the values
+        """
+        column_path = os.path.join(self.path, name + ".col")
+        with open(column_path, "r+b" if os.path.exists(column_path) else "wb") as f:
+            f.seek(start * values.itemsize)
+            values.tofile(f)
+            f.truncate()
+
+    def column(self, name: str):
+        """
+        :param name: column name
+        :return: read only int view of the column's live rows, memory-mapped from its file
+        """
+        if name not in self.maps:
+            rows = self.index["rows"]
+            if rows == 0:
+                return array.array(TYPECODE)
+            with open(os.path.join(self.path, name + ".col"), "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            view = memoryview(data)
+            self.maps[name] = (data, view, view.cast(TYPECODE)[:rows])
+        return self.maps[name][2]
+
+    def compact(self) -> None:
+        """
+        Rewrite the column files with only the live rows, dropping every replaced season and series.
+        """
+        with self.locked():
+            kept = {name: array.array(TYPECODE) for name in COLUMNS}
+            blocks = {}
+            for key, (start, end, num_weeks) in sorted(self.blocks.items(), key=lambda y: y[1][0]):
+                blocks[key] = [len(kept["season"]), len(kept["season"]) + end - start, num_weeks]
+                for name in COLUMNS:
+                    kept[name].extend(self.column(name)[start:end])
+            self.close()
+            for name in COLUMNS:
+                self.write_column(name, 0, kept[name])
+            self.index["rows"] = len(kept["season"])
+            self.blocks = blocks
+            self.save_index()
+        self.driver_index = None
+
+    def driver_rows(self, name: str) -> dict[tuple[int, int], array.array]:
+        """
+        All-time index lookup - the index is built on first use in one pass over the driver column.
+
+        :param name: driver name (leading and trailing spaces are ignored)
+        :return: dict of (season id, series id): rows of this driver's results in week order, in archive order
+        """
+        if self.driver_index is None:
+            self.driver_index = {}
+            drivers = self.column("driver")
+            for key, (start, end, num_weeks) in sorted(self.blocks.items(), key=lambda y: y[1][0]):
+                for row in range(start, end):
+                    self.driver_index.setdefault(drivers[row], {}).setdefault(key, array.array("q")).append(row)
+        driver_id = self.ids["drivers"].get(str(name).strip())
+        return self.driver_index.get(driver_id, {})
+
+    def raw_result(self, row: int):
+        """
+        :param row: record row
+        :return: the raw result as it was in the raw data sheet - finishing position int or string
+        """
+        result = self.column("result")[row]
+        if result == -1:
+            return self.column("finish")[row]
+        return self.index["results"][result]
+
+    def career(self, name: str, drop_weeks: int = DROPPED_WEEKS, points: dict[int, int] = None,
+               scoring_rules: rules.ScoringRules = None) -> dict:
+        """
+        A driver's all-time record. Points are rescored from the archived results, so any drop weeks or points table
+        can be asked for whatever each season was originally scored with.
+
+        :param name: driver name
+        :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+        :param points: dict of Finish(int): points for that finish(int) - the module POINTS if not given
+        :param scoring_rules: rules.ScoringRules to use instead of drop_weeks and points
+        :return: dict of the all-time totals and a list of the same per season and series
+        """
+        if scoring_rules is None:
+            scoring_rules = rules.ScoringRules(POINTS if points is None else points, drop_weeks)
+        finish = self.column("finish")
+        totals = {"name": str(name).strip(), "races": 0, "starts": 0, "wins": 0, "podiums": 0, "points": 0,
+                  "seasons": []}
+        for (season_id, series_id), rows in self.driver_rows(name).items():
+            week_points = scoring_rules.week_points([self.raw_result(row) for row in rows])
+            num_counted = max(len(rows) - scoring_rules.drop_weeks, 1)
+            finishes = [finish[row] for row in rows]
+            season = {"season": self.index["seasons"][season_id], "series": self.index["series"][series_id],
+                      "races": len(rows), "starts": sum(1 for pos in finishes if pos < STRING_POSITION),
+                      "wins": finishes.count(1), "podiums": sum(1 for pos in finishes if 1 <= pos <= 3),
+                      "points": sum(sorted(week_points, reverse=True)[:num_counted])}
+            for key in ("races", "starts", "wins", "podiums", "points"):
+                totals[key] += season[key]
+            totals["seasons"].append(season)
+        return totals
+
+    def head_to_head(self, name: str, other: str) -> dict:
+        """
+        How two drivers finished against each other in every week they both raced in the same series. A finish beats
+        any DN*, and two DN*s tie.
+
+        :param name: driver name
+        :param other: other driver name
+        :return: dict of the number of races together and how many name finished ahead, behind or tied with other
+        """
+        finish = self.column("finish")
+        week = self.column("week")
+        other_finishes = {}
+        for key, rows in self.driver_rows(other).items():
+            for row in rows:
+                other_finishes[key + (week[row],)] = finish[row]
+        record = {"name": str(name).strip(), "other": str(other).strip(), "races": 0, "ahead": 0, "behind": 0,
+                  "tied": 0}
+        for key, rows in self.driver_rows(name).items():
+            for row in rows:
+                theirs = other_finishes.get(key + (week[row],))
+                if theirs is None:
+                    continue
+                record["races"] += 1
+                if finish[row] < theirs:
+                    record["ahead"] += 1
+                elif finish[row] > theirs:
+                    record["behind"] += 1
+                else:
+                    record["tied"] += 1
+        return record
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    import main
+    parser = argparse.ArgumentParser(description="All-time stats from a results archive.")
+    parser.add_argument("archive", help="archive directory, as written by main.py --archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("drivers", help="list every archived driver")
+    career = commands.add_parser("career", help="a driver's wins, podiums and points by season")
+    career.add_argument("name", help="driver name")
+    career.add_argument("--drop-weeks", type=int, default=DROPPED_WEEKS,
+                        help="number of non-counted weeks in a season to rescore with (default %(default)s)")
+    career.add_argument("--points", type=main.parse_points, default=POINTS,
+                        help="comma separated points for 1st, 2nd, 3rd... to rescore with")
+    head_to_head = commands.add_parser("h2h", help="how two drivers finished against each other")
+    head_to_head.add_argument("name", help="driver name")
+    head_to_head.add_argument("other", help="other driver name")
+    commands.add_parser("compact", help="drop replaced seasons from the column files")
+    args = parser.parse_args(argv)
+    if args.command == "career" and args.drop_weeks < 0:
+        parser.error("--drop-weeks must be 0 or more")
+    return args
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    results_archive = Archive(arguments.archive)
+    if arguments.command == "drivers":
+        print("\n".join(sorted(results_archive.index["drivers"])))
+    elif arguments.command == "career":
+        print(json.dumps(results_archive.career(arguments.name, arguments.drop_weeks, arguments.points), indent=2))
+    elif arguments.command == "h2h":
+        print(json.dumps(results_archive.head_to_head(arguments.name, arguments.other), indent=2))
+    else:
+        results_archive.compact()
+    results_archive.close()
@@ -0,0 +1,316 @@
+""" Benchmarks - generates synthetic championship workbooks in the example.xlsx layout and times the slow stages.
+Run this file directly, it does not touch any of the real league workbooks.
+
+    python bench.py                   time every scenario and compare against bench_baseline.json
+    python bench.py --save-baseline   store this run as the new baseline
+    python bench.py --drivers 300 --weeks 52 --series 4 --dnf-ratio 0.2   time one custom workbook
+
+Every run also times a cold import of the scoring core and main (python -X importtime) and checks neither pulls in
+openpyxl, tkinter or numpy."""
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+
+import instrumentation
+import main
+
+
+def make_workbook(num_drivers: int, num_weeks: int, num_series: int = 1, dnf_ratio: float = 0.1,
+                  seed: int = 0) -> openpyxl.Workbook:
+    """
+    Build a workbook of rawdata_ sheets laid out like example.xlsx - week numbers down column A, race dates down
+    column B and one column of finishes per driver from column C.
+
+    :param num_drivers: int of 1+ drivers in every series
+    :param num_weeks: int of 1+ weeks raced in every series
+    :param num_series: int of 1+ rawdata_ sheets to make
+    :param dnf_ratio: chance (0 to 1) of any single result being a DNF/DNS string rather than a position - the
+        finishers are numbered 1 up without gaps so the sheets pass validation
+    :param seed: random seed so the same arguments always give the same workbook
+    :return: a new openpyxl workbook
+    """
+    rand = random.Random(seed)
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    first_race = datetime.datetime(2023, 3, 25)
+    for series in range(num_series):
+        ws = wb.create_sheet("rawdata_Series" + str(series + 1))
+        ws.append(["Week", "Driver"] + ["Driver " + str(driver + 1) for driver in range(num_drivers)])
+        for week in range(num_weeks):
+            finishes = list(range(1, num_drivers + 1))
+            rand.shuffle(finishes)
+            for driver in range(num_drivers):
+                if rand.random() < dnf_ratio:
+                    finishes[driver] = rand.choice(["DNF", "DNS"])
+            finishers = sorted((finish, driver) for driver, finish in enumerate(finishes) if type(finish) is int)
+            for position, (finish, driver) in enumerate(finishers, start=1):
+                finishes[driver] = position
+            ws.append([week + 1, first_race + datetime.timedelta(weeks=week)] + finishes)
+    return wb
+
+
+def bench_formatter(num_drivers: int = 150, num_weeks: int = 40) -> dict:
+    """
+    Time the summary sheet formatter on one big series - reports cells styled per second and the saved file size.
+
+    :param num_drivers: int of 1+ drivers in the series
+    :param num_weeks: int of 1+ weeks raced
+    :return: dict of the measurements
+    """
+    champ_wb = main.ChampWorkBook(make_workbook(num_drivers, num_weeks), "rawdata_", "summary_")
+    champ_wb.calc_series(main.DROPPED_WEEKS)
+
+    start = time.perf_counter()
+    champ_wb.init_out_sheets()
+    seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "bench.xlsx")
+        champ_wb.wb.save(file_path)
+        file_size = os.path.getsize(file_path)
+
+    return {"drivers": num_drivers, "weeks": num_weeks, "seconds": seconds,
+            "cells_styled": champ_wb.styles.cells_styled, "style_lookups": champ_wb.styles.misses,
+            "cells_styled_per_second": champ_wb.styles.cells_styled / seconds, "file_bytes": file_size}
+
+
+# Stored timings to compare each run against - see --save-baseline
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+# Name: (drivers, weeks, series, dnf ratio) - an example.xlsx sized league, a busy multi-series league and one
+# very long season
+SCENARIOS = {"example": (20, 10, 3, 0.1),
+             "multi_series": (60, 20, 6, 0.1),
+             "big_season": (150, 40, 1, 0.2)}
+
+# Pipeline stages in run order - runcalc is the scoring without the sort_drivers time
+STAGES = ("get_wb", "validate", "runcalc", "sort_drivers", "format_out_sheet", "write_data", "write_out")
+
+# A stage is only a regression when it is this fraction slower than the baseline and by at least this many seconds -
+# timings on a shared machine easily wander 30%
+DEFAULT_TOLERANCE = 0.5
+MIN_SLOWDOWN_SECONDS = 0.01
+
+
+# Modules timed from a cold interpreter, and the heavy modules importing them must not load
+IMPORT_MODULES = ("scoring", "main")
+HEAVY_MODULES = ("openpyxl", "tkinter", "numpy")
+
+
+def bench_imports(repeat: int = 3) -> dict:
+    """
+    Time importing each of IMPORT_MODULES in a fresh interpreter with python -X importtime (best of repeat runs) and
+    list any HEAVY_MODULES each import loaded.
+
+    :param repeat: number of timed imports per module
+    :return: dict of {"seconds": module: seconds, "heavy": module: list of heavy modules loaded}
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    seconds = {}
+    heavy = {}
+    for module in IMPORT_MODULES:
+        code = ("import sys, %s; print(' '.join(name for name in %r if name in sys.modules))"
+                % (module, HEAVY_MODULES))
+        for i in range(repeat):
+            done = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=directory,
+                                  capture_output=True, text=True, check=True)
+            # each stderr line is "import time: self us | cumulative us | module" - the module's own line has the total
+            for line in done.stderr.splitlines():
+                parts = line.split("|")
+                if len(parts) == 3 and parts[2].strip() == module:
+                    module_seconds = int(parts[1]) / 1e6
+                    seconds[module] = min(module_seconds, seconds.get(module, module_seconds))
+            heavy[module] = done.stdout.split()
+    return {"seconds": seconds, "heavy": heavy}
+
+
+def run_pipeline(in_path: str, out_path: str) -> dict[str, float]:
+    """
+    Run one workbook through the normal in place pipeline, timing each stage with the built-in instrumentation.
+
+    :param in_path: workbook to read
+    :param out_path: path to save the updated workbook to
+    :return: dict of stage name: seconds for every name in STAGES
+    """
+    stats = instrumentation.Stats()
+    with stats.stage("get_wb"):
+        wb = main.get_wb(in_path)
+    champ_wb = main.ChampWorkBook(wb, "rawdata_", "summary_", stats=stats)
+    champ_wb.validate()
+    champ_wb.calc_series(main.DROPPED_WEEKS)
+    champ_wb.init_out_sheets()
+    champ_wb.write_out(out_path)
+
+    timings = dict(stats.timings)
+    timings["runcalc"] -= timings.get("sort_drivers", 0.0)
+    timings["write_out"] = timings.pop("save")
+    return {stage: timings.get(stage, 0.0) for stage in STAGES}
+
+
+def bench_scenario(num_drivers: int, num_weeks: int, num_series: int, dnf_ratio: float, repeat: int = 3) -> dict:
+    """
+    Time every pipeline stage on a generated workbook (best of repeat runs) then measure the peak traced memory of one
+    more run - kept separate since tracing memory slows everything down.
+
+    :param num_drivers: int of 1+ drivers in every series
+    :param num_weeks: int of 1+ weeks raced in every series
+    :param num_series: int of 1+ rawdata_ sheets
+    :param dnf_ratio: chance (0 to 1) of any single result being a DNF/DNS string
+    :param repeat: number of timed runs
+    :return: dict of the best seconds per stage, the total of those and the peak memory in bytes
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        in_path = os.path.join(tmp_dir, "in.xlsx")
+        out_path = os.path.join(tmp_dir, "out.xlsx")
+        make_workbook(num_drivers, num_weeks, num_series, dnf_ratio).save(in_path)
+
+        best = {}
+        for i in range(repeat):
+            for stage, seconds in run_pipeline(in_path, out_path).items():
+                best[stage] = min(seconds, best.get(stage, seconds))
+
+        tracemalloc.start()
+        try:
+            run_pipeline(in_path, out_path)
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {"stages": best, "total": sum(best.values()), "peak_bytes": peak_bytes}
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """
+    :param results: dict of scenario name: bench_scenario results
+    :param baseline: the same for the stored baseline
+    :param tolerance: fraction slower (or bigger for memory) than the baseline that counts as a regression
+    :return: list of regression descriptions - empty when nothing got worse
+    """
+    regressions = []
+    for name, result in results.items():
+        if name == "imports":
+            regressions.extend(compare_imports(result, baseline.get(name), tolerance))
+            continue
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        for stage, seconds in result["stages"].items():
+            old_seconds = old["stages"].get(stage)
+            if old_seconds is None:
+                continue
+            if seconds > old_seconds * (1 + tolerance) and seconds - old_seconds > MIN_SLOWDOWN_SECONDS:
+                regressions.append("%s %s: %.3fs -> %.3fs" % (name, stage, old_seconds, seconds))
+        if result["peak_bytes"] > old["peak_bytes"] * (1 + tolerance):
+            regressions.append("%s peak memory: %.1fMB -> %.1fMB" % (name, old["peak_bytes"] / 1e6,
+                                                                      result["peak_bytes"] / 1e6))
+    return regressions
+
+
+def compare_imports(result: dict, baseline: dict = None, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """
+    :param result: bench_imports results
+    :param baseline: the same for the stored baseline - None to only check for heavy modules
+    :param tolerance: fraction slower than the baseline that counts as a regression
+    :return: list of regression descriptions - empty when nothing got worse
+    """
+    regressions = []
+    for module, loaded in result["heavy"].items():
+        if loaded:
+            regressions.append("import %s loads %s" % (module, ", ".join(loaded)))
+    if baseline is None:
+        return regressions
+    for module, seconds in result["seconds"].items():
+        old_seconds = baseline["seconds"].get(module)
+        if old_seconds is None:
+            continue
+        if seconds > old_seconds * (1 + tolerance) and seconds - old_seconds > MIN_SLOWDOWN_SECONDS:
+            regressions.append("import %s: %.3fs -> %.3fs" % (module, old_seconds, seconds))
+    return regressions
+
+
+def print_imports(result: dict) -> None:
+    print("imports")
+    for module, seconds in result["seconds"].items():
+        print("  %-17s %8.3fs%s" % (module, seconds, "  loads " + ", ".join(result["heavy"][module])
+                                    if result["heavy"][module] else ""))
+
+
+def print_result(name: str, result: dict) -> None:
+    print(name)
+    for stage, seconds in result["stages"].items():
+        print("  %-17s %8.3fs" % (stage, seconds))
+    print("  %-17s %8.3fs" % ("total", result["total"]))
+    print("  %-17s %8.1fMB" % ("peak memory", result["peak_bytes"] / 1e6))
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """
+    :param argv: argument list, sys.argv[1:] if not given
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(description="Time each stage of the standings pipeline on generated workbooks.")
+    parser.add_argument("--drivers", type=int, help="time one custom workbook with this many drivers per series")
+    parser.add_argument("--weeks", type=int, default=20, help="weeks per series for a custom workbook")
+    parser.add_argument("--series", type=int, default=1, help="series in a custom workbook")
+    parser.add_argument("--dnf-ratio", type=float, default=0.1, help="share of string results in a custom workbook")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per scenario - the best is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file (default bench_baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="fraction slower than the baseline that fails the run (default %(default)s)")
+    parser.add_argument("--formatter", action="store_true",
+                        help="just report the summary sheet formatter's cells styled per second")
+    return parser.parse_args(argv)
+
+
+def main_bench(argv: list[str] = None) -> int:
+    """
+    :param argv: argument list, sys.argv[1:] if not given
+    :return: process exit code - 1 if anything regressed against the baseline
+    """
+    args = parse_args(argv)
+    if args.formatter:
+        for key, value in bench_formatter().items():
+            print(key, value)
+        return 0
+
+    if args.drivers is not None:
+        scenarios = {"custom": (args.drivers, args.weeks, args.series, args.dnf_ratio)}
+    else:
+        scenarios = SCENARIOS
+    results = {"imports": bench_imports(args.repeat)}
+    print_imports(results["imports"])
+    for name, (num_drivers, num_weeks, num_series, dnf_ratio) in scenarios.items():
+        results[name] = bench_scenario(num_drivers, num_weeks, num_series, dnf_ratio, args.repeat)
+        print_result(name, results[name])
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print("saved baseline", args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against - run with --save-baseline")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    if regressions:
+        return 1
+    print("no regressions against", args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main_bench())
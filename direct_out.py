@@ -0,0 +1,575 @@
+""" Direct xlsx output - streams the summary sheets' XML straight into a copy of the input workbook's zip package
+without any openpyxl workbook, worksheet or cell objects. Every part of the input package other than the workbook
+parts listed below is copied across byte for byte, so the rawdata_ and other sheets come out exactly as they went in.
+
+Parts that are changed - the workbook (old summary sheets out, new ones on the end), its relationships, the content
+types, the shared strings (new strings appended, existing indices kept) and the styles (the fixed style_cache fonts,
+fills and borders appended plus one cell format per style combination used). A stale calcChain is dropped when old
+summary sheets are removed and so are any custom document properties describing them (the summary sheet fingerprints),
+docProps/app.xml is left as it was."""
+import html
+import os
+import posixpath
+import re
+import xml.etree.ElementTree
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from openpyxl.utils import get_column_letter
+from openpyxl.xml.functions import tostring
+
+import instrumentation
+import style_cache
+import summary_layout
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+DOC_RELS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+CONTENT_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+OFFICE_DOCUMENT_TYPE = DOC_RELS_NS + "/officeDocument"
+WORKSHEET_TYPE = DOC_RELS_NS + "/worksheet"
+SHARED_STRINGS_TYPE = DOC_RELS_NS + "/sharedStrings"
+STYLES_TYPE = DOC_RELS_NS + "/styles"
+CALC_CHAIN_TYPE = DOC_RELS_NS + "/calcChain"
+CUSTOM_PROPERTIES_TYPE = DOC_RELS_NS + "/custom-properties"
+
+WORKSHEET_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+SHARED_STRINGS_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"
+STYLES_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# styles part for the rare package without one - the default font, the two required fills, an empty border and the
+# default cell format
+EMPTY_STYLES = (XML_DECLARATION + '<styleSheet xmlns="' + MAIN_NS + '">'
+                '<fonts count="1"><font><sz val="11"/><name val="Calibri"/><family val="2"/></font></fonts>'
+                '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+                '<fill><patternFill patternType="gray125"/></fill></fills>'
+                '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+                '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+                '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+                '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+                '</styleSheet>')
+
+
+def save_direct(champ_wb, in_path: str, out_path: str, property_prefix: str = None) -> None:
+    """
+    Save a calculated ChampWorkBook by splicing fresh summary sheets into a copy of the package it was read from.
+
+    Sheets come out in the same order as ChampWorkBook.init_out_sheets then write_out would give - every raw data and
+    other sheet as it was followed by a fresh summary sheet per series. out_path may be in_path - the new package is
+    written next to it first and then moved over it.
+
+    :param champ_wb: ChampWorkBook read from in_path that has already had calc_series run
+    :param in_path: the xlsx file champ_wb was read from
+    :param out_path: path to save the new xlsx workbook to
+    :param property_prefix: drop the custom document properties whose names start with this - main.FINGERPRINT_PROPERTY
+        so no fingerprint outlives the summary sheet it was stored for
+    """
+    temp_path = out_path + ".tmp"
+    with zipfile.ZipFile(in_path) as source:
+        package = Package(source, champ_wb.summary_str, property_prefix)
+        layouts = []
+        for i in range(len(champ_wb.series)):
+            summary_name = champ_wb.raw_data_sheets[i].replace(champ_wb.raw_str, champ_wb.summary_str)
+            layouts.append((summary_name, summary_layout.SummaryLayout(
+                champ_wb.series[i], champ_wb.raw_data_sheets[i][len(champ_wb.raw_str):], champ_wb.window)))
+        new_parts = package.add_sheets([summary_name for summary_name, layout in layouts])
+
+        try:
+            with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as out:
+                for info in source.infolist():
+                    if info.filename not in package.replaced:
+                        out.writestr(info, source.read(info.filename))
+
+                strings = SharedStrings(package.read_part(package.shared_strings_path))
+                styles = StyleTable(package.read_part(package.styles_path) or EMPTY_STYLES)
+                for (summary_name, layout), part in zip(layouts, new_parts):
+                    with out.open(part, "w") as f:
+                        write_sheet(f, layout, strings, styles, champ_wb.stats)
+
+                out.writestr(package.shared_strings_path, strings.xml())
+                out.writestr(package.styles_path, styles.xml())
+                for path, text in package.changed_parts().items():
+                    out.writestr(path, text)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        champ_wb.stats.count("styles_assigned", styles.cells_styled)
+    os.replace(temp_path, out_path)
+
+
+def write_sheet(f, layout: summary_layout.SummaryLayout, strings: "SharedStrings", styles: "StyleTable",
+                stats: instrumentation.Stats = None) -> None:
+    """
+    Stream one series' standings graphic out as worksheet XML.
+
+    :param f: binary file to write the worksheet part to
+    :param layout: SummaryLayout of the series to write
+    :param strings: SharedStrings of the package - any new strings are added
+    :param styles: StyleTable of the package - any new style combinations are added
+    :param stats: instrumentation.Stats to time the sheet and count the cells and merges in
+    """
+    if stats is None:
+        stats = instrumentation.Stats()
+    with stats.stage("write_sheet", layout.series.name):
+        letters = [get_column_letter(column + 1) for column in range(layout.width)]
+        f.write((XML_DECLARATION + '<worksheet xmlns="' + MAIN_NS + '" xmlns:r="' + DOC_RELS_NS + '">'
+                 '<dimension ref="A1:' + letters[-1] + str(layout.height) + '"/>'
+                 '<sheetViews><sheetView workbookViewId="0"/></sheetViews>'
+                 '<sheetFormatPr defaultRowHeight="15"/><sheetData>').encode())
+        cells_written = 0
+        for row_index, row in enumerate(layout.rows()):
+            row_number = str(row_index + 1)
+            parts = ['<row r="', row_number, '">']
+            for column, (value, font, fill, border) in enumerate(row):
+                parts.append('<c r="' + letters[column] + row_number + '" s="' + str(styles.index(font, fill, border))
+                             + '"')
+                if value is None:
+                    parts.append('/>')
+                    continue
+                cells_written += 1
+                if isinstance(value, str):
+                    parts.append(' t="s"><v>' + str(strings.index(value)) + '</v></c>')
+                else:
+                    parts.append('><v>' + str(value) + '</v></c>')
+            parts.append('</row>')
+            f.write("".join(parts).encode())
+
+        merges = layout.merges()
+        f.write(('</sheetData><mergeCells count="' + str(len(merges)) + '">').encode())
+        for start_row, start_column, end_row, end_column in merges:
+            f.write(('<mergeCell ref="' + letters[start_column - 1] + str(start_row) + ':' + letters[end_column - 1]
+                     + str(end_row) + '"/>').encode())
+        f.write('</mergeCells><pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/>'
+                '</worksheet>'.encode())
+        stats.count("cells_written", cells_written)
+        stats.count("merges_created", len(merges))
+
+
+class SharedStrings(object):
+    """
+    The package's shared strings with new strings appended after the existing ones, so every existing index (and so
+    every existing sheet) stays valid. Strings already in the table are reused rather than added again.
+    """
+
+    def __init__(self, source_xml: str = None) -> None:
+        """
+        :param source_xml: the existing shared strings part, or None if the package has none
+        """
+        self.source_xml = source_xml
+        # string: index for every plain (unformatted) string in the table
+        self.strings = {}
+        self.existing = 0
+        if source_xml is not None:
+            items = xml.etree.ElementTree.fromstring(source_xml).findall("{%s}si" % MAIN_NS)
+            self.existing = len(items)
+            for i, item in enumerate(items):
+                text = item.find("{%s}t" % MAIN_NS)
+                if len(item) == 1 and text is not None:
+                    self.strings.setdefault(text.text or "", i)
+        self.new = []
+        # every string cell written, for the count attribute
+        self.uses = 0
+
+    def index(self, value: str) -> int:
+        """
+        :param value: string to put in a cell
+        :return: its shared string index - new strings are appended
+        """
+        self.uses += 1
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = self.existing + len(self.new)
+            self.new.append(value)
+        return index
+
+    def xml(self) -> str:
+        """
+        :return: the shared strings part with the new strings added
+        """
+        items = []
+        for value in self.new:
+            if value != value.strip():
+                items.append('<si><t xml:space="preserve">' + escape(value) + '</t></si>')
+            else:
+                items.append('<si><t>' + escape(value) + '</t></si>')
+        source_xml = self.source_xml
+        if source_xml is None:
+            source_xml = XML_DECLARATION + '<sst xmlns="' + MAIN_NS + '" count="0" uniqueCount="0"></sst>'
+        count = self.uses + int(attribute(source_xml, "sst", "count") or 0)
+        source_xml = set_attribute(source_xml, "sst", "count", count)
+        source_xml = set_attribute(source_xml, "sst", "uniqueCount", self.existing + len(self.new))
+        return append_children(source_xml, "sst", "".join(items))
+
+
+class StyleTable(object):
+    """
+    The package's styles plus the style_cache fonts, fills and borders and one cell format per (font, fill, border)
+    role combination as it is first used. Entries the package already has (e.g. from an earlier run) are reused, the
+    rest are appended so existing style indices are untouched.
+    """
+
+    def __init__(self, source_xml: str) -> None:
+        """
+        :param source_xml: the existing styles part
+        """
+        self.source_xml = source_xml
+        root = xml.etree.ElementTree.fromstring(source_xml)
+        # per list tag - canonical XML: index of the existing entries, and the XML of the entries to append
+        self.known = {}
+        self.counts = {}
+        self.added = {}
+        for tag in ("fonts", "fills", "borders", "cellXfs"):
+            element = root.find("{%s}%s" % (MAIN_NS, tag))
+            if element is None:
+                raise ValueError("styles part has no " + tag)
+            self.known[tag] = {}
+            for i, child in enumerate(element):
+                self.known[tag].setdefault(xml.etree.ElementTree.tostring(child), i)
+            self.counts[tag] = len(element)
+            self.added[tag] = []
+
+        # a None font role is the workbook's default font
+        self.fonts = {None: 0}
+        for role, font in style_cache.FONTS.items():
+            self.fonts[role] = self.entry("fonts", tostring(font.to_tree()).decode())
+        self.fills = {role: self.entry("fills", tostring(fill.to_tree()).decode())
+                      for role, fill in style_cache.FILLS.items()}
+        self.borders = {role: self.entry("borders", tostring(border.to_tree()).decode())
+                        for role, border in style_cache.BORDERS.items()}
+        self.alignment = tostring(style_cache.ALIGNMENTS["center"].to_tree()).decode()
+        # (font, fill, border): cell format index
+        self.xfs = {}
+        self.cells_styled = 0
+
+    def entry(self, tag: str, entry_xml: str) -> int:
+        """
+        :param tag: style list the entry belongs in e.g. "fonts"
+        :param entry_xml: the entry's XML
+        :return: index of the same entry already in the list, or of entry_xml appended to the list
+        """
+        key = xml.etree.ElementTree.tostring(xml.etree.ElementTree.fromstring(
+            '<styleSheet xmlns="%s">%s</styleSheet>' % (MAIN_NS, entry_xml))[0])
+        index = self.known[tag].get(key)
+        if index is None:
+            index = self.known[tag][key] = self.counts[tag] + len(self.added[tag])
+            self.added[tag].append(entry_xml)
+        return index
+
+    def index(self, font: str, fill: str, border: str) -> int:
+        """
+        :param font: key into style_cache.FONTS or None
+        :param fill: key into style_cache.FILLS
+        :param border: key into style_cache.BORDERS
+        :return: the cell format index of that combination, centered
+        """
+        self.cells_styled += 1
+        key = (font, fill, border)
+        index = self.xfs.get(key)
+        if index is None:
+            index = self.xfs[key] = self.entry(
+                "cellXfs", '<xf numFmtId="0" fontId="%d" fillId="%d" borderId="%d" xfId="0" applyFont="1" '
+                           'applyFill="1" applyBorder="1" applyAlignment="1">%s</xf>'
+                           % (self.fonts[font], self.fills[fill], self.borders[border], self.alignment))
+        return index
+
+    def xml(self) -> str:
+        """
+        :return: the styles part with the new fonts, fills, borders and cell formats added
+        """
+        source_xml = self.source_xml
+        for tag, added in self.added.items():
+            source_xml = append_children(source_xml, tag, "".join(added))
+            old_count = attribute(source_xml, tag, "count")
+            if old_count is not None:
+                source_xml = set_attribute(source_xml, tag, "count", int(old_count) + len(added))
+        return source_xml
+
+
+class Package(object):
+    """
+    The workbook level parts of an input package and the edits needed to swap its summary sheets for new ones.
+    """
+
+    def __init__(self, source: zipfile.ZipFile, summary_str: str, property_prefix: str = None) -> None:
+        """
+        :param source: the open input package
+        :param summary_str: prefix of the summary sheets to remove
+        :param property_prefix: prefix of the custom document properties to remove - none if None
+        """
+        self.source = source
+        # every part name in use - the input's plus any new ones
+        self.names = set(source.namelist())
+        # parts not copied across as they are - removed or rewritten
+        self.replaced = set()
+
+        root_rels = relationships(self.read_part("_rels/.rels"), "")
+        self.workbook_path = [target for rid, (kind, target) in root_rels.items() if kind == OFFICE_DOCUMENT_TYPE][0]
+        self.rels_path = rels_path(self.workbook_path)
+        self.workbook_xml = self.read_part(self.workbook_path)
+        self.rels_xml = self.read_part(self.rels_path)
+        self.content_types = self.read_part("[Content_Types].xml")
+        self.rels = relationships(self.rels_xml, posixpath.dirname(self.workbook_path))
+        self.replaced.update((self.workbook_path, self.rels_path, "[Content_Types].xml"))
+
+        # the shared strings and styles parts - made if the package has none
+        self.shared_strings_path = self.part_of_type(SHARED_STRINGS_TYPE, "sharedStrings.xml",
+                                                     SHARED_STRINGS_CONTENT_TYPE)
+        self.styles_path = self.part_of_type(STYLES_TYPE, "styles.xml", STYLES_CONTENT_TYPE)
+
+        # drop the old summary sheets
+        sheets = re.search(r"<sheets\b[^>]*>(.*?)</sheets>", self.workbook_xml, re.S)
+        if sheets is None:
+            raise ValueError("workbook part has no sheets")
+        prefix = namespace_prefix(self.workbook_xml, DOC_RELS_NS)
+        kept = {}
+        removed = []
+        sheet_ids = []
+        for index, match in enumerate(re.finditer(r"<sheet\b[^>]*?/>", sheets.group(1))):
+            element = xml.etree.ElementTree.fromstring(match.group(0).replace(prefix + ":id=", "rid="))
+            sheet_ids.append(int(element.get("sheetId")))
+            if element.get("name").startswith(summary_str):
+                removed.append((match.group(0), element.get("rid")))
+            else:
+                kept[index] = len(kept)
+        for sheet_xml, rid in removed:
+            self.workbook_xml = self.workbook_xml.replace(sheet_xml, "", 1)
+            self.remove_relationship(rid)
+        if removed:
+            self.renumber_sheets(kept)
+            for rid, (kind, target) in list(self.rels.items()):
+                if kind == CALC_CHAIN_TYPE:
+                    self.remove_relationship(rid)
+        self.rels_prefix = prefix
+        self.next_sheet_id = max(sheet_ids, default=0) + 1
+
+        # the custom properties part rewritten without the properties that describe the old summary sheets
+        self.custom_path = None
+        self.custom_xml = None
+        if property_prefix is not None:
+            for rid, (kind, target) in root_rels.items():
+                if kind == CUSTOM_PROPERTIES_TYPE and self.read_part(target) is not None:
+                    self.custom_path = target
+                    self.custom_xml = drop_properties(self.read_part(target), property_prefix)
+                    self.replaced.add(target)
+
+    def read_part(self, path: str) -> str:
+        """
+        :param path: part name inside the package
+        :return: its text, or None if there is no such part
+        """
+        if path is None or path not in self.source.NameToInfo:
+            return None
+        return self.source.read(path).decode("utf-8")
+
+    def part_of_type(self, kind: str, default_name: str, content_type: str) -> str:
+        """
+        :param kind: relationship type
+        :param default_name: name for a new part next to the workbook part if the package has none of this type
+        :param content_type: content type for a new part
+        :return: path of the (existing or new) part - it is rewritten either way
+        """
+        for rid, (rel_kind, target) in self.rels.items():
+            if rel_kind == kind:
+                self.replaced.add(target)
+                return target
+        path = self.unused_path(posixpath.join(posixpath.dirname(self.workbook_path), default_name))
+        self.add_relationship(kind, path)
+        self.add_content_type(path, content_type)
+        return path
+
+    def add_sheets(self, sheet_names: list[str]) -> list[str]:
+        """
+        Add new worksheets to the end of the workbook.
+
+        :param sheet_names: names of the new sheets
+        :return: part path for each sheet, in the same order
+        """
+        paths = []
+        sheets = []
+        for sheet_name in sheet_names:
+            path = self.unused_path(posixpath.join(posixpath.dirname(self.workbook_path), "worksheets/sheet1.xml"))
+            rid = self.add_relationship(WORKSHEET_TYPE, path)
+            self.add_content_type(path, WORKSHEET_CONTENT_TYPE)
+            sheets.append('<sheet name=%s sheetId="%d" %s:id="%s"/>' % (quoteattr(sheet_name), self.next_sheet_id,
+                                                                         self.rels_prefix, rid))
+            self.next_sheet_id += 1
+            paths.append(path)
+        self.workbook_xml = append_children(self.workbook_xml, "sheets", "".join(sheets))
+        return paths
+
+    def changed_parts(self) -> dict[str, str]:
+        """
+        :return: dict of path: text for the rewritten workbook, relationships, content types and custom properties
+            parts
+        """
+        parts = {self.workbook_path: self.workbook_xml, self.rels_path: self.rels_xml,
+                 "[Content_Types].xml": self.content_types}
+        if self.custom_path is not None:
+            parts[self.custom_path] = self.custom_xml
+        return parts
+
+    def unused_path(self, path: str) -> str:
+        """
+        :param path: wanted part path ending in .xml, with or without a number before that
+        :return: that path with the number counted up until it is not a part of the package
+        """
+        stem, number = re.match(r"(.*?)(\d*)\.xml$", path).groups()
+        number = int(number or 1)
+        while path in self.names:
+            number += 1
+            path = stem + str(number) + ".xml"
+        self.names.add(path)
+        return path
+
+    def add_relationship(self, kind: str, path: str) -> str:
+        """
+        :param kind: relationship type
+        :param path: target part path
+        :return: the new relationship id
+        """
+        numbers = [int(rid[3:]) for rid in self.rels if re.fullmatch(r"rId\d+", rid)]
+        rid = "rId" + str(max(numbers, default=0) + 1)
+        self.rels[rid] = (kind, path)
+        self.rels_xml = append_children(self.rels_xml, "Relationships",
+                                        '<Relationship Id="%s" Type="%s" Target="/%s"/>' % (rid, kind, path))
+        return rid
+
+    def remove_relationship(self, rid: str) -> None:
+        """
+        Remove a workbook relationship, its target part, the target's own relationships and its content type.
+
+        :param rid: relationship id
+        """
+        kind, path = self.rels.pop(rid)
+        self.rels_xml = re.sub(r'<Relationship\b[^>]*?\bId="%s"[^>]*?/>' % re.escape(rid), "", self.rels_xml)
+        self.replaced.update((path, rels_path(path)))
+        self.content_types = re.sub(r'<Override\b[^>]*?\bPartName="/%s"[^>]*?/>' % re.escape(path), "",
+                                    self.content_types)
+
+    def add_content_type(self, path: str, content_type: str) -> None:
+        self.content_types = append_children(self.content_types, "Types",
+                                             '<Override PartName="/%s" ContentType="%s"/>' % (path, content_type))
+
+    def renumber_sheets(self, kept: dict[int, int]) -> None:
+        """
+        Point the sheet indices in the workbook part (sheet scoped defined names, the active and first visible tab)
+        at the sheets' new positions after some were removed. Names scoped to a removed sheet are dropped.
+
+        :param kept: dict of old sheet index: new sheet index for every sheet still in the workbook
+        """
+        def defined_name(match):
+            scope = re.search(r'\blocalSheetId="(\d+)"', match.group(0))
+            if scope is None:
+                return match.group(0)
+            if int(scope.group(1)) not in kept:
+                return ""
+            return match.group(0).replace(scope.group(0), 'localSheetId="%d"' % kept[int(scope.group(1))], 1)
+
+        def tab(match):
+            return '%s="%d"' % (match.group(1), kept.get(int(match.group(2)), 0))
+
+        self.workbook_xml = re.sub(r"<definedName\b[^>]*?(?:/>|>.*?</definedName>)", defined_name,
+                                   self.workbook_xml, flags=re.S)
+        self.workbook_xml = re.sub(r"<definedNames\b[^>]*>\s*</definedNames>", "", self.workbook_xml)
+        self.workbook_xml = re.sub(r'\b(activeTab|firstSheet)="(\d+)"', tab, self.workbook_xml)
+
+
+def relationships(rels_xml: str, base: str) -> dict[str, tuple[str, str]]:
+    """
+    :param rels_xml: text of a relationships part, or None
+    :param base: directory of the part the relationships belong to - relative targets are inside it
+    :return: dict of id: (type, target part path) for the internal relationships
+    """
+    rels = {}
+    if rels_xml is None:
+        return rels
+    for element in xml.etree.ElementTree.fromstring(rels_xml).findall("{%s}Relationship" % RELS_NS):
+        if element.get("TargetMode") == "External":
+            continue
+        target = element.get("Target")
+        if target.startswith("/"):
+            path = target[1:]
+        else:
+            path = posixpath.normpath(posixpath.join(base, target))
+        rels[element.get("Id")] = (element.get("Type"), path)
+    return rels
+
+
+def rels_path(path: str) -> str:
+    """
+    :param path: part path
+    :return: path of that part's relationships part
+    """
+    return posixpath.join(posixpath.dirname(path), "_rels", posixpath.basename(path) + ".rels")
+
+
+def namespace_prefix(text: str, namespace: str) -> str:
+    """
+    :param text: XML document text
+    :param namespace: namespace URI
+    :return: the prefix the document declares for it
+    """
+    match = re.search(r'xmlns:(\w+)="%s"' % re.escape(namespace), text)
+    if match is None:
+        raise ValueError("no prefix declared for " + namespace)
+    return match.group(1)
+
+
+def attribute(text: str, tag: str, name: str) -> str:
+    """
+    :param text: XML document text
+    :param tag: element name (unprefixed)
+    :param name: attribute name
+    :return: the attribute's value on the first such element, or None
+    """
+    match = re.search(r'<%s\b[^>]*?\s%s="([^"]*)"' % (tag, name), text)
+    return match.group(1) if match else None
+
+
+def set_attribute(text: str, tag: str, name: str, value) -> str:
+    """
+    :param text: XML document text
+    :param tag: element name (unprefixed)
+    :param name: attribute name - added if the first such element does not have it
+    :param value: new value
+    :return: the document text with the first such element's attribute set
+    """
+    if attribute(text, tag, name) is not None:
+        return re.sub(r'(<%s\b[^>]*?\s%s=")[^"]*(")' % (tag, name), r"\g<1>%s\g<2>" % value, text, count=1)
+    return re.sub(r"<%s\b" % tag, '<%s %s="%s"' % (tag, name, value), text, count=1)
+
+
+def drop_properties(custom_xml: str, prefix: str) -> str:
+    """
+    :param custom_xml: text of a custom document properties part
+    :param prefix: property name prefix
+    :return: the part's text without the properties whose names start with prefix
+    """
+    def keep(match):
+        name = re.search(r'\sname="([^"]*)"', match.group(0))
+        if name is not None and html.unescape(name.group(1)).startswith(prefix):
+            return ""
+        return match.group(0)
+
+    return re.sub(r"<((?:\w+:)?)property\b[^>]*?(?:/>|>.*?</\1property>)", keep, custom_xml, flags=re.S)
+
+
+def append_children(text: str, tag: str, children: str) -> str:
+    """
+    :param text: XML document text
+    :param tag: element name (unprefixed) - the first one in the document is used
+    :param children: XML text to add as that element's last children
+    :return: the document text with the children added
+    """
+    if not children:
+        return text
+    close = "</%s>" % tag
+    if close in text:
+        return text.replace(close, children + close, 1)
+    empty = re.search(r"<%s\b([^>]*?)\s*/>" % tag, text)
+    if empty is None:
+        raise ValueError("no %s element to add to" % tag)
+    return text[:empty.start()] + "<%s%s>%s%s" % (tag, empty.group(1), children, close) + text[empty.end():]
@@ -0,0 +1,111 @@
+""" Run instrumentation - per stage and per series timers plus work counters for one workbook run, with an optional
+cProfile or tracemalloc capture, all gathered into one JSON report. Timers are a couple of perf_counter calls per stage
+so they are always on, the captures are only switched on (and their modules only imported) when asked for."""
+import contextlib
+import time
+
+# Capture modes for Stats.capture
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+# Number of functions / allocation sites kept in a capture's report
+TOP_ENTRIES = 30
+
+
+class Stats(object):
+    """
+    Timings and counters for one workbook run.
+
+    timings holds the total seconds per stage, series_timings the same per series (by raw data sheet name) and counters
+    the amount of work done - e.g. cells written, merges created.
+    """
+
+    def __init__(self) -> None:
+        self.timings = {}
+        self.series_timings = {}
+        self.counters = {}
+        # filled in by capture
+        self.profile = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str, series: str = None):
+        """
+        Time the with block as one run of a stage - repeated runs of the same stage add up.
+
+        :param name: stage name e.g. "runcalc"
+        :param series: raw data sheet name of the series the stage is for - None for whole workbook stages
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+            if series is not None:
+                series_timings = self.series_timings.setdefault(series, {})
+                series_timings[name] = series_timings.get(name, 0.0) + seconds
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        :param name: counter name e.g. "cells_written"
+        :param amount: amount to add
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextlib.contextmanager
+    def capture(self, mode: str = None):
+        """
+        Run the with block under cProfile or tracemalloc and keep a summary of the result in self.profile.
+
+        :param mode: one of PROFILE_MODES, or None to capture nothing
+        """
+        if mode is None:
+            yield
+            return
+        if mode == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                self.profile = {"mode": mode, "functions": profile_functions(profiler)}
+            return
+        if mode == "tracemalloc":
+            import tracemalloc
+            tracemalloc.start()
+            try:
+                yield
+            finally:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                sites = [{"site": str(stat.traceback), "bytes": stat.size, "blocks": stat.count}
+                         for stat in snapshot.statistics("lineno")[:TOP_ENTRIES]]
+                self.profile = {"mode": mode, "peak_bytes": peak, "current_bytes": current, "sites": sites}
+            return
+        raise ValueError("unknown profile mode " + repr(mode))
+
+    def report(self) -> dict:
+        """
+        :return: plain dict of everything recorded, ready for json
+        """
+        return {"timings": dict(self.timings),
+                "series_timings": {name: dict(timings) for name, timings in self.series_timings.items()},
+                "counters": dict(self.counters), "profile": self.profile}
+
+
+def profile_functions(profiler: "cProfile.Profile") -> list[dict]:
+    """
+    :param profiler: a finished cProfile.Profile
+    :return: the TOP_ENTRIES functions with the most cumulative time, most first
+    """
+    import io
+    import pstats
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    functions = []
+    for (file_name, line, function), (calls, primitive_calls, total, cumulative, callers) in stats.stats.items():
+        functions.append({"function": "%s:%d(%s)" % (file_name, line, function), "calls": calls,
+                          "total_seconds": total, "cumulative_seconds": cumulative})
+    functions.sort(key=lambda y: y["cumulative_seconds"], reverse=True)
+    return functions[:TOP_ENTRIES]
@@ -1,53 +1,81 @@
 """ main file - Run this should prompt user for a properly formatted Excel
-file then update that file with pretty output of championship standings"""
+file then update that file with pretty output of championship standings
 
-import tkinter
-import tkinter.filedialog
-import openpyxl
-import openpyxl.worksheet
-import openpyxl.utils
-import openpyxl.styles
-from openpyxl.cell.cell import Cell
+Can also be run headless - python main.py input.xlsx output.xlsx, or python main.py --batch in_dir out_dir for a whole
+directory of league workbooks. See python main.py --help"""
+
+import json
+import os
+
+import instrumentation
+import results_cache
+import rules
+import summary_layout
+# the scoring core lives in scoring so it can be used without openpyxl - re-exported here for existing callers
+from scoring import (DROPPED_WEEKS, POINTS, Driver, ResultsTable, Series, WeeklyDropped, WeeklyResults,
+                     WeeklySortKeys, WeeklyView, calc_table, counted_weeks, read_results_table, rows_results_table)
+
+# openpyxl, tkinter, the output modules built on openpyxl (style_cache, stream_out, direct_out) and anything only the
+# command line or worker pools need are imported where they are used, so importing main stays cheap
 
 # Graphic Range Type Hint
-GraphicRange = tuple[tuple[Cell, ...], ...]
+GraphicRange = tuple[tuple["openpyxl.cell.cell.Cell", ...], ...]
 
 # Bold Gold for all counted 1st place finishes - Bold Silver second, Bold-Bronze third, Bold- Black - counted
-# non-podium finishes
-boldGold = openpyxl.styles.Font(bold=True, color="ffc200")
-BoldSilver = openpyxl.styles.Font(bold=True, color="9a9a9a")
-BoldBronze = openpyxl.styles.Font(bold=True, color="CD7F32")
-BoldBlack = openpyxl.styles.Font(bold=True)
+# non-podium finishes and Dull grey without bold for non-counting (dropped) finishes. The fonts themselves live in the
+# style_cache registry - these names are looked up from there on first use, see __getattr__
+FONT_NAMES = {"boldGold": "gold", "BoldSilver": "silver", "BoldBronze": "bronze", "BoldBlack": "black",
+              "DroppedGrey": "grey"}
+
+
+def __getattr__(name: str):
+    """
+    Module attributes made on first use - the named finish fonts and STYLES, the font for each podium finish (both str
+    and int forms) - so openpyxl's styles aren't loaded by just importing main.
+    """
+    if name in FONT_NAMES:
+        import style_cache
+        return style_cache.FONTS[FONT_NAMES[name]]
+    if name == "STYLES":
+        import style_cache
+        return {position: style_cache.FONTS[font] for position, font in summary_layout.MEDAL_FONTS.items()}
+    raise AttributeError("module " + repr(__name__) + " has no attribute " + repr(name))
 
-# Dull grey without bold for non-counting (dropped) finishes
-DroppedGrey = openpyxl.styles.Font(color="e6e6e6")
 
-# Assign the appropriate styles to the finishes (both str and int forms)
-STYLES = {"1st": boldGold, "2nd": BoldSilver, "3rd": BoldBronze, 1: boldGold, 2: BoldSilver, 3: BoldBronze}
+# Workbook custom property name prefix (followed by the summary sheet name) recording what each summary sheet was built
+# from, so incremental runs can tell which week blocks are still valid
+FINGERPRINT_PROPERTY = "pyChampstandings fingerprint "
 
-# Points dictionary Finish(int): points for that finish(int)
-POINTS = {1: 25, 2: 18, 3: 15, 4: 12, 5: 10, 6: 8, 7: 6, 8: 4, 9: 2, 10: 1}
+# Prefix of the championship odds sheets written by ChampWorkBook.write_odds_sheets (followed by the series name)
+ODDS_PREFIX = "odds_"
 
-# CONFIG PARAMETER - Number of non-counted weeks in a season.
-DROPPED_WEEKS = 2
+# Prefix of the team championship sheets written by ChampWorkBook.write_team_sheets (followed by the series name)
+TEAM_PREFIX = "team_"
 
 
-def get_wb() -> openpyxl.Workbook:
+def get_wb(file_path: str = None, read_only: bool = False) -> "openpyxl.Workbook":
     """
     Launches a tkinter file selection dialog - Returns a workbook object else raises an error if there are issues.
 
     Also prints a simple error message to log.
     User Cancel or blank selection -> FileNotFoundError
     User selects invalid file openpyxl can't handle -> NameError
+    If a file_path is given no dialog is shown and tkinter is never imported.
 
+    :param file_path: optional path of the workbook to open instead of asking the user
+    :param read_only: open it as an openpyxl read_only workbook - enough to calculate from, not to edit. Close it
+        when done.
     :return: a valid workbook object for use
     :raises FileNotFoundError: if the user clicks cancel
     :raises NameError: if the user selects a file openpyxl can't parse
     """
-    # this launches a generic tkinter file open dialog in the pwd
-    root_window = tkinter.Tk()
-    root_window.withdraw()
-    file_path = tkinter.filedialog.askopenfilename()
+    if file_path is None:
+        # this launches a generic tkinter file open dialog in the pwd
+        import tkinter
+        import tkinter.filedialog
+        root_window = tkinter.Tk()
+        root_window.withdraw()
+        file_path = tkinter.filedialog.askopenfilename()
 
     # this will generally trigger if user clicked cancel
     try:
@@ -57,8 +85,9 @@ def get_wb() -> openpyxl.Workbook:
         raise FileNotFoundError
 
     # This will trigger if the user selected a bad file tha openpyxl can't parse
+    import openpyxl
     try:
-        wb = openpyxl.load_workbook(file_path)
+        wb = openpyxl.load_workbook(file_path, read_only=read_only)
     except Exception as e:
         print("error opening workbook")
         print(e)
@@ -67,131 +96,50 @@ def get_wb() -> openpyxl.Workbook:
     return wb
 
 
-class Series(object):
-    def __init__(self, sheet, drop_weeks):
-        self.sheet = sheet
-        self.drivers = []
-        self.weeks = []
-        self.drop_weeks = drop_weeks
-        self.weekly_sorted_drivers = []
-
-    def runcalc(self):
-        self.read_weeks()
-        self.read_drivers()
-        for driver in self.drivers:
-            for week in self.weeks:
-                driver.calc_points_results_by_week(week, self.drop_weeks)
-        for week in self.weeks:
-            self.sort_drivers(week)
-
-    def read_drivers(self):
-        i = 3
-        while True:
-            cell_value = self.sheet.cell(row=1, column=i).value
-            if cell_value is None:
-                break
-            d = Driver(cell_value, i)
-            assert len(self.weeks) != 0
-            d.read_results(self.sheet, len(self.weeks))
-            self.drivers.append(d)
-            i += 1
-
-    def read_weeks(self):
-        i = 2
-        while True:
-            cell_value = self.sheet.cell(row=i, column=1).value
-            if cell_value is None:
-                break
-            self.weeks.append(cell_value)
-            i += 1
-
-    def sort_drivers(self, week):
-        sorted_drivers = self.drivers.copy()
-        # sort by number of points for the week. If that is not enough then sort based on best dropped position
-        # going through all dropped positions as needed. - Need to still add Alpha drivers name last?
-        sorted_drivers = sorted(sorted_drivers,
-                                key=lambda y: [-y.weekly_points[week - 1]] + [y.weekly_dropped[week - 1][p][1] for p in
-                                                                              range(len(y.weekly_dropped[week - 1]))])
-        # currently sorting on DN* = 10000, May need alphabetical drivers name added as final condition
-        # or could make these position object then define the __lt__ for position class?
-        self.weekly_sorted_drivers.append(sorted_drivers)
-
-    def get_num_weeks(self):
-        return len(self.weeks)
-
-    def get_num_drivers(self):
-        return len(self.drivers)
-
-
-class Driver(object):
-    def __init__(self, name, col):
-        self.name = name
-        self.col = col
-        self.all_results = []
-        self.this_week_results = []
-        self.weekly_results = []
-        self.weekly_points = []
-        self.weekly_dropped = []
-
-    def read_results(self, sheet, num_weeks):
-        for i in range(2, num_weeks + 2):
-            self.all_results.append((i - 1, sheet.cell(row=i, column=self.col).value))
-
-    def calc_points_results_by_week(self, num_weeks, drop_weeks):
-        week_results = self.all_results[0:num_weeks]
-        dropped_results = []
-
-        for i in range(len(week_results)):
-            if week_results[i][1] in POINTS.keys():
-                week_results[i] = (week_results[i][0], week_results[i][1], POINTS[week_results[i][1]])
-            else:
-                week_results[i] = (week_results[i][0], week_results[i][1], 0)
+def get_column_letter(column: int) -> str:
+    """
+    :param column: 1 indexed column number
+    :return: its spreadsheet letters e.g. 1 -> "A", 28 -> "AB" - openpyxl's, imported here on first use
+    """
+    from openpyxl.utils.cell import get_column_letter as openpyxl_column_letter
+    return openpyxl_column_letter(column)
 
-        week_results = sorted(week_results, key=lambda y: y[2], reverse=True)
 
-        if num_weeks > drop_weeks:
-            for i in range(len(week_results)):
-                if i < (num_weeks - drop_weeks):
-                    week_results[i] = (week_results[i][0], week_results[i][1], week_results[i][2], 1)
-                else:
-                    week_results[i] = (week_results[i][0], week_results[i][1], week_results[i][2], 0)
-                    dropped_results.append((week_results[i][0], week_results[i][1], week_results[i][2], 0))
-        else:
-            week_results[0] = (week_results[0][0], week_results[0][1], week_results[0][2], 1)
-            for i in range(1, len(week_results)):
-                week_results[i] = (week_results[i][0], week_results[i][1], week_results[i][2], 0)
-                dropped_results.append((week_results[i][0], week_results[i][1], week_results[i][2], 0))
-
-        # Tuple format at this point is (week,position,points for position,dropped?)
-        # make it (week,position_numerical,position for print,points for position, dropped)
-
-        self.create_print_positions(week_results)
-        self.create_print_positions(dropped_results)
-
-        # sort all the dropped results in order of quality as we may need them to break ties.
-        dropped_results = sorted(dropped_results, key=lambda y: y[1])
-        self.weekly_results.append(week_results)
-        self.weekly_dropped.append(dropped_results)
-        score = 0
-        for item in week_results:
-            if item[4] == 1:
-                score += item[3]
-        self.weekly_points.append(score)
-
-    def create_print_positions(self, week_results):
-        """ take in list of Tuples format at this point is (week,position,points for position,dropped?)
-        make it list of tuples (week,position_numerical,position print,points for position, dropped)"""
-        endings_dict = {1: "st", 2: "nd", 3: "rd"}
-        for i in range(len(week_results)):
-            if type(week_results[i][1]) == str:
-                week_results[i] = (week_results[i][0], 1000, week_results[i][1], week_results[i][2], week_results[i][3])
-            elif week_results[i][1] in endings_dict.keys():
-                week_results[i] = (
-                    week_results[i][0], week_results[i][1], str(week_results[i][1]) + endings_dict[week_results[i][1]],
-                    week_results[i][2], week_results[i][3])
-            else:
-                week_results[i] = (week_results[i][0], week_results[i][1], str(week_results[i][1]) + 'th',
-                                   week_results[i][2], week_results[i][3])
+def parse_points(text: str) -> dict[int, int]:
+    """
+    Turn a comma separated points table such as "25,18,15,12" into a points dictionary {1: 25, 2: 18, ...}
+
+    :param text: points for 1st, 2nd, 3rd etc. in order
+    :return: dict of Finish(int): points for that finish(int)
+    :raises ValueError: if any entry is not a whole number
+    """
+    points = {}
+    for i, value in enumerate(text.split(",")):
+        points[i + 1] = int(value)
+    return points
+
+
+def read_tables(file_path: str, raw_str: str) -> dict[str, "ResultsTable"]:
+    """
+    Read just the results tables out of every raw data sheet of a workbook file without building the full cell model.
+
+    Uses a read_only workbook so this is for callers that only want to score the series - the workbook can't be
+    written back to from here.
+
+    :param file_path: path to a workbook matching the example format
+    :param raw_str: A string that precedes the series name in each tab full of input date in the input excel doc.
+    :return: dict of raw sheet name: ResultsTable, in workbook order
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        tables = {}
+        for sheet in wb.sheetnames:
+            if sheet[:len(raw_str)] == raw_str:
+                tables[sheet] = read_results_table(wb[sheet])
+    finally:
+        wb.close()
+    return tables
 
 
 class ChampWorkBook(object):
@@ -201,7 +149,8 @@ class ChampWorkBook(object):
     Holds a lot of formatting methods and the raw excel data
     """
 
-    def __init__(self, wb: openpyxl.Workbook, raw_str: str, summary_str: str) -> None:
+    def __init__(self, wb: "openpyxl.Workbook", raw_str: str, summary_str: str, incremental: bool = False,
+                 stats: instrumentation.Stats = None, window: int = None) -> None:
         """
         Initiate the Champ Workbook object.
 
@@ -211,6 +160,10 @@ class ChampWorkBook(object):
         :param wb: A valid openpyxl workbook containing championship data matching the example format
         :param raw_str: A string that precedes the series name in each tab full of input date in the input excel doc.
         :param summary_str: A string that will proceed each output tab name followed by the series name.
+        :param incremental: keep the existing summary sheets so update_out_sheets can add just the new weeks to them
+        :param stats: instrumentation.Stats to record timings and counters in - a new one if not given
+        :param window: summary sheets show only the blocks of this many latest weeks - every week if None. Scoring
+            always uses the full season.
         """
         self.wb = wb
         self.raw_data_sheets = []
@@ -221,6 +174,19 @@ class ChampWorkBook(object):
         self.others_sheets = []
         # blank list for storing series objects
         self.series = []
+        # (raw data sheet name, teams.TeamSeries) for each series with teams - see calc_teams
+        self.team_series = []
+        # raw data sheet name: ResultsTable read while validating, so calc_series doesn't read the sheet again
+        self.tables = {}
+        # every summary cell style is looked up by role through this per workbook cache
+        import style_cache
+        self.styles = style_cache.StyleRegistry()
+        # stage timings and work counters - see report
+        if stats is None:
+            stats = instrumentation.Stats()
+        self.stats = stats
+        # number of latest weeks shown on the summary sheets, see summary_layout.SummaryGrid
+        self.window = window
 
         # figure out which sheet objects are of which type then add them to their appropriate lists
         l_raw = len(raw_str)
@@ -233,12 +199,42 @@ class ChampWorkBook(object):
             else:
                 self.others_sheets.append(sheet)
 
-        # Wipe old summary sheets since they will be generated anew
-        for sheet in self.summary_sheets:
-            self.wb.remove(self.wb[sheet])
-        self.summary_sheets = []
+        # Wipe old summary sheets since they will be generated anew, along with every fingerprint so none can outlive
+        # the sheet it describes - init_out_sheets stores fresh ones for the sheets it can append to
+        if not incremental:
+            for sheet in self.summary_sheets:
+                self.wb.remove(self.wb[sheet])
+            self.summary_sheets = []
+            for name in self.wb.custom_doc_props.names:
+                if name.startswith(FINGERPRINT_PROPERTY):
+                    del self.wb.custom_doc_props[name]
+
+    def validate(self, status_codes: tuple[str, ...] = None, profile: rules.ScoringProfile = None) -> None:
+        """
+        Check every raw data sheet in one pass of its values before anything is calculated (see validation) and keep
+        the results tables read on the way for calc_series.
 
-    def calc_series(self, drop_weeks: int) -> None:
+        :param status_codes: strings accepted in place of a finishing position - rules.STATUS_CODES if None
+        :param profile: rules.ScoringProfile whose per series status codes are used instead of status_codes
+        :raises validation.ValidationError: listing every issue with its sheet and cell if any sheet has problems
+        """
+        import validation
+        if status_codes is None:
+            status_codes = rules.STATUS_CODES
+        issues = []
+        for sheet_name in self.raw_data_sheets:
+            with self.stats.stage("validate", sheet_name):
+                if profile is not None:
+                    status_codes = profile.rules_for(sheet_name[len(self.raw_str):]).status_codes
+                rows = list(self.wb[sheet_name].iter_rows(values_only=True))
+                issues.extend(validation.validate_rows(sheet_name, iter(rows), status_codes))
+                self.tables[sheet_name] = rows_results_table(iter(rows))
+        if issues:
+            raise validation.ValidationError(issues)
+
+    def calc_series(self, drop_weeks: int, engine: str = "python", points: dict[int, int] = None,
+                    workers: int = None, cache: results_cache.ResultsCache = None,
+                    profile: rules.ScoringProfile = None) -> None:
         """
         Run the calculation of all the basic series represented by the raw data sheets
 
@@ -246,23 +242,69 @@ class ChampWorkBook(object):
         then for each series in the list - tells that series to perform its calculation method.
 
         :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+        :param engine: "python" or "numpy" - which scoring engine each series uses
+        :param points: dict of Finish(int): points for that finish(int) - the module POINTS if not given
+        :param workers: calculate the series in this many worker processes - all in this process if None or 1
+        :param cache: ResultsCache to load unchanged series from and store newly calculated ones in - None to always
+            calculate every series
+        :param profile: rules.ScoringProfile to score each series by its own rules (looked up by the raw data sheet
+            name without the prefix) instead of drop_weeks and points
         :return: None - Alters State of the parent.
         """
+        if profile is None:
+            profile = rules.ScoringProfile(rules.ScoringRules(POINTS if points is None else points, drop_weeks))
+
+        with self.stats.stage("calc_series"):
+            # Create a series object in the self series list for each raw sheet
+            for sheet_name in self.raw_data_sheets:
+                sheet = self.wb[sheet_name]
+                self.series.append(Series(sheet, drop_weeks, engine, table=self.tables.get(sheet_name),
+                                          stats=self.stats,
+                                          scoring_rules=profile.rules_for(sheet_name[len(self.raw_str):])))
+
+            # only the series whose raw data or settings changed since they were cached need calculating
+            to_calc = []
+            keys = {}
+            for series in self.series:
+                if cache is None:
+                    to_calc.append(series)
+                    continue
+                if series.table is None:
+                    series.table = read_results_table(series.sheet)
+                keys[series] = results_cache.results_key(series.table, series.rules)
+                results = cache.get(keys[series])
+                if results is None:
+                    to_calc.append(series)
+                else:
+                    series.load_results(results)
+                    self.stats.count("cache_hits")
+
+            if workers is not None and workers > 1:
+                # each series is independent - send the raw tables out as plain data and load the plain results back
+                # in. The per series runcalc timings stay in the workers, only calc_series is timed.
+                import concurrent.futures
+                with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+                    jobs = [pool.submit(calc_table, series.table or read_results_table(series.sheet), series.drop_weeks,
+                                        engine, series.points, series.rules, series.name) for series in to_calc]
+                    for series, job in zip(to_calc, jobs):
+                        series.load_results(job.result())
+            else:
+                # run built in calculation on each of those series
+                for series in to_calc:
+                    with self.stats.stage("runcalc", series.name):
+                        series.runcalc()
 
-        # Create a series object in the self series list for each raw sheet
-        for sheet_name in self.raw_data_sheets:
-            sheet = self.wb[sheet_name]
-            self.series.append(Series(sheet, drop_weeks))
-
-        # run built in calculation on each of those series
-        for series in self.series:
-            series.runcalc()
+            if cache is not None:
+                for series in to_calc:
+                    cache.put(keys[series], series.get_results())
 
-    def init_out_sheets(self) -> None:
+    def init_out_sheets(self, workers: int = None) -> None:
         """
         create any missing blank summary sheets then format all sheets grid framework based on drivers and weeks raced
         so far. Finally print out all results data.s
 
+        :param workers: lay the sheets out in this many worker processes, writing them in here - all in this process
+            if None or 1
         :return: Alters state - New results sheets created
         """
 
@@ -273,12 +315,262 @@ class ChampWorkBook(object):
                 self.wb.create_sheet(new_summary)
                 self.summary_sheets.append(new_summary)
 
-        # run each sheet through the grid printing functions, so they have all their combined cells and grids set.
-        # then write in the calculated results data
+        if workers is not None and workers > 1:
+            # work out every cell of each sheet in parallel from plain data then write them all in this process
+            import concurrent.futures
+            with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+                jobs = [pool.submit(layout_series, self.series[i].get_results(),
+                                    self.raw_data_sheets[i][len(self.raw_str):], self.window)
+                        for i in range(len(self.series))]
+                for i in range(len(self.series)):
+                    rows, merges = jobs[i].result()
+                    with self.stats.stage("write_layout", self.series[i].name):
+                        self.write_layout(self.summary_sheets[i], rows, merges)
+
+        elif self.window is not None:
+            # only the latest weeks - lay the narrower sheets out in full rather than through the grid routines
+            for i in range(len(self.series)):
+                layout = summary_layout.SummaryLayout(self.series[i], self.raw_data_sheets[i][len(self.raw_str):],
+                                                      self.window)
+                with self.stats.stage("write_layout", self.series[i].name):
+                    self.write_layout(self.summary_sheets[i], list(layout.rows()), layout.merges())
+
+        else:
+            # run each sheet through the grid printing functions, so they have all their combined cells and grids set.
+            # then write in the calculated results data
+            for i in range(len(self.series)):
+                with self.stats.stage("format_out_sheet", self.series[i].name):
+                    self.format_out_sheet(self.summary_sheets[i], self.series[i].get_num_weeks(),
+                                          self.series[i].get_num_drivers(), self.raw_data_sheets[i][len(self.raw_str):])
+                with self.stats.stage("write_data", self.series[i].name):
+                    self.write_data(self.summary_sheets[i], self.series[i])
+
+        # windowed sheets are left without a fingerprint so a later incremental run rebuilds them with the full history
+        if self.window is None:
+            for i in range(len(self.series)):
+                self.store_fingerprint(self.summary_sheets[i], self.series[i].get_fingerprint())
+
+    def update_out_sheets(self) -> None:
+        """
+        Incremental alternative to init_out_sheets for a ChampWorkBook made with incremental=True.
+
+        Each summary sheet keeps every week block whose results (and all earlier weeks) are unchanged since it was last
+        written, then only the new or changed weeks' blocks are laid out on the end. Sheets with no usable fingerprint,
+        changed drivers or changed scoring settings are rebuilt in full.
+
+        :return: Alters state - summary sheets updated or created
+        """
         for i in range(len(self.series)):
-            self.format_out_sheet(self.summary_sheets[i], self.series[i].get_num_weeks(),
-                                  self.series[i].get_num_drivers())
-            self.write_data(self.summary_sheets[i], self.series[i])
+            summary = self.raw_data_sheets[i].replace(self.raw_str, self.summary_str)
+            series = self.series[i]
+            fingerprint = series.get_fingerprint()
+            layout = summary_layout.SummaryLayout(series, self.raw_data_sheets[i][len(self.raw_str):])
+            valid_weeks, old_weeks = self.count_valid_weeks(summary, fingerprint, layout.num_racers)
+
+            with self.stats.stage("update_sheet", series.name):
+                if valid_weeks == 0:
+                    if summary in self.wb.sheetnames:
+                        self.wb.remove(self.wb[summary])
+                    self.wb.create_sheet(summary)
+                    self.write_layout(summary, list(layout.rows()), layout.merges())
+                elif valid_weeks != layout.num_weeks or old_weeks != layout.num_weeks:
+                    self.append_weeks(summary, layout, valid_weeks, old_weeks)
+
+            if summary not in self.summary_sheets:
+                self.summary_sheets.append(summary)
+            self.store_fingerprint(summary, fingerprint)
+
+    def count_valid_weeks(self, sheet: str, fingerprint: dict, num_racers: int) -> tuple[int, int]:
+        """
+        Compare a series' fingerprint with the one stored when its summary sheet was last written.
+
+        :param sheet: summary sheet name
+        :param fingerprint: Series.get_fingerprint of the series as it is now
+        :param num_racers: number of drivers in the series now
+        :return: tuple of (number of leading week blocks still valid, number of week blocks on the sheet) - (0, 0) if
+            the sheet has to be rebuilt
+        """
+        name = FINGERPRINT_PROPERTY + sheet
+        if sheet not in self.wb.sheetnames or name not in self.wb.custom_doc_props.names:
+            return 0, 0
+        try:
+            stored = json.loads(self.wb.custom_doc_props[name].value)
+        except ValueError:
+            return 0, 0
+        if stored.get("settings") != fingerprint["settings"] or stored.get("names") != fingerprint["names"]:
+            return 0, 0
+
+        # the sheet must still be the size it was written at or it has been edited by hand
+        old_weeks = len(stored["weeks"])
+        if self.wb[sheet].max_column != summary_layout.SummaryGrid(old_weeks, num_racers).width:
+            return 0, 0
+
+        valid_weeks = 0
+        for old, new in zip(stored["weeks"], fingerprint["weeks"]):
+            if old != new:
+                break
+            valid_weeks += 1
+        return valid_weeks, old_weeks
+
+    def append_weeks(self, sheet: str, layout: summary_layout.SummaryLayout, valid_weeks: int, old_weeks: int) -> None:
+        """
+        Keep the first valid_weeks week blocks of a summary sheet, remove any old blocks after them then lay out the
+        remaining weeks of the series on the end and stretch the title across the new width.
+
+        :param sheet: summary sheet name
+        :param layout: SummaryLayout of the series as it is now
+        :param valid_weeks: number of week blocks on the sheet to keep - 1+
+        :param old_weeks: number of week blocks on the sheet now
+        """
+        ws = self.wb[sheet]
+        keep_width = summary_layout.SummaryGrid(valid_weeks, layout.num_racers).width
+
+        # drop the title merge and any merges of blocks past the kept ones, then the old blocks themselves
+        for merged in list(ws.merged_cells.ranges):
+            if merged.min_row == 1 or merged.min_col > keep_width:
+                ws.merged_cells.remove(merged)
+        old_width = summary_layout.SummaryGrid(old_weeks, layout.num_racers).width
+        if old_width > keep_width:
+            ws.delete_cols(keep_width + 1, old_width - keep_width)
+
+        if valid_weeks < layout.num_weeks:
+            self.write_layout(sheet, list(layout.rows(valid_weeks + 1)), layout.merges(valid_weeks + 1), keep_width)
+        else:
+            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=layout.width)
+            self.stats.count("merges_created")
+        # re-merging the title resets the kept title row cells so style them again
+        for column in range(2, keep_width + 1):
+            self.styles.apply(ws.cell(row=1, column=column), font="title", fill="white", border="box",
+                              alignment="center")
+
+    def store_fingerprint(self, sheet: str, fingerprint: dict) -> None:
+        """
+        Record what a summary sheet was built from in the workbook's custom properties.
+
+        :param sheet: summary sheet name
+        :param fingerprint: Series.get_fingerprint of the series the sheet shows
+        """
+        from openpyxl.packaging.custom import StringProperty
+        name = FINGERPRINT_PROPERTY + sheet
+        if name in self.wb.custom_doc_props.names:
+            del self.wb.custom_doc_props[name]
+        self.wb.custom_doc_props.append(StringProperty(name=name, value=json.dumps(fingerprint)))
+
+    def write_odds_sheets(self, remaining_rounds: int, simulations: int, seed: int = None) -> None:
+        """
+        Simulate the rest of each series' season (see odds.SeriesOdds) and write the title, podium and final place
+        chances to an odds sheet per series, replacing any from an earlier run in place. Needs numpy installed.
+
+        :param remaining_rounds: 0 or positive int for the number of rounds still to race
+        :param simulations: number of season completions to simulate per series - 1+
+        :param seed: seed for the random draws so a run can be repeated - fresh randomness if None
+        """
+        import odds
+        for i in range(len(self.series)):
+            sheet = self.raw_data_sheets[i].replace(self.raw_str, ODDS_PREFIX)
+            with self.stats.stage("simulate_odds", self.series[i].name):
+                # a different seed per series so their draws are independent
+                series_odds = odds.SeriesOdds(self.series[i], remaining_rounds, simulations,
+                                              None if seed is None else seed + i)
+            with self.stats.stage("write_layout", self.series[i].name):
+                self.fresh_sheet(sheet)
+                rows, merges = series_odds.layout(sheet.replace(ODDS_PREFIX, '', 1))
+                self.write_layout(sheet, rows, merges)
+
+    def calc_teams(self, best_cars: int = None, teams_sheet: str = None) -> None:
+        """
+        Work out the team championship of every series with teams (see teams) from its already calculated drivers.
+
+        :param best_cars: count only this many of a team's best scoring drivers each round - all of them if None
+        :param teams_sheet: sheet mapping drivers to teams for raw data sheets without a team row - teams.TEAMS_SHEET
+            if None
+        """
+        import teams
+        if teams_sheet is None:
+            teams_sheet = teams.TEAMS_SHEET
+        sheet_teams = None
+        if teams_sheet in self.wb.sheetnames:
+            sheet_teams = teams.read_teams_sheet(self.wb[teams_sheet].iter_rows(values_only=True))
+        self.team_series = []
+        for i in range(len(self.series)):
+            series = self.series[i]
+            if series.table is None:
+                series.table = read_results_table(series.sheet)
+            driver_teams = teams.driver_teams(series.table, self.raw_data_sheets[i][len(self.raw_str):], sheet_teams)
+            if not any(team is not None for team in driver_teams):
+                continue
+            with self.stats.stage("calc_teams", series.name):
+                team_series = teams.TeamSeries(series, driver_teams, best_cars, self.stats)
+                team_series.runcalc()
+            self.team_series.append((self.raw_data_sheets[i], team_series))
+
+    def write_team_sheets(self) -> None:
+        """
+        Write a team summary sheet per series with teams, replacing any from an earlier run in place. Run calc_teams
+        first.
+        """
+        for raw_sheet, team_series in self.team_series:
+            sheet = raw_sheet.replace(self.raw_str, TEAM_PREFIX)
+            with self.stats.stage("write_layout", sheet):
+                self.fresh_sheet(sheet)
+                layout = summary_layout.SummaryLayout(team_series, raw_sheet[len(self.raw_str):] + " Teams",
+                                                      self.window, "Team")
+                self.write_layout(sheet, list(layout.rows()), layout.merges())
+
+    def fresh_sheet(self, sheet: str) -> None:
+        """
+        Make an empty sheet for generated output other than the summary sheets - an existing sheet of that name is
+        replaced at the same place in the workbook, otherwise it goes on the end.
+
+        :param sheet: sheet name
+        """
+        if sheet in self.wb.sheetnames:
+            index = self.wb.sheetnames.index(sheet)
+            self.wb.remove(self.wb[sheet])
+            self.wb.create_sheet(sheet, index)
+        else:
+            self.wb.create_sheet(sheet)
+            self.others_sheets.append(sheet)
+
+    def archive_series(self, archive_path: str, season: str) -> None:
+        """
+        Append every calculated series to an all-time results archive (see archive), replacing anything archived for
+        the same season and series before.
+
+        :param archive_path: archive directory - created if it doesn't exist
+        :param season: season label the series are archived under
+        """
+        import archive
+        results_archive = archive.Archive(archive_path)
+        for series in self.series:
+            with self.stats.stage("archive", series.name):
+                results_archive.add_series(season, series.name[len(self.raw_str):], series)
+        results_archive.close()
+
+    def write_layout(self, sheet: str, rows: list[list[list]], merges: list[tuple[int, int, int, int]],
+                     first_column: int = 0) -> None:
+        """
+        Write a whole summary layout worked out elsewhere (see layout_series) into a sheet in one pass.
+
+        :param sheet: a string representing a valid, empty summary worksheet tab in the self.wb openpyxl Workbook object
+        :param rows: summary_layout.SummaryLayout rows - one [value, font, fill, border] per cell
+        :param merges: summary_layout.SummaryLayout merges
+        :param first_column: 0 indexed column the rows start at, for rows laid out from a later week
+        """
+        ws = self.wb[sheet]
+        for start_row, start_column, end_row, end_column in merges:
+            ws.merge_cells(start_row=start_row, start_column=start_column, end_row=end_row, end_column=end_column)
+        self.stats.count("merges_created", len(merges))
+        cells_written = 0
+        for row_index in range(len(rows)):
+            for column_index in range(len(rows[row_index])):
+                value, font, fill, border = rows[row_index][column_index]
+                cell = ws.cell(row=row_index + 1, column=first_column + column_index + 1)
+                if value is not None:
+                    cell.value = value
+                    cells_written += 1
+                self.styles.apply(cell, font=font, fill=fill, border=border, alignment="center")
+        self.stats.count("cells_written", cells_written)
 
     def calc_graphic_range(self, sheet: str, num_racers: int, num_weeks: int) -> GraphicRange:
         """
@@ -295,12 +587,12 @@ class ChampWorkBook(object):
         for i in range(num_weeks):
             output_width += i + 1
         ws = self.wb[sheet]
-        end_letter = openpyxl.utils.cell.get_column_letter(output_width)
+        end_letter = get_column_letter(output_width)
         end_cell = end_letter + str(output_height)
         graphic_range = ws['A1':end_cell]
         return graphic_range
 
-    def format_out_sheet(self, sheet: str, num_weeks: int, num_racers: int) -> None:
+    def format_out_sheet(self, sheet: str, num_weeks: int, num_racers: int, series_name: str) -> None:
         """
         This routine alters the sheets in the wb to have the appropriate grid lines and merged cells for all weeks and
         all the basic headers and labels - Not drivers names/points or finishes.
@@ -308,112 +600,34 @@ class ChampWorkBook(object):
         :param sheet: a string representing a valid summary worksheet tab in the self.wb openpyxl Workbook object
         :param num_weeks: The number of completed weeks in the corresponding series - Integers 1+
         :param num_racers:  The number of competitors in the series - Integers 1+
+        :param series_name: String of the series name for printing out in the title row
         """
-
-        # 3 lines worth of headers
-        output_height = 3 + num_racers
-        # 2X num weeks covers driver and pts column each week then need to add positions
-        output_width = 2 * num_weeks
-        # add 1 column for week 1, 2 for week 2 etc.
-        for i in range(num_weeks):
-            output_width += i + 1
+        grid = summary_layout.SummaryGrid(num_weeks, num_racers)
         ws = self.wb[sheet]
-        # create the top header cell full width
-        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=output_width)
-
-        # create all the week header merged cells( cols 1-3 for week 1, 4-7 for week2 etc)
-        start_week_col = 1
-        for i in range(1, num_weeks + 1):
-            ws.merge_cells(start_row=2, start_column=start_week_col, end_row=2, end_column=start_week_col + i + 1)
-            if i != 1:
-                ws.merge_cells(start_row=3, start_column=start_week_col + 2, end_row=3,
-                               end_column=start_week_col + 1 + i)
-            start_week_col += i + 2
+
+        # create the top header cell full width, all the week header merged cells( cols 1-3 for week 1, 4-7 for week2
+        # etc) and the finishes headers
+        merges = grid.merges()
+        for start_row, start_column, end_row, end_column in merges:
+            ws.merge_cells(start_row=start_row, start_column=start_column, end_row=end_row, end_column=end_column)
+        self.stats.count("merges_created", len(merges))
 
         # Get bottom right cell then create graphic range from top left to bottom right
-        end_letter = openpyxl.utils.cell.get_column_letter(output_width)
-        end_cell = end_letter + str(output_height)
+        end_letter = get_column_letter(grid.width)
+        end_cell = end_letter + str(grid.height)
         graphic_range = ws['A1':end_cell]
 
-        # center and white background fill all cells
-        white_fill = openpyxl.styles.PatternFill(start_color='FFFFFF', end_color='FFFFFF',
-                                                 fill_type='solid')  # change to FFFFFF
-        center_all = openpyxl.styles.alignment.Alignment(horizontal="center", vertical="center")
+        # center and white background fill all cells. First two headers for series name and weeks get a thick box and
+        # bold fonts. Everything else gets thick start, stop and week-break lines, thick top of row 3 and thick bottom
+        # of the last row, thin otherwise - see summary_layout.SummaryGrid.border_role
+        header_fonts = {1: "title", 2: "bold"}
         for row in graphic_range:
             for cell in row:
-                cell.alignment = center_all
-                cell.fill = white_fill
-
-        # setup border styles
-        thick_black = openpyxl.styles.Side(border_style='medium', color="000000")
-        thin_black = openpyxl.styles.Side(border_style='thin', color="000000")
-        thick_all_sides_border = openpyxl.styles.Border(left=thick_black, right=thick_black, top=thick_black,
-                                                        bottom=thick_black)
-        # First Two Headers for series name and weeks - Set Borders
-        bold14pt = openpyxl.styles.Font(size=14, bold=True)
-        bold_only = openpyxl.styles.Font(bold=True)
-        for cell in graphic_range[0]:
-            cell.border = thick_all_sides_border
-            cell.font = bold14pt
-        for cell in graphic_range[1]:
-            cell.font = bold_only
-            cell.border = thick_all_sides_border
-
-        # Calculate indices for week breaks
-        i_week_breaks = []
-        prev_stop = 0
-        for i in range(num_weeks):
-            i_week_breaks.append(prev_stop + 2 + i + 1)
-            prev_stop += 3 + i
-
-        # Format row 3 with thick upper lines and thick start stop week breaks. Thin lower line
-        row3 = graphic_range[2]
-        for i in range(len(row3)):
-            if i == 0:
-                row3[i].border = openpyxl.styles.Border(left=thick_black, top=thick_black, bottom=thin_black)
-            elif i == output_width - 1:
-                row3[i].border = openpyxl.styles.Border(right=thick_black, top=thick_black, bottom=thin_black)
-            elif i in i_week_breaks:
-                row3[i].border = openpyxl.styles.Border(left=thick_black, top=thick_black, bottom=thin_black)
-            elif i + 1 in i_week_breaks:
-                row3[i].border = openpyxl.styles.Border(right=thick_black, top=thick_black, bottom=thin_black)
-            else:
-                row3[i].border = openpyxl.styles.Border(top=thick_black, bottom=thin_black)
-
-        # format last row ith Thick bottom line and thin top line otherwise Thick week breaks.
-        row_last = graphic_range[output_height - 1]
-        for i in range(len(row_last)):
-            if i == 0:
-                row_last[i].border = openpyxl.styles.Border(left=thick_black, top=thin_black, bottom=thick_black)
-            elif i == output_width - 1:
-                row_last[i].border = openpyxl.styles.Border(right=thick_black, top=thin_black, bottom=thick_black)
-            elif i in i_week_breaks:
-                row_last[i].border = openpyxl.styles.Border(left=thick_black, top=thin_black, bottom=thick_black)
-            elif i + 1 in i_week_breaks:
-                row_last[i].border = openpyxl.styles.Border(right=thick_black, top=thin_black, bottom=thick_black)
-            else:
-                row_last[i].border = openpyxl.styles.Border(top=thin_black, bottom=thick_black)
-
-        # Format all interim lines all thin upper and lower. Thick start, stop, week-break.
-        for j in range(3, output_height - 1):
-            for i in range(output_width):
-                if i == 0:
-                    graphic_range[j][i].border = openpyxl.styles.Border(left=thick_black, top=thin_black,
-                                                                        bottom=thin_black)
-                elif i == output_width - 1:
-                    graphic_range[j][i].border = openpyxl.styles.Border(right=thick_black, top=thin_black,
-                                                                        bottom=thin_black)
-                elif i in i_week_breaks:
-                    graphic_range[j][i].border = openpyxl.styles.Border(left=thick_black, top=thin_black,
-                                                                        bottom=thin_black)
-                elif i + 1 in i_week_breaks:
-                    graphic_range[j][i].border = openpyxl.styles.Border(right=thick_black, top=thin_black,
-                                                                        bottom=thin_black)
-                else:
-                    graphic_range[j][i].border = openpyxl.styles.Border(top=thin_black, bottom=thin_black)
+                self.styles.apply(cell, font=header_fonts.get(cell.row), fill="white",
+                                  border=grid.border_role(cell.row, cell.column - 1), alignment="center")
 
-        # call routine to write the text into the header cells - Get series name by stripping summary_
-        self.write_basic_headers(sheet, num_weeks, num_racers, sheet.replace("summary_", ''))
+        # call routine to write the text into the header cells
+        self.write_basic_headers(sheet, num_weeks, num_racers, series_name)
 
     def write_basic_headers(self, sheet: str, num_weeks: int, num_racers: int, series_name: str) -> None:
         """
@@ -429,13 +643,6 @@ class ChampWorkBook(object):
         # write the series name in the top left most cell (which is really the big merged-full width centered header)
         graphic_range[0][0].value = series_name
 
-        # set up gold silver and bronze backgrounds for top three in points columns
-        gold_fill = openpyxl.styles.PatternFill(start_color='FFD700', end_color='FFD700',
-                                                fill_type='solid')
-        silver_fill = openpyxl.styles.PatternFill(start_color='C0C0C0', end_color='C0C0C0',
-                                                  fill_type='solid')
-        bronze_fill = openpyxl.styles.PatternFill(start_color='CD7F32', end_color='CD7F32',
-                                                  fill_type='solid')
         week = 1
 
         # find the top left corner of each week subbox then start the writing in all the headers and background colors
@@ -447,10 +654,12 @@ class ChampWorkBook(object):
             graphic_range[2][cell_index].value = "Driver"
             graphic_range[2][cell_index + 1].value = "Pts"
             graphic_range[2][cell_index + 2].value = "Finishes"
-            # 1st,2nd,3rd backgrounds
-            graphic_range[3][cell_index].fill = gold_fill
-            graphic_range[4][cell_index].fill = silver_fill
-            graphic_range[5][cell_index].fill = bronze_fill
+            # 1st,2nd,3rd gold silver and bronze backgrounds
+            self.styles.apply(graphic_range[3][cell_index], fill="gold")
+            self.styles.apply(graphic_range[4][cell_index], fill="silver")
+            self.styles.apply(graphic_range[5][cell_index], fill="bronze")
+        # series name then week, driver, pts and finishes headers per week
+        self.stats.count("cells_written", 1 + 4 * len(week00cells))
 
     def write_data(self, sheet: str, series: Series) -> None:
         """
@@ -485,14 +694,14 @@ class ChampWorkBook(object):
 
                 # Set color style for pts text then enter the drivers point in that cell (one to right)
                 if driver_pos in [1, 2, 3]:
-                    style = STYLES[driver_pos]
+                    style = summary_layout.MEDAL_FONTS[driver_pos]
                 else:
-                    style = BoldBlack
+                    style = "black"
                 points_cell = curr_cell.offset(column=1)
                 # TODO: Implement a get points by week method
                 points_cell.value = driver.weekly_points[index]
-                points_cell.font = style
-                print(type(points_cell))
+                self.styles.apply(points_cell, font=style)
+                self.stats.count("cells_written", 2)
 
                 # call the print positions function to continue printing the positions for that week out to the right.
                 self.print_positions(driver, week, points_cell)
@@ -503,7 +712,7 @@ class ChampWorkBook(object):
                 driver_pos = driver_index + 1
                 curr_cell = ws.cell(row=first_cells_vert + driver_index, column=first_cells_lr[index] + 1)
 
-    def print_positions(self, driver: Driver, week: int, start_pos: Cell) -> None:
+    def print_positions(self, driver: Driver, week: int, start_pos: "openpyxl.cell.cell.Cell") -> None:
         """
         Prints formatted text of all the drivers finishes for a given week starting one cell right of the passed cell
         :param driver: A valid championship Driver object
@@ -520,37 +729,42 @@ class ChampWorkBook(object):
         # TODO consider moving this to the code in the funciton that will call this one so this starts in the passed in
         #   cell
         cell_to_write = start_pos.offset(column=1)
+        self.stats.count("cells_written", len(positions))
         for pos in positions:
             # if the position is a dropped result
             if pos[4] == 0:
-                style = DroppedGrey
-                cell_to_write.font = style
+                style = "grey"
+                self.styles.apply(cell_to_write, font=style)
                 cell_to_write.value = pos[2]
             else:
                 # if not dropped is it a podium result - if so fancy formatting applied
-                if pos[2] in STYLES.keys():
-                    style = STYLES[pos[2]]
-                    cell_to_write.font = style
+                if pos[1] in summary_layout.MEDAL_FONTS.keys():
+                    style = summary_layout.MEDAL_FONTS[pos[1]]
+                    self.styles.apply(cell_to_write, font=style)
                     cell_to_write.value = pos[2]
                 else:
                     # Otherwise standard black will be written
-                    style = BoldBlack
-                    cell_to_write.font = style
+                    style = "black"
+                    self.styles.apply(cell_to_write, font=style)
                     cell_to_write.value = pos[2]
             # after writing this result keep stepping the cell to the right for next result
             cell_to_write = cell_to_write.offset(column=1)
 
-    def write_out(self) -> None:
+    def write_out(self, file_path: str = None) -> None:
         """
         Launches Tkinter save as window with default out.xlsx Raises error if  user does anything wonky like cancel
+
+        :param file_path: optional path to save to instead of asking the user - tkinter is then never imported
         """
-        # setup tkinter save as where it defaults to excel type files and will save as .xslx even if an extension is not
-        # provided by the user as long as they leave the dropdown on xlsx
-        default_extension = ".xlsx"
-        default_filename = "out" + default_extension
-        file_types = [("Excel files", "*" + default_extension), ("All files", "*.*")]
-        file_path = tkinter.filedialog.asksaveasfilename(initialfile=default_filename, filetypes=file_types,
-                                                         defaultextension=default_extension)
+        if file_path is None:
+            # setup tkinter save as where it defaults to excel type files and will save as .xslx even if an extension
+            # is not provided by the user as long as they leave the dropdown on xlsx
+            import tkinter.filedialog
+            default_extension = ".xlsx"
+            default_filename = "out" + default_extension
+            file_types = [("Excel files", "*" + default_extension), ("All files", "*.*")]
+            file_path = tkinter.filedialog.asksaveasfilename(initialfile=default_filename, filetypes=file_types,
+                                                             defaultextension=default_extension)
         # protect against user clicking cancel
         try:
             assert file_path != ''
@@ -558,7 +772,72 @@ class ChampWorkBook(object):
             print("You did not select a valid output file.")
             raise FileNotFoundError
         # then save file if  you haven't crashed by now
-        self.wb.save(file_path)
+        with self.stats.stage("save"):
+            self.wb.save(file_path)
+
+    def save_write_only(self, file_path: str) -> None:
+        """
+        Alternative to init_out_sheets then write_out - streams the summary sheets straight to file_path through an
+        openpyxl write_only workbook with the raw data and other sheets copied across. Run calc_series first.
+
+        :param file_path: path to save the new xlsx workbook to
+        """
+        import stream_out
+        with self.stats.stage("save"):
+            stream_out.save_write_only(self, file_path)
+
+    def save_svg(self, out_dir: str) -> None:
+        """
+        Write each series' standings graphic as an SVG file (see svg_out) - no workbook is involved. Run calc_series
+        first.
+
+        :param out_dir: directory to save <summary sheet name>.svg files in
+        """
+        import svg_out
+        with self.stats.stage("save_svg"):
+            svg_out.save_svg(self, out_dir)
+
+    def save_html(self, file_path: str, title: str = None) -> None:
+        """
+        Write every series' standings graphic into one static HTML page (see svg_out). Run calc_series first.
+
+        :param file_path: path to save the HTML page to
+        :param title: page title - svg_out.DEFAULT_TITLE if None
+        """
+        import svg_out
+        with self.stats.stage("save_html"):
+            svg_out.save_html(self, file_path, title)
+
+    def save_direct(self, in_path: str, out_path: str) -> None:
+        """
+        Alternative to init_out_sheets then write_out - writes the summary sheets' XML straight into a copy of the
+        in_path package, leaving every other sheet byte for byte as it was. Run calc_series first.
+
+        :param in_path: the xlsx file self.wb was read from
+        :param out_path: path to save the new xlsx workbook to
+        """
+        import direct_out
+        with self.stats.stage("save"):
+            direct_out.save_direct(self, in_path, out_path, FINGERPRINT_PROPERTY)
+
+    def report(self) -> dict:
+        """
+        Everything recorded in self.stats with the style registry's counts added.
+
+        :return: plain dict, see instrumentation.Stats.report
+        """
+        report = self.stats.report()
+        counters = report["counters"]
+        counters["styles_assigned"] = counters.get("styles_assigned", 0) + self.styles.cells_styled
+        counters["style_lookups"] = counters.get("style_lookups", 0) + self.styles.misses
+        return report
+
+    def save_report(self, file_path: str) -> None:
+        """
+        :param file_path: path to write the JSON report to
+        """
+        with open(file_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
 
     def calc_00_cells(self, num_weeks: int) -> list[int]:
         """
@@ -566,17 +845,344 @@ class ChampWorkBook(object):
         :param num_weeks: int - number of weeks in the series
         :return: List of ints - Each int is the index for the leftmost entry for that week (the position column)
         """
-        week00cells = [0]
-        for i in range(1, num_weeks):
-            week00cells.append(week00cells[i - 1] + 2 + i)
-        return week00cells
+        return summary_layout.calc_00_cells(num_weeks)
 
 
-if __name__ == '__main__':
-    RAW_NAME_BASE = "rawdata_"
-    SUMMARY_NAME_BASE = "summary_"
+def layout_series(results: dict, series_name: str,
+                  window: int = None) -> tuple[list[list[list]], list[tuple[int, int, int, int]]]:
+    """
+    Process pool worker - lay out one summary sheet from plain series results.
 
-    the_wb = ChampWorkBook(get_wb(), RAW_NAME_BASE, SUMMARY_NAME_BASE)
-    the_wb.calc_series(DROPPED_WEEKS)
-    the_wb.init_out_sheets()
-    the_wb.write_out()
+    :param results: Series.get_results plain data
+    :param series_name: String of the series name for printing out
+    :param window: show only the blocks of this many latest weeks - every week if None
+    :return: tuple of (every row of the layout, merged ranges) as plain data
+    """
+    series = Series(None, 0)
+    series.load_results(results)
+    layout = summary_layout.SummaryLayout(series, series_name, window)
+    return list(layout.rows()), layout.merges()
+
+
+def process_workbook(in_path: str, out_path: str, raw_str: str, summary_str: str, drop_weeks: int,
+                     points: dict[int, int], engine: str = "python", write_only: bool = False, direct: bool = False,
+                     incremental: bool = False, cache_size: int = None, profile: str = None, window: int = None,
+                     odds_rounds: int = None, simulations: int = None, seed: int = None, validate: bool = True,
+                     status_codes: tuple[str, ...] = None, rules_path: str = None, archive_path: str = None,
+                     season: str = None, svg_dir: str = None, html_path: str = None, teams: bool = False,
+                     best_cars: int = None, teams_sheet: str = None, workers: int = None,
+                     report_path: str = None) -> None:
+    """
+    Run one league workbook from file to file. Either path left as None falls back to the tkinter dialog.
+
+    :param in_path: path of a workbook matching the example format
+    :param out_path: path to save the updated workbook to (may be the same as in_path)
+    :param raw_str: A string that precedes the series name in each tab full of input date in the input excel doc.
+    :param summary_str: A string that will proceed each output tab name followed by the series name.
+    :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+    :param points: dict of Finish(int): points for that finish(int)
+    :param engine: "python" or "numpy" - which scoring engine each series uses
+    :param write_only: save through the streaming write_only pipeline instead of the in place formatter
+    :param direct: splice the summary sheets straight into a copy of in_path's package (see direct_out) - the workbook
+        is only read, never edited or saved through openpyxl
+    :param incremental: only add new or changed weeks to the existing summary sheets (see update_out_sheets)
+    :param cache_size: keep a results cache of up to this many bytes next to in_path so unchanged series are loaded
+        rather than recalculated - no cache if None
+    :param profile: run under one of instrumentation.PROFILE_MODES and add its summary to the report - None for none
+    :param window: summary sheets show only the blocks of this many latest weeks - every week if None
+    :param odds_rounds: also write championship odds sheets simulating this many remaining rounds (see
+        ChampWorkBook.write_odds_sheets) - no odds if None. Not with write_only or direct.
+    :param simulations: season completions simulated per series for the odds - odds.DEFAULT_SIMULATIONS if None
+    :param seed: seed for the odds simulations - fresh randomness if None
+    :param validate: check the raw data sheets before calculating anything (see ChampWorkBook.validate)
+    :param status_codes: strings accepted in place of a finishing position - rules.STATUS_CODES if None
+    :param rules_path: JSON scoring profile (see rules) giving each series its own rules on top of drop_weeks, points
+        and status_codes - None to score every series with those
+    :param archive_path: also append the calculated series to this results archive directory (see archive) - no
+        archive if None
+    :param season: season label to archive under - in_path's file name without the extension if None
+    :param svg_dir: also write each series' standings graphic as an SVG file in this directory - none if None
+    :param html_path: also write every series' standings graphic into this HTML page - none if None. With svg_dir or
+        html_path and no out_path only the graphics are written.
+    :param teams: also write a team championship sheet per series with teams (see ChampWorkBook.calc_teams). Not with
+        write_only or direct.
+    :param best_cars: count only this many of a team's best scoring drivers each round - all of them if None
+    :param teams_sheet: sheet mapping drivers to teams - teams.TEAMS_SHEET if None
+    :param workers: calculate and lay out the series in this many worker processes - all in this process if None or 1
+    :param report_path: write the JSON timings and counters report (see ChampWorkBook.report) here - None for none
+    """
+    stats = instrumentation.Stats()
+    with stats.capture(profile):
+        with stats.stage("get_wb"):
+            wb = get_wb(in_path, read_only=direct)
+        champ_wb = ChampWorkBook(wb, raw_str, summary_str, incremental, stats, window)
+        scoring_profile = None
+        if rules_path is not None:
+            scoring_profile = rules.load_profile(rules_path, rules.ScoringRules(
+                points, drop_weeks, rules.STATUS_CODES if status_codes is None else status_codes))
+        if validate:
+            champ_wb.validate(status_codes, scoring_profile)
+        cache = None
+        if cache_size is not None and in_path is not None:
+            cache = results_cache.ResultsCache(results_cache.cache_path(in_path), cache_size)
+        champ_wb.calc_series(drop_weeks, engine, points, workers, cache, scoring_profile)
+        if cache is not None:
+            cache.save()
+        if archive_path is not None:
+            if season is None:
+                season = os.path.splitext(os.path.basename(in_path))[0]
+            champ_wb.archive_series(archive_path, season)
+        if svg_dir is not None:
+            champ_wb.save_svg(svg_dir)
+        if html_path is not None:
+            champ_wb.save_html(html_path, None if in_path is None else os.path.splitext(os.path.basename(in_path))[0])
+        if out_path is None and (svg_dir is not None or html_path is not None):
+            # only the graphics were asked for
+            pass
+        elif direct:
+            champ_wb.save_direct(in_path, out_path)
+            wb.close()
+        elif write_only:
+            champ_wb.save_write_only(out_path)
+        else:
+            if incremental:
+                champ_wb.update_out_sheets()
+            else:
+                champ_wb.init_out_sheets(workers)
+            if odds_rounds is not None:
+                if simulations is None:
+                    import odds
+                    simulations = odds.DEFAULT_SIMULATIONS
+                champ_wb.write_odds_sheets(odds_rounds, simulations, seed)
+            if teams:
+                champ_wb.calc_teams(best_cars, teams_sheet)
+                champ_wb.write_team_sheets()
+            champ_wb.write_out(out_path)
+    if report_path is not None:
+        champ_wb.save_report(report_path)
+
+
+def run_batch(paths: list[tuple[str, str]], options: tuple, workers: int = None, report_dir: str = None) -> int:
+    """
+    Process many league workbooks - one after another, or a whole workbook per worker process.
+
+    :param paths: list of (input path, output path) as made by batch_paths
+    :param options: the process_workbook arguments after the two paths
+    :param workers: process this many workbooks at once - one at a time in this process if None or 1
+    :param report_dir: write each workbook's JSON report into this directory as <workbook file name>.json
+    :return: number of workbooks that failed
+    """
+    def report_path(in_path):
+        if report_dir is None:
+            return None
+        return os.path.join(report_dir, os.path.basename(in_path) + ".json")
+
+    failures = 0
+    if workers is None or workers <= 1:
+        for in_path, out_path in paths:
+            try:
+                process_workbook(in_path, out_path, *options, report_path=report_path(in_path))
+                print("processed", in_path)
+            except Exception as e:
+                # keep going so one bad league doesn't stop the rest of the batch
+                print("error processing", in_path, repr(e))
+                failures += 1
+        return failures
+
+    import concurrent.futures
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        jobs = {pool.submit(process_workbook, in_path, out_path, *options, report_path=report_path(in_path)): in_path
+                for in_path, out_path in paths}
+        for job in concurrent.futures.as_completed(jobs):
+            try:
+                job.result()
+                print("processed", jobs[job])
+            except Exception as e:
+                print("error processing", jobs[job], repr(e))
+                failures += 1
+    return failures
+
+
+def batch_paths(in_dir: str, out_dir: str) -> list[tuple[str, str]]:
+    """
+    Pair up every league workbook in a directory with its output path. Excel's ~$ lock files are skipped.
+
+    :param in_dir: directory of .xlsx league workbooks
+    :param out_dir: directory the updated workbooks are saved to under the same file names
+    :return: list of (input path, output path) sorted by file name
+    """
+    paths = []
+    for file_name in sorted(os.listdir(in_dir)):
+        if file_name.lower().endswith(".xlsx") and not file_name.startswith("~$"):
+            paths.append((os.path.join(in_dir, file_name), os.path.join(out_dir, file_name)))
+    return paths
+
+
+def parse_args(argv: list[str] = None) -> "argparse.Namespace":
+    """
+    Command line options - with no paths the original tkinter open and save dialogs are used.
+
+    :param argv: argument list, sys.argv[1:] if not given
+    :return: parsed arguments
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Update championship workbooks with pretty standings sheets.")
+    parser.add_argument("input", nargs="?", help="league workbook to read (a directory with --batch)")
+    parser.add_argument("output", nargs="?", help="path to save the updated workbook (a directory with --batch)")
+    parser.add_argument("--batch", action="store_true",
+                        help="process every .xlsx workbook in the input directory into the output directory")
+    parser.add_argument("--raw-prefix", default="rawdata_", help="prefix of the raw data sheets (default rawdata_)")
+    parser.add_argument("--summary-prefix", default="summary_",
+                        help="prefix of the generated summary sheets (default summary_)")
+    parser.add_argument("--drop-weeks", type=int, default=DROPPED_WEEKS,
+                        help="number of non-counted weeks in a season (default %(default)s)")
+    parser.add_argument("--points", type=parse_points, default=POINTS,
+                        help="comma separated points for 1st, 2nd, 3rd... e.g. 25,18,15,12,10,8,6,4,2,1")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python", help="scoring engine")
+    parser.add_argument("--write-only", action="store_true",
+                        help="save through the streaming write_only pipeline")
+    parser.add_argument("--direct", action="store_true",
+                        help="write the summary sheets straight into a copy of the input file, leaving the other "
+                             "sheets untouched - fastest for big workbooks")
+    parser.add_argument("--incremental", action="store_true",
+                        help="keep the summary week blocks that are still valid and only add new or changed weeks")
+    parser.add_argument("--cache", action="store_true",
+                        help="keep calculated series in a cache file next to the input workbook and only recalculate "
+                             "the series whose raw data changed")
+    parser.add_argument("--cache-size", type=int, default=results_cache.DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="largest size of the cache file in MB (default %(default)s)")
+    parser.add_argument("--window", type=int,
+                        help="summary sheets show only the standings of this many latest weeks instead of every week")
+    parser.add_argument("--final-only", action="store_true",
+                        help="summary sheets show only the current standings (the same as --window 1)")
+    parser.add_argument("--odds", type=int, metavar="ROUNDS",
+                        help="also write an odds_ sheet per series with each driver's title, podium and final place "
+                             "chances over this many remaining rounds (needs numpy)")
+    # the default is odds.DEFAULT_SIMULATIONS, filled in by process_workbook so odds (and numpy) only load for --odds
+    parser.add_argument("--simulations", type=int,
+                        help="season completions simulated per series for --odds (default odds.DEFAULT_SIMULATIONS)")
+    parser.add_argument("--seed", type=int, help="random seed for --odds so the simulations can be repeated")
+    parser.add_argument("--status-codes", type=lambda text: tuple(text.split(",")), default=rules.STATUS_CODES,
+                        help="comma separated results accepted in place of a finishing position (default "
+                             + ",".join(rules.STATUS_CODES) + ")")
+    parser.add_argument("--rules", metavar="PROFILE",
+                        help="JSON scoring profile of points, drop weeks, status codes, pole and fastest lap bonuses "
+                             "and round multipliers, with overrides per series - anything it leaves out comes from the "
+                             "options above")
+    parser.add_argument("--archive", metavar="DIR",
+                        help="also add the calculated series to this all-time results archive (see archive.py)")
+    parser.add_argument("--season",
+                        help="season label for --archive (default the workbook file name without the extension)")
+    parser.add_argument("--svg", metavar="DIR",
+                        help="also write each series' standings graphic as an SVG file in this directory - only the "
+                             "graphics are written when no output workbook is given")
+    parser.add_argument("--html", metavar="FILE",
+                        help="also write every series' standings graphic into this HTML page - only the graphics are "
+                             "written when no output workbook is given")
+    parser.add_argument("--teams", action="store_true",
+                        help="also write a team_ sheet per series with the team championship - teams come from a "
+                             "'Team' row under the drivers names or the --teams-sheet sheet")
+    parser.add_argument("--best-cars", type=int,
+                        help="count only this many of each team's best scoring drivers every round (default all)")
+    parser.add_argument("--teams-sheet", default="teams",
+                        help="sheet of driver, team and optional series rows for --teams (default %(default)s)")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="skip checking the raw data sheets for bad positions, status codes and week numbers")
+    parser.add_argument("--report",
+                        help="write a JSON report of stage timings and work counters to this file (a directory with "
+                             "--batch, one <workbook>.json each)")
+    parser.add_argument("--profile", choices=instrumentation.PROFILE_MODES,
+                        help="also run under cProfile or tracemalloc and add the top functions or allocation sites "
+                             "to the report")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes - series are calculated and laid out in parallel, and with --batch "
+                             "whole workbooks are processed in parallel (default 1)")
+    args = parser.parse_args(argv)
+    if args.batch and (args.input is None or args.output is None):
+        parser.error("--batch needs an input and an output directory")
+    if args.write_only and args.output is None:
+        parser.error("--write-only needs an output path")
+    if args.direct and (args.input is None or args.output is None):
+        parser.error("--direct needs an input and an output path")
+    if args.direct and (args.write_only or args.incremental):
+        parser.error("--direct can't be combined with --write-only or --incremental")
+    if args.final_only:
+        if args.window is not None:
+            parser.error("--final-only and --window can't be used together")
+        args.window = 1
+    if args.window is not None and args.window < 1:
+        parser.error("--window must be 1 or more")
+    if args.window is not None and args.incremental:
+        parser.error("--incremental only updates full history summary sheets so can't be used with --window")
+    if args.write_only and args.incremental:
+        parser.error("--incremental updates the summary sheets in place so can't be used with --write-only")
+    if args.odds is not None and (args.write_only or args.direct):
+        parser.error("--odds adds sheets to the workbook so can't be used with --write-only or --direct")
+    if args.odds is not None and args.odds < 0:
+        parser.error("--odds must be 0 or more")
+    if args.simulations is not None and args.simulations < 1:
+        parser.error("--simulations must be 1 or more")
+    if args.drop_weeks < 0:
+        parser.error("--drop-weeks must be 0 or more")
+    if args.workers < 1:
+        parser.error("--workers must be 1 or more")
+    if args.cache_size < 1:
+        parser.error("--cache-size must be 1 or more")
+    if (args.svg is not None or args.html is not None) and (args.input is None or args.batch):
+        parser.error("--svg and --html need an input path and can't be used with --batch")
+    if args.teams and (args.write_only or args.direct):
+        parser.error("--teams adds sheets to the workbook so can't be used with --write-only or --direct")
+    if args.best_cars is not None and not args.teams:
+        parser.error("--best-cars needs --teams")
+    if args.best_cars is not None and args.best_cars < 1:
+        parser.error("--best-cars must be 1 or more")
+    if args.archive is not None and args.input is None:
+        parser.error("--archive needs an input path")
+    if args.season is not None and (args.archive is None or args.batch):
+        parser.error("--season needs --archive and can't be used with --batch")
+    if args.profile is not None and args.report is None:
+        parser.error("--profile needs a --report path to write to")
+    if args.rules is not None:
+        # load it once here so a bad profile is reported before any workbook is touched
+        try:
+            rules.load_profile(args.rules, rules.ScoringRules(args.points, args.drop_weeks, args.status_codes))
+        except (OSError, ValueError) as e:
+            parser.error("--rules: " + str(e))
+    return args
+
+
+def main(argv: list[str] = None) -> int:
+    """
+    Command line entry point.
+
+    :param argv: argument list, sys.argv[1:] if not given
+    :return: process exit code - 0 when every workbook was processed
+    """
+    args = parse_args(argv)
+    cache_size = args.cache_size * 1024 * 1024 if args.cache else None
+    options = (args.raw_prefix, args.summary_prefix, args.drop_weeks, args.points, args.engine, args.write_only,
+               args.direct, args.incremental, cache_size, args.profile, args.window, args.odds, args.simulations,
+               args.seed, not args.no_validate, args.status_codes, args.rules, args.archive, args.season, args.svg,
+               args.html, args.teams, args.best_cars, args.teams_sheet)
+
+    if not args.batch:
+        # tkinter dialogs only for the paths not given on the command line
+        import validation
+        try:
+            process_workbook(args.input, args.output, *options, workers=args.workers, report_path=args.report)
+        except validation.ValidationError as e:
+            print(e)
+            return 1
+        return 0
+
+    # in a batch the workers each take whole workbooks rather than splitting up the series of one
+    os.makedirs(args.output, exist_ok=True)
+    if args.report is not None:
+        os.makedirs(args.report, exist_ok=True)
+    if run_batch(batch_paths(args.input, args.output), options, args.workers, args.report):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,132 @@
+""" Optional NumPy scoring engine - scores a whole series as a drivers x weeks matrix in batched array operations
+rather than building per-driver Python tuples for every result. Needs numpy installed, the pure Python path in
+scoring.py does not."""
+import numpy
+
+# Numerical position given to any string result (DNF, DNS etc.) - matches Driver.create_print_position
+STRING_POSITION = 1000
+
+
+def points_table(points: dict[int, int]) -> numpy.ndarray:
+    """
+    Compile a points dictionary into a dense position-indexed lookup array. Index 0 and anything past the last
+    scoring position are worth 0.
+
+    :param points: dict of Finish(int): points for that finish(int)
+    :return: int array where table[position] is the points for that position
+    """
+    table = numpy.zeros(max(points.keys()) + 2, dtype=numpy.int64)
+    for position, pts in points.items():
+        table[position] = pts
+    return table
+
+
+def points_matrix(scoring_rules, positions: numpy.ndarray, all_results: list[list]) -> numpy.ndarray:
+    """
+    Score every result of a series at once - the finishing positions index the rules' points table as an array, and
+    only the status codes (and the results with bonus marks, when the rules give bonus points) are priced one by one
+    through the rules' compiled results. The round multipliers then scale each week's column.
+
+    :param scoring_rules: rules.ScoringRules to score with
+    :param positions: int array shaped (drivers, weeks) of numerical positions, as in Driver.positions
+    :param all_results: list (one per driver) of lists of raw results in week order
+    :return: int array shaped (drivers, weeks) of the points each result scored - the same as
+        rules.ScoringRules.week_points for each driver
+    """
+    num_weeks = positions.shape[1]
+    # one extra 0 on the end of the table for everything off it
+    table = numpy.array(scoring_rules.table + [0], dtype=numpy.int64)
+    in_table = (positions >= 0) & (positions < len(table) - 1)
+    finishing = table[numpy.where(in_table, positions, len(table) - 1)]
+    bonuses = numpy.zeros_like(finishing)
+    priced = positions == STRING_POSITION
+    if any(scoring_rules.bonuses.values()):
+        priced |= numpy.array([[type(result) is str for result in results] for results in all_results],
+                              dtype=bool).reshape(positions.shape)
+    for driver, week in zip(*numpy.nonzero(priced)):
+        result = all_results[driver][week]
+        finishing[driver, week], bonuses[driver, week] = (scoring_rules.compiled.get(result)
+                                                          or scoring_rules.compile_result(result))
+    multipliers = numpy.array(scoring_rules.round_multipliers(num_weeks), dtype=numpy.int64)
+    return finishing * multipliers[None, :] + bonuses
+
+
+def counted_weeks(num_weeks: int, drop_weeks: int) -> numpy.ndarray:
+    """
+    Number of counted results for each week prefix - every week after the drop weeks counts, but always at least one.
+
+    :param num_weeks: int of number of weeks in the series
+    :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+    :return: int array shaped (weeks,)
+    """
+    return numpy.maximum(numpy.arange(1, num_weeks + 1) - drop_weeks, 1)
+
+
+class SeriesScores(object):
+    """
+    Batched scoring of one series - all arrays are indexed [driver, week prefix, result week] with the week prefix n
+    covering weeks 0..n inclusive (0 indexed).
+    """
+
+    def __init__(self, positions: numpy.ndarray, drop_weeks: int, points, names: list[str]) -> None:
+        """
+        Score every week prefix of the series at once.
+
+        :param positions: int array shaped (drivers, weeks) of numerical positions, as in Driver.positions
+        :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+        :param points: int array shaped (drivers, weeks) of the points each result scored (e.g. from
+            points_matrix), or a dict of Finish(int): points for that finish(int) to look the
+            positions up in
+        :param names: drivers names in row order - the final tie-break
+        """
+        self.positions = positions
+        num_drivers, num_weeks = positions.shape
+        if isinstance(points, dict):
+            table = points_table(points)
+            in_table = (positions >= 0) & (positions < len(table))
+            points = numpy.where(in_table, table[numpy.clip(positions, 0, len(table) - 1)], 0)
+        self.points = points.reshape(num_drivers, num_weeks)
+
+        # result i outranks result j on more points, or equal points in an earlier week - the same order as a stable
+        # sort by points of the results in week order.
+        weeks = numpy.arange(num_weeks)
+        pts_i = self.points[:, :, None]
+        pts_j = self.points[:, None, :]
+        beats = (pts_i > pts_j) | ((pts_i == pts_j) & (weeks[:, None] < weeks[None, :]))
+        # rank of result j amongst the results of week prefix n = how many results up to week n outrank it
+        self.ranks = numpy.cumsum(beats, axis=1)
+        in_prefix = weeks[None, :] <= weeks[:, None]
+        self.num_counted = counted_weeks(num_weeks, drop_weeks)
+        self.counted = in_prefix[None, :, :] & (self.ranks < self.num_counted[None, :, None])
+        self.totals = (self.points[:, None, :] * self.counted).sum(axis=2)
+
+        # Tie-break keys - each prefix's dropped positions best first then the drivers name (then row via the stable
+        # lexsort). Every driver has the same number of dropped results in a given week so these are fixed width.
+        name_rank = {name: i for i, name in enumerate(sorted(set(names)))}
+        name_ranks = numpy.array([name_rank[name] for name in names], dtype=numpy.int64)
+        self.dropped = in_prefix[None, :, :] & ~self.counted
+        self.dropped_positions = numpy.sort(numpy.where(self.dropped, positions[:, None, :],
+                                                        numpy.iinfo(numpy.int64).max), axis=2)
+        self.order = numpy.empty((num_weeks, num_drivers), dtype=numpy.int64)
+        for n in range(num_weeks):
+            num_dropped = n + 1 - self.num_counted[n]
+            keys = [self.dropped_positions[:, n, p] for p in range(num_dropped - 1, -1, -1)]
+            self.order[n] = numpy.lexsort([name_ranks] + keys + [-self.totals[:, n]])
+
+    def dropped_masks(self, driver: int) -> list[int]:
+        """
+        :param driver: index of the driver in the series
+        :return: each week prefix's dropped result weeks as a bitmask - bit j set for a dropped week j (0 indexed)
+        """
+        packed = numpy.packbits(self.dropped[driver], axis=1, bitorder="little")
+        return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+    def ranked_weeks(self, driver: int) -> list[int]:
+        """
+        All of a driver's result weeks (0 indexed) in ranking order - best points first then earliest week.
+        Any week prefix's ranking is this list filtered to the weeks in that prefix.
+
+        :param driver: index of the driver in the series
+        :return: list of week indices
+        """
+        return numpy.lexsort((numpy.arange(self.points.shape[1]), -self.points[driver])).tolist()
@@ -0,0 +1,216 @@
+""" Championship odds - Monte Carlo projection of how a calculated series could end over its remaining rounds.
+
+Each driver's finishes in the simulated rounds are drawn from their own results so far, then every simulated season is
+scored with the series' scoring rules, drop weeks and standings tie-breaks - simulated finishes score from the rules'
+points table and round multipliers, with no bonuses and nothing for a drawn DN*. Whole batches of simulations are
+scored at once as (simulations, drivers, weeks) arrays rather than through Driver and Series. Needs numpy installed."""
+import numpy
+
+import numpy_engine
+import summary_layout
+
+# Simulated season completions per series unless asked for otherwise
+DEFAULT_SIMULATIONS = 100000
+
+# Columns before the one per final place columns on an odds sheet
+HEADERS = ("Pos", "Driver", "Pts", "Title %", "Podium %", "Exp Pts")
+
+# Rough number of (simulation, driver, week) results scored per batch - bounds the memory of the batch arrays
+BATCH_RESULTS = 4000000
+
+
+def draw_rounds(rng: numpy.random.Generator, positions: numpy.ndarray, simulations: int,
+                rounds: int) -> numpy.ndarray:
+    """
+    Simulate the remaining rounds - every driver draws one of their own results so far for each round, then the drivers
+    who drew a finish are placed 1st, 2nd, 3rd... in order of the positions they drew (equal draws in random order).
+    Drivers who drew a DN* keep it.
+
+    :param rng: numpy random Generator
+    :param positions: int array shaped (drivers, weeks) of the numerical positions so far - DN* = STRING_POSITION
+    :param simulations: number of seasons to simulate
+    :param rounds: number of rounds to simulate in each
+    :return: int array shaped (simulations, drivers, rounds) of simulated numerical positions
+    """
+    num_drivers, num_weeks = positions.shape
+    picks = rng.integers(0, num_weeks, size=(simulations, rounds, num_drivers))
+    drawn = positions[numpy.arange(num_drivers), picks]
+    finished = drawn < numpy_engine.STRING_POSITION
+    # random fraction below 1 keeps the drawn order and shuffles equal draws, DN* sort after every finisher
+    keys = numpy.where(finished, drawn + rng.random(drawn.shape), numpy.inf)
+    places = numpy.empty_like(drawn)
+    numpy.put_along_axis(places, numpy.argsort(keys, axis=2), numpy.arange(1, num_drivers + 1)[None, None, :], axis=2)
+    return numpy.where(finished, places, drawn).transpose(0, 2, 1)
+
+
+def round_points(scoring_rules, positions: numpy.ndarray, first_week: int) -> numpy.ndarray:
+    """
+    Points for simulated finishes from the rules' dense points table and round multipliers.
+
+    :param scoring_rules: rules.ScoringRules of the series
+    :param positions: int array shaped (simulations, drivers, rounds) of simulated numerical positions
+    :param first_week: week number (1 indexed) of the first simulated round
+    :return: int array the same shape of the points scored
+    """
+    table = numpy.array(scoring_rules.table, dtype=numpy.int64)
+    multipliers = numpy.array(scoring_rules.round_multipliers(first_week - 1 + positions.shape[2])[first_week - 1:],
+                              dtype=numpy.int64)
+    in_table = (positions >= 0) & (positions < len(table))
+    return numpy.where(in_table, table[numpy.clip(positions, 0, len(table) - 1)], 0) * multipliers
+
+
+def score_seasons(positions: numpy.ndarray, season_points: numpy.ndarray, drop_weeks: int,
+                  names: list[str]) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Final standings of many complete seasons at once - the same counted results, points totals and tie-breaks as the
+    last week of Series.runcalc.
+
+    :param positions: int array shaped (simulations, drivers, weeks) of numerical positions
+    :param season_points: int array the same shape of the points each result scored
+    :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+    :param names: drivers names in row order - the final tie-break
+    :return: tuple of (driver indices shaped (simulations, drivers) in standings order, points totals shaped
+        (simulations, drivers))
+    """
+    num_weeks = positions.shape[2]
+
+    # results ranked by most points then earliest week - the best num_counted count, the rest are dropped. Both are
+    # packed into one key so a plain sort does the ranking (much quicker than a stable argsort)
+    num_counted = max(num_weeks - drop_weeks, 1)
+    most_points = int(season_points.max(initial=0))
+    ranked = numpy.sort((most_points - season_points) * num_weeks + numpy.arange(num_weeks), axis=2)
+    totals = (most_points - ranked[:, :, :num_counted] // num_weeks).sum(axis=2)
+    dropped = numpy.sort(numpy.take_along_axis(positions, ranked[:, :, num_counted:] % num_weeks, axis=2), axis=2)
+
+    # most points, then best dropped positions in turn, then name then column (the stable lexsort keeps row order)
+    name_rank = {name: i for i, name in enumerate(sorted(set(names)))}
+    name_ranks = numpy.broadcast_to(numpy.array([name_rank[name] for name in names], dtype=numpy.int64), totals.shape)
+    keys = [name_ranks] + [dropped[:, :, p] for p in range(dropped.shape[2] - 1, -1, -1)] + [-totals]
+    return numpy.lexsort(keys, axis=-1), totals
+
+
+class SeriesOdds(object):
+    """
+    Title, podium and final position probabilities for one calculated series, from simulated completions of its
+    season. Drivers are in the series' driver (column) order throughout.
+    """
+
+    def __init__(self, series, remaining_rounds: int, simulations: int = DEFAULT_SIMULATIONS,
+                 seed: int = None) -> None:
+        """
+        Run the simulations.
+
+        :param series: A calculated series object
+        :param remaining_rounds: 0 or positive int for the number of rounds still to race
+        :param simulations: number of season completions to simulate - 1+
+        :param seed: seed for the random draws so a run can be repeated - fresh randomness if None
+        """
+        self.series = series
+        self.remaining_rounds = remaining_rounds
+        self.simulations = simulations
+        drivers = series.drivers
+        num_drivers = len(drivers)
+        played = numpy.array([driver.positions for driver in drivers], dtype=numpy.int64)
+        played_points = numpy.array([driver.points for driver in drivers], dtype=numpy.int64)
+        names = [str(driver.name) for driver in drivers]
+        rng = numpy.random.default_rng(seed)
+
+        # position_counts[driver, place] - how many simulations the driver ended the season in place (0 indexed)
+        self.position_counts = numpy.zeros((num_drivers, num_drivers), dtype=numpy.int64)
+        points_sum = numpy.zeros(num_drivers, dtype=numpy.int64)
+        batch_size = max(BATCH_RESULTS // max(num_drivers * (played.shape[1] + remaining_rounds), 1), 1)
+        done = 0
+        while done < simulations:
+            batch = min(batch_size, simulations - done)
+            drawn = draw_rounds(rng, played, batch, remaining_rounds)
+            seasons = numpy.concatenate([numpy.broadcast_to(played, (batch,) + played.shape), drawn], axis=2)
+            season_points = numpy.concatenate(
+                [numpy.broadcast_to(played_points, (batch,) + played.shape),
+                 round_points(series.rules, drawn, played.shape[1] + 1)], axis=2)
+            order, totals = score_seasons(seasons, season_points, series.drop_weeks, names)
+            # order[s, place] is a driver, so driver * num_drivers + place counts each driver's finishing place
+            cells = order * num_drivers + numpy.arange(num_drivers)[None, :]
+            self.position_counts += numpy.bincount(cells.ravel(), minlength=num_drivers * num_drivers).reshape(
+                num_drivers, num_drivers)
+            points_sum += totals.sum(axis=0)
+            done += batch
+        self.expected_points = points_sum / simulations
+
+    def position_probabilities(self) -> numpy.ndarray:
+        """
+        :return: float array shaped (drivers, places) - chance of each driver ending the season in each place
+        """
+        return self.position_counts / self.simulations
+
+    def title_probabilities(self) -> numpy.ndarray:
+        """
+        :return: float array of each driver's chance of winning the championship
+        """
+        return self.position_counts[:, 0] / self.simulations
+
+    def podium_probabilities(self) -> numpy.ndarray:
+        """
+        :return: float array of each driver's chance of ending the season in the top 3
+        """
+        return self.position_counts[:, :3].sum(axis=1) / self.simulations
+
+    def layout(self, series_name: str) -> tuple[list[list[list]], list[tuple[int, int, int, int]]]:
+        """
+        The odds sheet for this series in summary_layout form - a title row, a header row then a row per driver in
+        current standings order with their chances as percentages.
+
+        :param series_name: String of the series name for printing out in the title row
+        :return: tuple of (rows - each a list with one [value, font role, fill role, border role] per column, merged
+            ranges) - see ChampWorkBook.write_layout
+        """
+        num_drivers = len(self.series.drivers)
+        width = len(HEADERS) + num_drivers
+        title = "%s championship odds - %d rounds to go, %d simulations" % (series_name, self.remaining_rounds,
+                                                                             self.simulations)
+        rows = [[[None, "title", "white", "box"] for column in range(width)]]
+        rows[0][0][0] = title
+        headers = list(HEADERS) + ["P" + str(place) for place in range(1, num_drivers + 1)]
+        rows.append([[header, "bold", "white", odds_border_role("header", column, width)]
+                     for column, header in enumerate(headers)])
+
+        index = {id(driver): i for i, driver in enumerate(self.series.drivers)}
+        title_odds = self.title_probabilities()
+        podium_odds = self.podium_probabilities()
+        places = self.position_probabilities()
+        standings = self.series.weekly_sorted_drivers[-1]
+        for position in range(1, num_drivers + 1):
+            driver = standings[position - 1]
+            i = index[id(driver)]
+            row_kind = "last" if position == num_drivers else "body"
+            values = [position, driver.name, driver.weekly_points[-1], percent(title_odds[i]),
+                      percent(podium_odds[i]), round(float(self.expected_points[i]), 1)]
+            values.extend(percent(chance) for chance in places[i])
+            row = [[value, None, "white", odds_border_role(row_kind, column, width)]
+                   for column, value in enumerate(values)]
+            if position <= len(summary_layout.MEDAL_FILLS):
+                row[1][2] = summary_layout.MEDAL_FILLS[position - 1]
+            row[2][1] = summary_layout.MEDAL_FONTS.get(position, "black")
+            rows.append(row)
+        return rows, [(1, 1, 1, width)]
+
+
+def odds_border_role(row_kind: str, column: int, width: int) -> str:
+    """
+    :param row_kind: "header", "body" or "last" - see summary_layout.BORDER_SIDES
+    :param column: 0 indexed column
+    :param width: number of columns on the sheet
+    :return: key into summary_layout.BORDER_SIDES for this cell
+    """
+    if column == 0:
+        return row_kind + "_left"
+    elif column == width - 1:
+        return row_kind + "_right"
+    return row_kind + "_interior"
+
+
+def percent(chance: float) -> float:
+    """
+    :param chance: probability from 0 to 1
+    :return: the same as a percentage to 1 decimal place
+    """
+    return round(float(chance) * 100, 1)
@@ -0,0 +1,107 @@
+""" Persistent results cache - keeps each calculated series (Series.get_results) in one compact binary file next to the
+workbook, keyed by a hash of the raw data sheet's values and the scoring settings, so unchanged series are loaded
+rather than recalculated on the next run.
+
+The file is a pickle of zlib compressed entries, so only point this at cache files this tool wrote itself."""
+import hashlib
+import os
+import pickle
+import time
+import zlib
+
+# Bump whenever the shape of Series.get_results changes so old cache entries are never loaded
+FORMAT_VERSION = 3
+
+# Default size limit for a cache file - least recently used series are evicted past this
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+def cache_path(workbook_path: str) -> str:
+    """
+    :param workbook_path: path of a league workbook
+    :return: path of the cache file that sits next to it
+    """
+    return workbook_path + ".champcache"
+
+
+def results_key(table, scoring_rules) -> str:
+    """
+    Content hash of everything a series' results depend on.
+
+    :param table: scoring.ResultsTable of the raw data sheet
+    :param scoring_rules: rules.ScoringRules the series is scored with
+    :return: hex digest
+    """
+    content = (FORMAT_VERSION, table.weeks, table.names, table.results, scoring_rules.key())
+    return hashlib.sha256(repr(content).encode()).hexdigest()
+
+
+class ResultsCache(object):
+    """
+    Size bounded store of compressed series results loaded from and saved to a single file.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Load the cache file if there is one - a missing, unreadable or out of date file just starts an empty cache.
+
+        :param path: cache file path, see cache_path
+        :param max_bytes: total compressed size to keep - least recently used entries are evicted past this
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        # key: [last used time, compressed results]
+        self.entries = {}
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    version, entries = pickle.load(f)
+                if version == FORMAT_VERSION:
+                    self.entries = entries
+            except Exception as e:
+                print("ignoring unreadable results cache", path)
+                print(e)
+
+    def get(self, key: str):
+        """
+        :param key: results_key of the series
+        :return: Series.get_results data, or None if it isn't cached
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry[0] = time.time()
+        self.changed = True
+        return pickle.loads(zlib.decompress(entry[1]))
+
+    def put(self, key: str, results: dict) -> None:
+        """
+        Store a series' results, evicting the least recently used entries if the cache is now too big.
+
+        :param key: results_key of the series
+        :param results: Series.get_results data
+        """
+        self.entries[key] = [time.time(), zlib.compress(pickle.dumps(results, pickle.HIGHEST_PROTOCOL))]
+        self.changed = True
+        size = sum(len(entry[1]) for entry in self.entries.values())
+        for old_key in sorted(self.entries, key=lambda y: self.entries[y][0]):
+            if size <= self.max_bytes or old_key == key:
+                break
+            size -= len(self.entries.pop(old_key)[1])
+
+    def save(self) -> None:
+        """
+        Write the cache file back out if anything changed - via a temporary file so a crash can't leave it half written.
+        """
+        if not self.changed:
+            return
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump((FORMAT_VERSION, self.entries), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.path)
+        self.changed = False
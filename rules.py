@@ -0,0 +1,235 @@
+""" Scoring rules - the points table, drop weeks, status codes, bonus points and round multipliers a series is scored
+with. Each set of rules is compiled once into a dense position-indexed points table, and every distinct raw result is
+parsed and priced once then looked up, so neither scoring engine branches per result.
+
+A scoring profile is a JSON file of default rules plus per-series overrides, e.g.
+
+    {"points": [25, 18, 15, 12, 10, 8, 6, 4, 2, 1], "drop_weeks": 2,
+     "status_codes": {"DNF": 0, "DNS": 0, "DSQ": -5}, "fastest_lap": 1, "pole": 1, "multipliers": {"10": 2},
+     "series": {"GP": {"drop_weeks": 1}, "Alpine": {"points": [10, 6, 4, 3, 2, 1], "multipliers": {}}}}
+
+Anything left out falls back to the command line settings. Series are named by their raw data sheet name without the
+prefix. Bonuses are marked after the result in a raw data cell - "1 P FL" is a win from pole with the fastest lap."""
+import json
+
+# Results accepted in place of a finishing position unless told otherwise - all worth 0 points
+STATUS_CODES = ("DNF", "DNS", "DSQ")
+
+# Bonus name: the mark for it written after a result in a raw data cell
+MARKS = {"pole": "P", "fastest_lap": "FL"}
+
+# Settings a profile (or one series in it) can give
+SETTINGS = ("points", "drop_weeks", "status_codes", "multipliers") + tuple(MARKS)
+
+
+def parse_result(result) -> tuple:
+    """
+    Split a raw data cell into the result itself and any bonus marks after it - e.g. "3 FL" -> (3, ("FL",)),
+    "DNF" -> ("DNF", ()), 3 -> (3, ()).
+
+    :param result: raw data cell value
+    :return: tuple of (finishing position int or status string - other values as they are, tuple of mark strings)
+    """
+    if not isinstance(result, str):
+        return result, ()
+    tokens = result.split()
+    if len(tokens) < 2:
+        return result, ()
+    if tokens[0].isdigit():
+        return int(tokens[0]), tuple(tokens[1:])
+    return tokens[0], tuple(tokens[1:])
+
+
+class ScoringRules(object):
+    """
+    One compiled set of scoring rules.
+
+    table[position] is the points for a finishing position (0 past the end of the points table) and compiled holds
+    (points before the round multiplier, bonus points) for every raw result priced so far.
+    """
+
+    def __init__(self, points: dict[int, int], drop_weeks: int, status_codes=STATUS_CODES, pole: int = 0,
+                 fastest_lap: int = 0, multipliers: dict[int, int] = None) -> None:
+        """
+        :param points: dict of Finish(int): points for that finish(int)
+        :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+        :param status_codes: strings accepted in place of a finishing position - a dict of code: points, or any other
+            collection of codes all worth 0
+        :param pole: bonus points for a "P" mark
+        :param fastest_lap: bonus points for an "FL" mark
+        :param multipliers: dict of week (1 indexed): whole number the week's finishing points are multiplied by -
+            weeks not given are 1. Bonuses are never multiplied.
+        """
+        self.points = dict(points)
+        self.drop_weeks = drop_weeks
+        if isinstance(status_codes, dict):
+            self.status_points = dict(status_codes)
+        else:
+            self.status_points = {code: 0 for code in status_codes}
+        self.status_codes = tuple(self.status_points)
+        self.pole = pole
+        self.fastest_lap = fastest_lap
+        self.multipliers = dict(multipliers or {})
+
+        self.table = [0] * (max(self.points, default=0) + 1)
+        for position, pts in self.points.items():
+            if position > 0:
+                self.table[position] = pts
+        self.bonuses = {MARKS["pole"]: pole, MARKS["fastest_lap"]: fastest_lap}
+        self.compiled = {}
+
+    def settings(self) -> dict:
+        """
+        :return: the constructor arguments - for making a changed copy, see with_settings
+        """
+        return {"points": self.points, "drop_weeks": self.drop_weeks, "status_codes": self.status_points,
+                "pole": self.pole, "fastest_lap": self.fastest_lap, "multipliers": self.multipliers}
+
+    def with_settings(self, settings: dict) -> "ScoringRules":
+        """
+        :param settings: any of the constructor arguments to change
+        :return: new rules with those settings changed
+        """
+        changed = self.settings()
+        changed.update(settings)
+        return ScoringRules(**changed)
+
+    def key(self) -> tuple:
+        """
+        :return: plain, repr-stable description of everything that affects the scores - for cache keys and fingerprints
+        """
+        return (sorted(self.points.items()), self.drop_weeks, sorted(self.status_points.items()), self.pole,
+                self.fastest_lap, sorted(self.multipliers.items()))
+
+    def compile_result(self, result) -> tuple[int, int]:
+        """
+        Price a raw result and remember it so it is only worked out once.
+
+        :param result: raw data cell value
+        :return: tuple of (points before the round multiplier, bonus points)
+        """
+        base, marks = parse_result(result)
+        if isinstance(base, str):
+            points = self.status_points.get(base, 0)
+        elif isinstance(base, (int, float)) and base == int(base) and 0 <= base < len(self.table):
+            points = self.table[int(base)]
+        else:
+            points = 0
+        self.compiled[result] = (points, sum(self.bonuses.get(mark, 0) for mark in marks))
+        return self.compiled[result]
+
+    def round_multipliers(self, num_weeks: int) -> list[int]:
+        """
+        :param num_weeks: int of number of weeks
+        :return: the finishing points multiplier of each of those weeks in order
+        """
+        return [self.multipliers.get(week, 1) for week in range(1, num_weeks + 1)]
+
+    def result_points(self, result, week: int) -> int:
+        """
+        :param result: raw data cell value
+        :param week: 1 indexed week of the result
+        :return: the points it scores - finishing points times the round multiplier plus bonuses
+        """
+        entry = self.compiled.get(result) or self.compile_result(result)
+        return entry[0] * self.multipliers.get(week, 1) + entry[1]
+
+    def week_points(self, results: list) -> list[int]:
+        """
+        Points scored by one driver each week.
+
+        :param results: the driver's raw results in week order
+        :return: list of points per week - finishing points times the round multiplier plus bonuses
+        """
+        compiled = self.compiled
+        multipliers = self.round_multipliers(len(results))
+        points = []
+        for i in range(len(results)):
+            entry = compiled.get(results[i]) or self.compile_result(results[i])
+            points.append(entry[0] * multipliers[i] + entry[1])
+        return points
+
+
+class ScoringProfile(object):
+    """
+    Default scoring rules plus overrides for named series.
+    """
+
+    def __init__(self, defaults: ScoringRules, settings: dict = None, series: dict[str, dict] = None) -> None:
+        """
+        :param defaults: rules for anything the settings don't give
+        :param settings: profile wide settings on top of the defaults - see SETTINGS
+        :param series: dict of series name: settings on top of the profile wide ones
+        """
+        self.defaults = defaults.with_settings(settings) if settings else defaults
+        self.series = series or {}
+        self.rules = {}
+
+    def rules_for(self, series_name: str) -> ScoringRules:
+        """
+        :param series_name: raw data sheet name without the prefix
+        :return: the compiled rules for that series - the same object every time
+        """
+        rules = self.rules.get(series_name)
+        if rules is None:
+            settings = self.series.get(series_name)
+            rules = self.defaults.with_settings(settings) if settings else self.defaults
+            self.rules[series_name] = rules
+        return rules
+
+
+def load_profile(path: str, defaults: ScoringRules) -> ScoringProfile:
+    """
+    Read a JSON scoring profile - see the module docstring for the layout.
+
+    :param path: profile file path
+    :param defaults: rules for anything the profile doesn't give
+    :return: ScoringProfile
+    :raises ValueError: for an unknown setting or a value of the wrong type
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(path + " must hold a JSON object")
+    series = data.pop("series", {})
+    if not isinstance(series, dict):
+        raise ValueError("series in " + path + " must be an object of series name: settings")
+    series = {name: parse_settings(settings, path + " series " + name) for name, settings in series.items()}
+    return ScoringProfile(defaults, parse_settings(data, path), series)
+
+
+def parse_settings(data: dict, where: str) -> dict:
+    """
+    :param data: settings as loaded from JSON
+    :param where: description of where they came from for errors
+    :return: the same as ScoringRules constructor arguments
+    :raises ValueError: for an unknown setting or a value of the wrong type
+    """
+    if not isinstance(data, dict):
+        raise ValueError("settings in " + where + " must be an object")
+    settings = {}
+    for name, value in data.items():
+        if name not in SETTINGS:
+            raise ValueError("unknown setting " + repr(name) + " in " + where + " - expected one of "
+                             + ", ".join(SETTINGS))
+        try:
+            if name == "points":
+                # a list of points for 1st, 2nd, 3rd... or an object of position: points
+                if isinstance(value, list):
+                    settings[name] = {i + 1: int(pts) for i, pts in enumerate(value)}
+                else:
+                    settings[name] = {int(position): int(pts) for position, pts in value.items()}
+            elif name == "status_codes":
+                if isinstance(value, dict):
+                    settings[name] = {str(code): int(pts) for code, pts in value.items()}
+                else:
+                    settings[name] = tuple(str(code) for code in value)
+            elif name == "multipliers":
+                settings[name] = {int(week): int(multiplier) for week, multiplier in value.items()}
+            else:
+                settings[name] = int(value)
+        except (TypeError, ValueError, AttributeError):
+            raise ValueError("bad value for " + repr(name) + " in " + where + ": " + repr(value))
+    if settings.get("drop_weeks", 0) < 0:
+        raise ValueError("drop_weeks in " + where + " must be 0 or more")
+    return settings
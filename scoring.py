@@ -0,0 +1,544 @@
+""" Scoring core - the results tables, series and drivers and the points and drop week rules, with nothing to do with
+spreadsheets. Importing this doesn't load openpyxl or tkinter, so other tools can score results without paying for
+them - main.py re-exports everything here for the existing callers. The scoring rules themselves are in rules.py."""
+import abc
+import array
+import bisect
+import collections.abc
+import functools
+import hashlib
+import itertools
+
+import instrumentation
+import rules
+
+# Points dictionary Finish(int): points for that finish(int)
+POINTS = {1: 25, 2: 18, 3: 15, 4: 12, 5: 10, 6: 8, 7: 6, 8: 4, 9: 2, 10: 1}
+
+# CONFIG PARAMETER - Number of non-counted weeks in a season.
+DROPPED_WEEKS = 2
+
+# Column A label of the optional row straight under the drivers names that gives each driver's team (see teams)
+TEAM_LABEL = "Team"
+
+# Number of distinct raw positions whose (position_numerical, position for print) is kept - see print_position
+PRINT_POSITION_CACHE_SIZE = 1024
+
+
+def read_results_table(sheet) -> "ResultsTable":
+    """
+    Pull a whole raw data sheet in one bulk pass of rows rather than one cell lookup per value.
+
+    Works on normal and read_only worksheets alike.
+
+    :param sheet: an openpyxl worksheet in the example raw data layout
+    :return: ResultsTable of the weeks, drivers and results on that sheet
+    """
+    return rows_results_table(sheet.iter_rows(values_only=True))
+
+
+def rows_results_table(rows) -> "ResultsTable":
+    """
+    :param rows: iterator of a raw data sheet's rows of cell values from row 1, as iter_rows(values_only=True) gives
+    :return: ResultsTable of the weeks, drivers and results in those rows
+    """
+    header = next(rows, ())
+
+    # Drivers names run along row 1 from column C until the first blank
+    names = []
+    for cell_value in header[2:]:
+        if cell_value is None:
+            break
+        names.append(cell_value)
+
+    # An optional team row straight under the names - otherwise that row is the first week
+    teams = None
+    first = next(rows, None)
+    if first is not None and len(first) != 0 and first[0] == TEAM_LABEL:
+        teams = list(first[2:2 + len(names)]) + [None] * (len(names) + 2 - len(first))
+    elif first is not None:
+        rows = itertools.chain((first,), rows)
+
+    # Weeks run down column A until the first blank - read_only sheets can trim short rows so pad them
+    weeks = []
+    week_rows = []
+    for row in rows:
+        if len(row) == 0 or row[0] is None:
+            break
+        weeks.append(row[0])
+        week_rows.append(row[2:2 + len(names)] + (None,) * (len(names) + 2 - len(row)))
+
+    results = [[row[i] for row in week_rows] for i in range(len(names))]
+    return ResultsTable(weeks, names, results, teams)
+
+
+class ResultsTable(object):
+    """
+    Compact copy of one raw data sheet - the week numbers, drivers names and each drivers column of results.
+    """
+
+    def __init__(self, weeks: list, names: list, results: list[list], teams: list = None) -> None:
+        """
+        :param weeks: week values from column A in sheet order
+        :param names: drivers names from row 1 in sheet order (first driver is column 3)
+        :param results: one list per driver of their raw result each week
+        :param teams: each driver's team (None for no team) from the sheet's team row - None if it has no team row
+        """
+        self.weeks = weeks
+        self.names = names
+        self.results = results
+        self.teams = teams
+        # sheet row of week 1 - the team row pushes the weeks down one
+        self.first_week_row = 2 if teams is None else 3
+
+
+class Series(object):
+    def __init__(self, sheet, drop_weeks, engine="python", table=None, points=None, stats=None, scoring_rules=None):
+        self.sheet = sheet
+        # sheet name for the per series timings - None when there is no sheet (e.g. in a pool worker)
+        self.name = sheet.title if sheet is not None else None
+        # ResultsTable read from the sheet - can be passed in ready made (e.g. from read_tables) instead of a sheet
+        self.table = table
+        self.drivers = []
+        self.weeks = []
+        self.weekly_sorted_drivers = []
+        # number of counted results for each week - shared by every driver in the series
+        self.num_counted = array.array("q")
+        # "python" scores driver by driver, "numpy" scores the whole series as arrays (needs numpy installed)
+        self.engine = engine
+        # rules.ScoringRules the series is scored with - compiled from drop_weeks and points (the module POINTS if not
+        # given) unless given, in which case it decides the drop weeks and points instead
+        if scoring_rules is None:
+            scoring_rules = rules.ScoringRules(POINTS if points is None else points, drop_weeks)
+        self.rules = scoring_rules
+        self.drop_weeks = scoring_rules.drop_weeks
+        # Points dictionary Finish(int): points for that finish(int)
+        self.points = scoring_rules.points
+        # instrumentation.Stats to time the sort into - usually the parent ChampWorkBook's
+        if stats is None:
+            stats = instrumentation.Stats()
+        self.stats = stats
+
+    def runcalc(self):
+        if self.table is None:
+            self.table = read_results_table(self.sheet)
+        self.read_weeks()
+        self.read_drivers()
+        if self.engine == "numpy":
+            self.runcalc_numpy()
+            return
+        self.num_counted = counted_weeks(len(self.weeks), self.drop_weeks)
+        for driver in self.drivers:
+            driver.calc_points_results(len(self.weeks), self.drop_weeks, self.rules, self.num_counted)
+        with self.stats.stage("sort_drivers", self.name):
+            for week in self.weeks:
+                self.sort_drivers(week)
+
+    def runcalc_numpy(self):
+        """
+        Score the whole series in batched array operations then fill in the same driver views and weekly sorted
+        drivers as the python engine.
+        """
+        import numpy
+        import numpy_engine
+        positions = numpy.array([d.positions for d in self.drivers], dtype=numpy.int64)
+        all_results = [[r[1] for r in d.all_results] for d in self.drivers]
+        points = numpy_engine.points_matrix(self.rules, positions, all_results)
+        scores = numpy_engine.SeriesScores(positions, self.drop_weeks, points, [str(d.name) for d in self.drivers])
+        self.num_counted = array.array("q", scores.num_counted.tolist())
+        for i in range(len(self.drivers)):
+            self.drivers[i].load_scores(scores, i, self.num_counted)
+        with self.stats.stage("sort_drivers", self.name):
+            for week in self.weeks:
+                self.weekly_sorted_drivers.append([self.drivers[i] for i in scores.order[week - 1]])
+
+    def add_week(self, week, results):
+        """
+        Score one more week on the end of a calculated series without going over the earlier weeks again - each
+        driver's new result is slotted into their running ranking and only the new week is sorted. Everything is
+        appended, with weeks last, so a reader in another thread only ever sees whole weeks.
+
+        :param week: the new week's number
+        :param results: each driver's raw result that week in driver column order
+        """
+        week_index = len(self.weeks)
+        self.num_counted.append(counted_weeks(week_index + 1, self.drop_weeks)[-1])
+        for driver, result in zip(self.drivers, results):
+            driver.add_week(result, self.rules.result_points(result, week_index + 1))
+        with self.stats.stage("sort_drivers", self.name):
+            self.sort_drivers(week_index + 1)
+        self.weeks.append(week)
+
+    def read_drivers(self):
+        for i in range(len(self.table.names)):
+            d = Driver(self.table.names[i], i + 3)
+            assert len(self.weeks) != 0
+            if None in self.table.results[i]:
+                # only reachable without validation - see validation.validate_rows
+                from openpyxl.utils.cell import get_column_letter
+                coordinate = get_column_letter(i + 3) + str(self.table.first_week_row
+                                                            + self.table.results[i].index(None))
+                raise ValueError(("" if self.name is None else self.name + "!") + coordinate + ": no result for "
+                                 + repr(d.name))
+            d.read_results(self.table.results[i])
+            self.drivers.append(d)
+
+    def read_weeks(self):
+        self.weeks.extend(self.table.weeks)
+
+    def sort_drivers(self, week):
+        # sort by number of points for the week. If that is not enough then sort based on best dropped position
+        # going through all dropped positions as needed, then alphabetically by drivers name - see Driver.add_week_view
+        # Each week's order rarely moves far from the week before so start from that nearly sorted order.
+        if len(self.weekly_sorted_drivers) != 0:
+            sorted_drivers = self.weekly_sorted_drivers[-1]
+        else:
+            sorted_drivers = self.drivers
+        sorted_drivers = sorted(sorted_drivers, key=lambda y: y.weekly_sort_keys[week - 1])
+        self.weekly_sorted_drivers.append(sorted_drivers)
+
+    def get_results(self) -> dict:
+        """
+        Plain data copy of everything runcalc worked out - safe to pickle across processes or store.
+
+        :return: dict of the weeks, the counted results per week, each driver's season data and each week's standings
+            as driver indices
+        """
+        drivers = []
+        for driver in self.drivers:
+            drivers.append({"name": driver.name, "col": driver.col,
+                            "results": [result[1] for result in driver.all_results], "points": driver.points,
+                            "ranked": driver.ranked, "weekly_points": driver.weekly_points,
+                            "dropped": driver.dropped})
+        index = {id(driver): i for i, driver in enumerate(self.drivers)}
+        weekly_order = [[index[id(driver)] for driver in week] for week in self.weekly_sorted_drivers]
+        return {"weeks": self.weeks, "num_counted": self.num_counted, "drivers": drivers, "weekly_order": weekly_order}
+
+    def load_results(self, results: dict) -> None:
+        """
+        Fill this series in from get_results data instead of running the calculation.
+
+        :param results: dict as made by get_results
+        """
+        self.weeks = list(results["weeks"])
+        self.num_counted = array.array("q", results["num_counted"])
+        self.drivers = []
+        for data in results["drivers"]:
+            driver = Driver(data["name"], data["col"])
+            driver.read_results(data["results"])
+            driver.points = array.array("q", data["points"])
+            driver.ranked = array.array("q", data["ranked"])
+            driver.weekly_points = array.array("q", data["weekly_points"])
+            driver.dropped = list(data["dropped"])
+            driver.num_counted = self.num_counted
+            self.drivers.append(driver)
+        self.weekly_sorted_drivers = [[self.drivers[i] for i in week] for week in results["weekly_order"]]
+
+    def get_fingerprint(self) -> dict:
+        """
+        Hashes of everything that decides the summary sheet - the scoring settings, the drivers and each week's results.
+        Week n's block only depends on weeks 1 to n so matching leading week hashes mean those blocks are unchanged.
+
+        :return: dict of settings hash, names hash and a list of one hash per week
+        """
+        def digest(value):
+            return hashlib.sha1(repr(value).encode()).hexdigest()[:16]
+
+        weeks = []
+        for i in range(len(self.weeks)):
+            weeks.append(digest((self.weeks[i],) + tuple(driver.all_results[i][1] for driver in self.drivers)))
+        return {"settings": digest(self.rules.key()),
+                "names": digest([driver.name for driver in self.drivers]), "weeks": weeks}
+
+    def get_num_weeks(self):
+        return len(self.weeks)
+
+    def get_num_drivers(self):
+        return len(self.drivers)
+
+
+class Driver(object):
+    """
+    One driver's season - results, points and ranking are stored once for the whole season and the per week views
+    (weekly_results, weekly_dropped, weekly_sort_keys) are worked out from them when read rather than kept as copies.
+    Each week's dropped results are kept as a bitmask of weeks so the standings sort keys never go back over the
+    season.
+    """
+    __slots__ = ("name", "col", "all_results", "positions", "print_positions", "points", "ranked", "num_counted",
+                 "weekly_points", "dropped", "weekly_results", "weekly_dropped", "weekly_sort_keys")
+
+    def __init__(self, name, col):
+        self.name = name
+        self.col = col
+        self.all_results = []
+        # week order season data - numerical position (DN* = 1000), position for print and points for that position
+        self.positions = array.array("q")
+        self.print_positions = []
+        self.points = array.array("q")
+        # every week (0 indexed) ranked best points first then earliest week - any week's ranking is this list
+        # filtered to the weeks raced by then
+        self.ranked = array.array("q")
+        # number of counted results for each week - shared with the rest of the series
+        self.num_counted = array.array("q")
+        # points total for each week
+        self.weekly_points = array.array("q")
+        # weeks dropped by each week as a bitmask - bit j set for a dropped week j (0 indexed)
+        self.dropped = []
+        self.weekly_results = WeeklyResults(self)
+        self.weekly_dropped = WeeklyDropped(self)
+        self.weekly_sort_keys = WeeklySortKeys(self)
+
+    def read_results(self, results):
+        for i in range(len(results)):
+            self.all_results.append((len(self.all_results) + 1, results[i]))
+            position = print_position(results[i])
+            self.positions.append(int(position[0]))
+            self.print_positions.append(position[1])
+
+    def calc_points_results(self, num_weeks, drop_weeks, points=None, num_counted=None):
+        """
+        Score the season and work out the points total for every week from 1 to num_weeks in a single pass.
+
+        Results are kept in one running list ranked by points (ties broken by the earlier week) so each new week is a
+        single insert rather than a re-slice, re-map and re-sort of the whole season so far. The best
+        (week - drop_weeks) entries of that ranking are the counted results, the rest are dropped.
+
+        :param num_weeks: int of 1+ representing the number of weeks raced so far
+        :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+        :param points: rules.ScoringRules to score with, or a dict of Finish(int): points for that finish(int) - the
+            module POINTS if not given
+        :param num_counted: counted_weeks(num_weeks, drop_weeks) shared by the whole series - made here if not given
+        """
+        if not isinstance(points, rules.ScoringRules):
+            points = rules.ScoringRules(POINTS if points is None else points, drop_weeks)
+        if num_counted is None:
+            num_counted = counted_weeks(num_weeks, drop_weeks)
+        self.points = array.array("q", points.week_points([result[1] for result in self.all_results[0:num_weeks]]))
+        self.rank_points(num_weeks, num_counted)
+
+    def rank_points(self, num_weeks, num_counted):
+        """
+        Work out the ranking and points total for every week from 1 to num_weeks from points already set for each week.
+
+        The counted total and the dropped weeks bitmask are kept running as the weeks are slotted in - a new week that
+        lands inside the counted results pushes the last counted one over to the dropped ones, and each extra counted
+        result a week brings is the one just past that boundary - so every week costs the same however long the season
+        is.
+
+        :param num_weeks: int of 1+ representing the number of weeks raced so far
+        :param num_counted: counted_weeks(num_weeks, drop_weeks) shared by the whole series
+        """
+        self.num_counted = num_counted
+        self.ranked = array.array("q")
+        self.weekly_points = array.array("q")
+        self.dropped = []
+        for i in range(num_weeks):
+            self.rank_week(i)
+
+    def rank_week(self, week_index):
+        """
+        Slot the next week into the ranking and work out its points total and dropped weeks from the week before's -
+        see rank_points.
+
+        :param week_index: 0 indexed week - the one after the last ranked week, with its points already set
+        """
+        points = self.points
+        ranked = self.ranked
+        # points of the counted results ranked[:counted] and bitmask of the dropped ones ranked[counted:]
+        counted = self.num_counted[week_index - 1] if week_index else 0
+        total = self.weekly_points[week_index - 1] if week_index else 0
+        dropped = self.dropped[week_index - 1] if week_index else 0
+        # ties stay in week order
+        place = bisect.bisect(ranked, (-points[week_index], week_index), key=lambda y: (-points[y], y))
+        ranked.insert(place, week_index)
+        if place < counted:
+            total += points[week_index] - points[ranked[counted]]
+            dropped |= 1 << ranked[counted]
+        else:
+            dropped |= 1 << week_index
+        while counted < self.num_counted[week_index]:
+            total += points[ranked[counted]]
+            dropped &= ~(1 << ranked[counted])
+            counted += 1
+        self.weekly_points.append(total)
+        self.dropped.append(dropped)
+
+    def add_week(self, result, points):
+        """
+        Add one more week on the end of the season - see Series.add_week.
+
+        :param result: raw result of the new week
+        :param points: points it scores
+        """
+        self.read_results([result])
+        self.points.append(points)
+        self.rank_week(len(self.points) - 1)
+
+    def load_scores(self, scores, index, num_counted):
+        """
+        Take this driver's points, ranking and weekly totals from a batched numpy_engine.SeriesScores rather than
+        scoring this driver in Python.
+
+        :param scores: numpy_engine.SeriesScores for the series this driver is in
+        :param index: this driver's row in the scores arrays
+        :param num_counted: number of counted results for each week, shared by the whole series
+        """
+        self.num_counted = num_counted
+        self.points = array.array("q", scores.points[index].tolist())
+        self.ranked = array.array("q", scores.ranked_weeks(index))
+        self.weekly_points = array.array("q", scores.totals[index].tolist())
+        self.dropped = scores.dropped_masks(index)
+
+    def week_results(self, week_index):
+        """
+        :param week_index: 0 indexed week
+        :return: that week's results in ranking order as (week, position_numerical, position for print, points for
+            position, counted) tuples - the counted results first
+        """
+        num_counted = self.num_counted[week_index]
+        ranked = [j for j in self.ranked if j <= week_index]
+        return [(j + 1, self.positions[j], self.print_positions[j], self.points[j], 1 if i < num_counted else 0)
+                for i, j in enumerate(ranked)]
+
+    def dropped_weeks(self, week_index):
+        """
+        :param week_index: 0 indexed week
+        :return: that week's dropped weeks (0 indexed) in order of quality as we may need them to break ties - best
+            position first, then the ranking order
+        """
+        weeks = []
+        mask = self.dropped[week_index]
+        while mask:
+            lowest = mask & -mask
+            weeks.append(lowest.bit_length() - 1)
+            mask ^= lowest
+        return sorted(weeks, key=lambda y: (self.positions[y], -self.points[y], y))
+
+    def week_dropped(self, week_index):
+        """
+        :param week_index: 0 indexed week
+        :return: that week's dropped result tuples sorted in order of quality as we may need them to break ties
+        """
+        return [(j + 1, self.positions[j], self.print_positions[j], self.points[j], 0)
+                for j in self.dropped_weeks(week_index)]
+
+    def week_sort_key(self, week_index):
+        """
+        Standings sort key - most points, then best dropped positions in turn (DN* = 1000) then drivers name and column
+        so no two drivers ever tie. Every driver drops the same number of results in a week so keys from the same week
+        are all the same width.
+
+        :param week_index: 0 indexed week
+        """
+        return ((-self.weekly_points[week_index],) + tuple(self.positions[j] for j in self.dropped_weeks(week_index))
+                + (str(self.name), self.col))
+
+    @staticmethod
+    def create_print_position(position):
+        """ take in a raw position from the sheet and return (position_numerical, position print)
+        e.g. 1 -> (1, "1st"), 12 -> (12, "12th"), "3 FL" -> (3, "3rd FL") and any other string such as DNF -> (1000,
+        "DNF")"""
+        endings_dict = {1: "st", 2: "nd", 3: "rd"}
+        if type(position) == str:
+            base, marks = rules.parse_result(position)
+            if type(base) == int:
+                return base, " ".join((Driver.create_print_position(base)[1],) + marks)
+            return 1000, position
+        elif position in endings_dict.keys():
+            return position, str(position) + endings_dict[position]
+        else:
+            return position, str(position) + 'th'
+
+
+class WeeklyView(collections.abc.Sequence):
+    """
+    Read only list-like view of one driver's per week data - indexing it works the week out from the driver's season
+    data, so nothing is stored per week.
+    """
+    __slots__ = ("driver",)
+
+    def __init__(self, driver: Driver) -> None:
+        self.driver = driver
+
+    def __len__(self) -> int:
+        return len(self.driver.weekly_points)
+
+    def __getitem__(self, index):
+        weeks = range(len(self))[index]
+        if isinstance(weeks, range):
+            return [self.week(week) for week in weeks]
+        return self.week(weeks)
+
+    @abc.abstractmethod
+    def week(self, week_index: int):
+        """
+        :param week_index: 0 indexed week
+        :return: the view's data for that week
+        """
+
+
+class WeeklyResults(WeeklyView):
+    """ Driver.weekly_results - see Driver.week_results """
+    __slots__ = ()
+
+    def week(self, week_index: int) -> list[tuple]:
+        return self.driver.week_results(week_index)
+
+
+class WeeklyDropped(WeeklyView):
+    """ Driver.weekly_dropped - see Driver.week_dropped """
+    __slots__ = ()
+
+    def week(self, week_index: int) -> list[tuple]:
+        return self.driver.week_dropped(week_index)
+
+
+class WeeklySortKeys(WeeklyView):
+    """ Driver.weekly_sort_keys - see Driver.week_sort_key """
+    __slots__ = ()
+
+    def week(self, week_index: int) -> tuple:
+        return self.driver.week_sort_key(week_index)
+
+
+@functools.lru_cache(maxsize=PRINT_POSITION_CACHE_SIZE, typed=True)
+def print_position(position) -> tuple:
+    """
+    Driver.create_print_position shared by all drivers so each print string is usually only made once. Keyed by type
+    as well as value so 3, 3.0 and True are never mixed up, and bounded so a long running service doesn't keep every
+    string ever posted.
+
+    :param position: raw position from the sheet
+    :return: (position_numerical, position for print)
+    """
+    return Driver.create_print_position(position)
+
+
+def counted_weeks(num_weeks: int, drop_weeks: int) -> array.array:
+    """
+    Number of counted results for each week - every week after the drop weeks counts, but always at least one.
+
+    :param num_weeks: int of number of weeks in the series
+    :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+    :return: typed array with one entry per week
+    """
+    return array.array("q", [max(week - drop_weeks, 1) for week in range(1, num_weeks + 1)])
+
+
+def calc_table(table: ResultsTable, drop_weeks: int, engine: str, points: dict[int, int],
+               scoring_rules: rules.ScoringRules = None, name: str = None) -> dict:
+    """
+    Process pool worker - calculate one series from its plain results table.
+
+    :param table: ResultsTable of the raw data sheet
+    :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+    :param engine: "python" or "numpy" - which scoring engine to use
+    :param points: dict of Finish(int): points for that finish(int), or None for the module POINTS
+    :param scoring_rules: rules.ScoringRules to use instead of drop_weeks and points
+    :param name: raw data sheet name, for any error
+    :return: Series.get_results plain data
+    """
+    series = Series(None, drop_weeks, engine, table=table, points=points, scoring_rules=scoring_rules)
+    series.name = name
+    series.runcalc()
+    return series.get_results()
@@ -0,0 +1,438 @@
+""" Local standings service - a long running asyncio HTTP server that keeps league workbooks parsed and scored in
+memory.
+
+Round results are posted as JSON and only the series they belong to is recalculated. Standings are served as JSON or as
+a freshly rendered xlsx. The openpyxl and scoring work runs in a bounded thread pool so the event loop keeps answering
+while a workbook renders.
+
+    python service.py league1.xlsx league2.xlsx --port 8080
+
+Routes (league is the workbook file name without .xlsx, series the raw data sheet name without its prefix):
+    GET  /leagues                                     names of the loaded leagues
+    GET  /leagues/<league>                            latest standings of every series
+    GET  /leagues/<league>/series/<series>[?week=n]   one series' standings, after week n if given
+    PUT  /leagues/<league>/series/<series>/weeks/<n>  set week n's results - body {"driver name": result, ...}
+    GET  /leagues/<league>/xlsx                       the workbook with fresh summary sheets
+    POST /leagues/<league>/save                       write the workbook with fresh summary sheets back to its file
+
+Only serve this on a trusted machine - there is no authentication."""
+import argparse
+import asyncio
+import concurrent.futures
+import http
+import io
+import json
+import os
+import urllib.parse
+
+import main
+import rules
+import stream_out
+import validation
+
+# Largest request body accepted - a round of results is a few KB
+MAX_BODY = 1024 * 1024
+
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class ServiceError(Exception):
+    """
+    A request that can't be served - turned into an HTTP error response with a JSON {"error": message} body.
+    """
+
+    def __init__(self, status: http.HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class League(object):
+    """
+    One league workbook held in memory - its results tables and a calculated series per raw data sheet, plus the full
+    openpyxl workbook once something has needed rendering.
+    """
+
+    def __init__(self, path: str, raw_str: str, summary_str: str, drop_weeks: int, points: dict[int, int],
+                 engine: str = "python", profile: rules.ScoringProfile = None) -> None:
+        """
+        Read and score every series of the workbook. Slow - run it in the service's pool.
+
+        :param path: path of a workbook matching the example format
+        :param raw_str: A string that precedes the series name in each tab full of input date in the input excel doc.
+        :param summary_str: A string that will proceed each output tab name followed by the series name.
+        :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+        :param points: dict of Finish(int): points for that finish(int)
+        :param engine: "python" or "numpy" - which scoring engine each series uses
+        :param profile: rules.ScoringProfile giving each series' rules instead of drop_weeks and points
+        """
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.raw_str = raw_str
+        self.summary_str = summary_str
+        if profile is None:
+            profile = rules.ScoringProfile(rules.ScoringRules(points, drop_weeks))
+        self.profile = profile
+        self.engine = engine
+        # raw data sheet name: ResultsTable / calculated Series, in workbook order
+        self.tables = main.read_tables(path, raw_str)
+        self.series = {}
+        for sheet, table in self.tables.items():
+            self.series[sheet] = self.calc(sheet, table)
+        # full workbook, loaded on the first render
+        self.wb = None
+        # raw data sheet name: set of weeks posted since the workbook was loaded, still to be written into it
+        self.posted = {}
+        # one change or render at a time
+        self.lock = asyncio.Lock()
+
+    def rules_for(self, sheet: str) -> rules.ScoringRules:
+        """
+        :param sheet: raw data sheet name of a series
+        :return: the rules the series is scored with
+        """
+        return self.profile.rules_for(sheet[len(self.raw_str):])
+
+    def calc(self, sheet: str, table: main.ResultsTable) -> main.Series:
+        """
+        :param sheet: raw data sheet name
+        :param table: ResultsTable of the sheet
+        :return: the series calculated from it
+        """
+        scoring_rules = self.rules_for(sheet)
+        series = main.Series(None, scoring_rules.drop_weeks, self.engine, table=table, scoring_rules=scoring_rules)
+        series.name = sheet
+        series.runcalc()
+        return series
+
+    def sheet_name(self, series_name: str) -> str:
+        """
+        :param series_name: series name as used in the routes
+        :return: its raw data sheet name
+        :raises ServiceError: 404 if the league has no such series
+        """
+        sheet = self.raw_str + series_name
+        if sheet not in self.tables:
+            raise ServiceError(http.HTTPStatus.NOT_FOUND, "no series " + repr(series_name) + " in " + self.name)
+        return sheet
+
+    def standings(self, sheet: str, week: int = None) -> dict:
+        """
+        :param sheet: raw data sheet name of the series
+        :param week: week (1 indexed) to give the standings after - the latest if None
+        :return: plain dict of the number of weeks and the standings - position, name and points of each driver
+        :raises ServiceError: 400 for a week the series hasn't raced
+        """
+        series = self.series[sheet]
+        num_weeks = series.get_num_weeks()
+        if week is None:
+            week = num_weeks
+        if not 1 <= week <= num_weeks:
+            raise ServiceError(http.HTTPStatus.BAD_REQUEST, "week must be from 1 to " + str(num_weeks))
+        standings = [{"position": i + 1, "name": driver.name, "points": driver.weekly_points[week - 1]}
+                     for i, driver in enumerate(series.weekly_sorted_drivers[week - 1])]
+        return {"series": sheet[len(self.raw_str):], "weeks": num_weeks, "week": week, "standings": standings}
+
+    def post_week(self, sheet: str, week: int, results: dict) -> None:
+        """
+        Set one week's results of a series and score just that series - a new week is added on the end of the scored
+        series, a changed week rescores the whole season. Slow - run it in the service's pool.
+
+        :param sheet: raw data sheet name of the series
+        :param week: week (1 indexed) to set - an existing week or the next one
+        :param results: dict of driver name: raw result (finishing position or a string such as DNF) for every driver
+        :raises ServiceError: 400 for a week out of order, results that don't cover exactly the series' drivers or any
+            result validation.validate_week rejects - a duplicated or out of range position, a gap in the finishing
+            order or an unknown status code
+        """
+        table = self.tables[sheet]
+        if not 1 <= week <= len(table.weeks) + 1:
+            raise ServiceError(http.HTTPStatus.BAD_REQUEST, "week must be from 1 to " + str(len(table.weeks) + 1))
+        names = [str(name) for name in table.names]
+        unknown = sorted(set(results) - set(names))
+        missing = sorted(set(names) - set(results))
+        if unknown or missing:
+            raise ServiceError(http.HTTPStatus.BAD_REQUEST, "results must cover exactly the series' drivers - unknown "
+                               + repr(unknown) + ", missing " + repr(missing))
+        for name, result in results.items():
+            if isinstance(result, bool) or not isinstance(result, (int, str)):
+                raise ServiceError(http.HTTPStatus.BAD_REQUEST, "result for " + repr(name)
+                                   + " must be a finishing position or a string such as DNF")
+        week_results = [results[name] for name in names]
+        issues = validation.validate_week(sheet, table.first_week_row + week - 1, week_results, names,
+                                          self.rules_for(sheet).status_codes)
+        if issues:
+            raise ServiceError(http.HTTPStatus.BAD_REQUEST, str(validation.ValidationError(issues)))
+
+        weeks = list(table.weeks)
+        columns = [list(column) for column in table.results]
+        if week > len(weeks):
+            weeks.append(week)
+            for column in columns:
+                column.append(None)
+        for i in range(len(names)):
+            columns[i][week - 1] = week_results[i]
+        new_table = main.ResultsTable(weeks, table.names, columns, table.teams)
+        if week > len(table.weeks):
+            # Series.add_week only appends, so the standings being served never see a half scored week
+            self.series[sheet].add_week(week, week_results)
+            self.series[sheet].table = new_table
+        else:
+            # score a new series so the one being served is never half updated
+            self.series[sheet] = self.calc(sheet, new_table)
+        self.tables[sheet] = new_table
+        self.posted.setdefault(sheet, set()).add(week)
+
+    def render(self) -> bytes:
+        """
+        The workbook with every posted week written into its raw data sheets and fresh summary sheets from the
+        calculated series. Slow - run it in the service's pool.
+
+        :return: xlsx file contents
+        """
+        if self.wb is None:
+            self.wb = main.get_wb(self.path)
+        for sheet, weeks in self.posted.items():
+            ws = self.wb[sheet]
+            table = self.tables[sheet]
+            for week in sorted(weeks):
+                row = table.first_week_row + week - 1
+                ws.cell(row=row, column=1).value = week
+                for i in range(len(table.names)):
+                    ws.cell(row=row, column=i + 3).value = table.results[i][week - 1]
+        self.posted = {}
+
+        # the summary sheets are dropped from the kept workbook the first time and streamed fresh on every render
+        champ_wb = main.ChampWorkBook(self.wb, self.raw_str, self.summary_str)
+        champ_wb.series = [self.series[sheet] for sheet in champ_wb.raw_data_sheets]
+        out = io.BytesIO()
+        stream_out.save_write_only(champ_wb, out)
+        return out.getvalue()
+
+    def save(self) -> None:
+        """
+        Render the workbook and write it back over its file. Slow - run it in the service's pool.
+        """
+        contents = self.render()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(contents)
+        os.replace(temp_path, self.path)
+
+
+class StandingsService(object):
+    """
+    The HTTP front end - routes each request to a League, running anything slow in a bounded thread pool.
+    """
+
+    def __init__(self, leagues: dict[str, League], pool: concurrent.futures.Executor) -> None:
+        """
+        :param leagues: dict of league name: League
+        :param pool: executor for the openpyxl and scoring work
+        """
+        self.leagues = leagues
+        self.pool = pool
+
+    async def run_in_pool(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve one connection - a single request then close.
+        """
+        try:
+            try:
+                method, path, query, body = await read_request(reader)
+                status, content_type, payload = await self.route(method, path, query, body)
+            except ServiceError as e:
+                status, content_type = e.status, "application/json"
+                payload = json.dumps({"error": e.message}).encode()
+            except Exception as e:
+                status, content_type = http.HTTPStatus.INTERNAL_SERVER_ERROR, "application/json"
+                payload = json.dumps({"error": repr(e)}).encode()
+            head = "HTTP/1.1 %d %s\r\nContent-Type: %s\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % (
+                status, status.phrase, content_type, len(payload))
+            writer.write(head.encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, query: dict, body: bytes) -> tuple[http.HTTPStatus, str, bytes]:
+        """
+        :param method: HTTP method
+        :param path: URL path
+        :param query: parsed query string - dict of name: list of values
+        :param body: request body
+        :return: tuple of (status, content type, response body)
+        :raises ServiceError: for anything that isn't a valid request
+        """
+        parts = [urllib.parse.unquote(part) for part in path.strip("/").split("/")]
+        if parts[0] != "leagues":
+            raise ServiceError(http.HTTPStatus.NOT_FOUND, "no route " + path)
+        if len(parts) == 1:
+            expect_method(method, "GET")
+            return json_response({"leagues": sorted(self.leagues)})
+
+        league = self.leagues.get(parts[1])
+        if league is None:
+            raise ServiceError(http.HTTPStatus.NOT_FOUND, "no league " + repr(parts[1]))
+        if len(parts) == 2:
+            expect_method(method, "GET")
+            return json_response({"league": league.name,
+                                  "series": [league.standings(sheet) for sheet in league.series]})
+        if parts[2:] == ["xlsx"]:
+            expect_method(method, "GET")
+            async with league.lock:
+                return http.HTTPStatus.OK, XLSX_TYPE, await self.run_in_pool(league.render)
+        if parts[2:] == ["save"]:
+            expect_method(method, "POST")
+            async with league.lock:
+                await self.run_in_pool(league.save)
+            return json_response({"saved": league.path})
+        if parts[2] == "series" and len(parts) == 4:
+            expect_method(method, "GET")
+            week = query.get("week")
+            return json_response(league.standings(league.sheet_name(parts[3]),
+                                                  None if week is None else parse_int(week[0], "week")))
+        if parts[2] == "series" and len(parts) == 6 and parts[4] == "weeks":
+            expect_method(method, "PUT")
+            sheet = league.sheet_name(parts[3])
+            week = parse_int(parts[5], "week")
+            try:
+                results = json.loads(body)
+            except ValueError:
+                raise ServiceError(http.HTTPStatus.BAD_REQUEST, "body must be JSON")
+            if not isinstance(results, dict):
+                raise ServiceError(http.HTTPStatus.BAD_REQUEST, "body must be a JSON object of driver name: result")
+            async with league.lock:
+                await self.run_in_pool(league.post_week, sheet, week, results)
+            return json_response(league.standings(sheet))
+        raise ServiceError(http.HTTPStatus.NOT_FOUND, "no route " + path)
+
+
+async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, dict, bytes]:
+    """
+    Read one HTTP/1.1 request.
+
+    :param reader: the connection's stream
+    :return: tuple of (method, path, parsed query string, body)
+    :raises ServiceError: 400 for a malformed request, 413 for a body over MAX_BODY
+    """
+    try:
+        method, target, version = (await reader.readline()).decode("latin-1").split()
+    except ValueError:
+        raise ServiceError(http.HTTPStatus.BAD_REQUEST, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    length = parse_int(headers.get("content-length", "0"), "Content-Length")
+    if length > MAX_BODY:
+        raise ServiceError(http.HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "body over " + str(MAX_BODY) + " bytes")
+    body = await reader.readexactly(length) if length else b""
+    url = urllib.parse.urlsplit(target)
+    return method.upper(), url.path, urllib.parse.parse_qs(url.query), body
+
+
+def expect_method(method: str, allowed: str) -> None:
+    """
+    :raises ServiceError: 405 if method isn't the one the route allows
+    """
+    if method != allowed:
+        raise ServiceError(http.HTTPStatus.METHOD_NOT_ALLOWED, "use " + allowed)
+
+
+def parse_int(text: str, what: str) -> int:
+    """
+    :raises ServiceError: 400 if text isn't a whole number
+    """
+    try:
+        return int(text)
+    except ValueError:
+        raise ServiceError(http.HTTPStatus.BAD_REQUEST, what + " must be a whole number")
+
+
+def json_response(data: dict) -> tuple[http.HTTPStatus, str, bytes]:
+    return http.HTTPStatus.OK, "application/json", json.dumps(data).encode()
+
+
+async def serve(paths: list[str], host: str, port: int, workers: int, raw_str: str, summary_str: str,
+                drop_weeks: int, points: dict[int, int], engine: str, profile: rules.ScoringProfile = None) -> None:
+    """
+    Load every league then serve them until cancelled.
+
+    :param paths: league workbook paths
+    :param host: interface to listen on
+    :param port: port to listen on
+    :param workers: threads for the openpyxl and scoring work
+    :param raw_str: A string that precedes the series name in each tab full of input date in the input excel doc.
+    :param summary_str: A string that will proceed each output tab name followed by the series name.
+    :param drop_weeks: 0 or positive int for the number of weeks in a season to be dropped
+    :param points: dict of Finish(int): points for that finish(int)
+    :param engine: "python" or "numpy" - which scoring engine each series uses
+    :param profile: rules.ScoringProfile giving each series' rules instead of drop_weeks and points
+    """
+    loop = asyncio.get_running_loop()
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        loaded = await asyncio.gather(*[loop.run_in_executor(pool, League, path, raw_str, summary_str, drop_weeks,
+                                                             points, engine, profile) for path in paths])
+        leagues = {league.name: league for league in loaded}
+        service = StandingsService(leagues, pool)
+        server = await asyncio.start_server(service.handle, host, port)
+        print("serving", ", ".join(sorted(leagues)), "on", host + ":" + str(port))
+        async with server:
+            await server.serve_forever()
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve league standings from memory over local HTTP.")
+    parser.add_argument("paths", nargs="+", help="league workbooks to serve")
+    parser.add_argument("--host", default="127.0.0.1", help="interface to listen on (default %(default)s)")
+    parser.add_argument("--port", type=int, default=8080, help="port to listen on (default %(default)s)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="threads for reading, scoring and rendering workbooks (default %(default)s)")
+    parser.add_argument("--raw-prefix", default="rawdata_",
+                        help="prefix of the sheets holding each series' results (default rawdata_)")
+    parser.add_argument("--summary-prefix", default="summary_",
+                        help="prefix of the generated summary sheets (default summary_)")
+    parser.add_argument("--drop-weeks", type=int, default=main.DROPPED_WEEKS,
+                        help="number of non-counted weeks in a season (default %(default)s)")
+    parser.add_argument("--points", type=main.parse_points, default=main.POINTS,
+                        help="comma separated points for 1st, 2nd, 3rd... e.g. 25,18,15,12,10,8,6,4,2,1")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python", help="scoring engine")
+    parser.add_argument("--status-codes", type=lambda text: tuple(text.split(",")), default=rules.STATUS_CODES,
+                        help="comma separated results accepted in place of a finishing position (default "
+                             + ",".join(rules.STATUS_CODES) + ")")
+    parser.add_argument("--rules", metavar="PROFILE",
+                        help="JSON scoring profile with overrides per series, as for main.py - anything it leaves out "
+                             "comes from the options above")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be 1 or more")
+    if args.drop_weeks < 0:
+        parser.error("--drop-weeks must be 0 or more")
+    names = [os.path.splitext(os.path.basename(path))[0] for path in args.paths]
+    if len(set(names)) != len(names):
+        parser.error("every league workbook needs a different file name")
+    args.profile = rules.ScoringProfile(rules.ScoringRules(args.points, args.drop_weeks, args.status_codes))
+    if args.rules is not None:
+        try:
+            args.profile = rules.load_profile(args.rules, args.profile.defaults)
+        except (OSError, ValueError) as e:
+            parser.error("--rules: " + str(e))
+    return args
+
+
+if __name__ == '__main__':
+    arguments = parse_args()
+    try:
+        asyncio.run(serve(arguments.paths, arguments.host, arguments.port, arguments.workers, arguments.raw_prefix,
+                          arguments.summary_prefix, arguments.drop_weeks, arguments.points, arguments.engine,
+                          arguments.profile))
+    except KeyboardInterrupt:
+        pass
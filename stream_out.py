@@ -0,0 +1,102 @@
+""" write_only output pipeline - streams each summary sheet row by row through an openpyxl write_only workbook instead
+of formatting a fully loaded workbook cell by cell. Merged ranges and every style object are worked out ahead of time
+from summary_layout, the raw data and other sheets are copied across as they are."""
+import copy
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.cell_range import CellRange
+
+import instrumentation
+import style_cache
+import summary_layout
+
+
+def save_write_only(champ_wb, file_path: str) -> None:
+    """
+    Save a calculated ChampWorkBook to file_path through a write_only workbook.
+
+    Sheets come out in the same order as ChampWorkBook.init_out_sheets then write_out would give - every raw data and
+    other sheet as it was followed by a fresh summary sheet per series. champ_wb.wb itself is left untouched.
+
+    :param champ_wb: ChampWorkBook that has already had calc_series run
+    :param file_path: path to save the new xlsx workbook to
+    """
+    out_wb = openpyxl.Workbook(write_only=True)
+    for sheet_name in champ_wb.wb.sheetnames:
+        copy_sheet(champ_wb.wb[sheet_name], out_wb.create_sheet(sheet_name))
+
+    styles = style_cache.StyleRegistry()
+    for i in range(len(champ_wb.series)):
+        summary_name = champ_wb.raw_data_sheets[i].replace(champ_wb.raw_str, champ_wb.summary_str)
+        layout = summary_layout.SummaryLayout(champ_wb.series[i],
+                                              champ_wb.raw_data_sheets[i][len(champ_wb.raw_str):], champ_wb.window)
+        write_summary_sheet(out_wb.create_sheet(summary_name), layout, styles, champ_wb.stats)
+
+    out_wb.save(file_path)
+    champ_wb.stats.count("styles_assigned", styles.cells_styled)
+    champ_wb.stats.count("style_lookups", styles.misses)
+
+
+def write_summary_sheet(ws, layout: summary_layout.SummaryLayout, styles: style_cache.StyleRegistry,
+                        stats: instrumentation.Stats = None) -> None:
+    """
+    Stream one series' standings graphic into a write_only worksheet.
+
+    :param ws: empty write_only worksheet
+    :param layout: SummaryLayout of the series to write
+    :param styles: StyleRegistry for the write_only workbook ws belongs to
+    :param stats: instrumentation.Stats to time the sheet and count the cells and merges in
+    """
+    if stats is None:
+        stats = instrumentation.Stats()
+    with stats.stage("write_summary_sheet", layout.series.name):
+        merges = layout.merges()
+        for start_row, start_column, end_row, end_column in merges:
+            ws.merged_cells.add(CellRange(min_col=start_column, min_row=start_row, max_col=end_column,
+                                          max_row=end_row))
+        stats.count("merges_created", len(merges))
+        cells_written = 0
+        for row in layout.rows():
+            out_row = []
+            for value, font, fill, border in row:
+                cell = WriteOnlyCell(ws, value)
+                styles.apply(cell, font, fill, border, "center")
+                out_row.append(cell)
+                if value is not None:
+                    cells_written += 1
+            ws.append(out_row)
+        stats.count("cells_written", cells_written)
+
+
+def copy_sheet(source, ws) -> None:
+    """
+    Copy a normal worksheet's values, cell styles, merged ranges, column widths, row heights and frozen panes into a
+    write_only worksheet. Charts, images and other drawing objects are not carried across.
+
+    :param source: worksheet from a fully loaded workbook
+    :param ws: empty write_only worksheet
+    """
+    for key, dimension in source.column_dimensions.items():
+        if dimension.width is not None:
+            ws.column_dimensions[key].width = dimension.width
+    for key, dimension in source.row_dimensions.items():
+        if dimension.height is not None:
+            ws.row_dimensions[key].height = dimension.height
+    ws.freeze_panes = source.freeze_panes
+    for merged in source.merged_cells.ranges:
+        ws.merged_cells.add(merged.coord)
+
+    for row in source.iter_rows():
+        out_row = []
+        for source_cell in row:
+            cell = WriteOnlyCell(ws, source_cell.value)
+            if source_cell.has_style:
+                cell.font = copy.copy(source_cell.font)
+                cell.fill = copy.copy(source_cell.fill)
+                cell.border = copy.copy(source_cell.border)
+                cell.alignment = copy.copy(source_cell.alignment)
+                cell.number_format = source_cell.number_format
+                cell.protection = copy.copy(source_cell.protection)
+            out_row.append(cell)
+        ws.append(out_row)
@@ -0,0 +1,83 @@
+""" Shared style registry for the summary sheets - every Font, Fill, Border and Alignment the standings layout can
+need is built once here and looked up by role, and complete cell styles are cached per workbook so each cell is styled
+with one copy instead of an openpyxl style lookup per attribute."""
+import copy
+
+import openpyxl.styles
+
+import summary_layout
+
+# Everything in the graphic is centered
+ALIGNMENTS = {"center": openpyxl.styles.alignment.Alignment(horizontal="center", vertical="center")}
+
+# Title and week header fonts, then bold gold for all counted 1st place finishes - bold silver second, bold bronze
+# third, bold black counted non-podium finishes and dull grey without bold for non-counting (dropped) finishes
+FONTS = {"title": openpyxl.styles.Font(size=14, bold=True),
+         "bold": openpyxl.styles.Font(bold=True),
+         "gold": openpyxl.styles.Font(bold=True, color="ffc200"),
+         "silver": openpyxl.styles.Font(bold=True, color="9a9a9a"),
+         "bronze": openpyxl.styles.Font(bold=True, color="CD7F32"),
+         "black": openpyxl.styles.Font(bold=True),
+         "grey": openpyxl.styles.Font(color="e6e6e6")}
+
+# White background for the whole graphic, gold silver and bronze backgrounds for the top three drivers each week
+FILLS = {"white": openpyxl.styles.PatternFill(start_color='FFFFFF', end_color='FFFFFF', fill_type='solid'),
+         "gold": openpyxl.styles.PatternFill(start_color='FFD700', end_color='FFD700', fill_type='solid'),
+         "silver": openpyxl.styles.PatternFill(start_color='C0C0C0', end_color='C0C0C0', fill_type='solid'),
+         "bronze": openpyxl.styles.PatternFill(start_color='CD7F32', end_color='CD7F32', fill_type='solid')}
+
+# One border per layout role (title/week box, left edge or week break, right edge or week end, interior for each row)
+SIDES = {"medium": openpyxl.styles.Side(border_style='medium', color="000000"),
+         "thin": openpyxl.styles.Side(border_style='thin', color="000000"),
+         None: openpyxl.styles.Side()}
+BORDERS = {role: openpyxl.styles.Border(left=SIDES[left], right=SIDES[right], top=SIDES[top], bottom=SIDES[bottom])
+           for role, (left, right, top, bottom) in summary_layout.BORDER_SIDES.items()}
+
+
+class StyleRegistry(object):
+    """
+    Per workbook cache of finished cell styles.
+
+    The first time a cell with a given style is given a role combination the styles are assigned through openpyxl as
+    normal (which registers them with the workbook) and the resulting cell style is remembered. Every later cell
+    starting from the same style with the same roles just copies that result.
+    """
+
+    def __init__(self) -> None:
+        self.styles = {}
+        # counters for reporting - cells styled in total and how many needed a real openpyxl style lookup
+        self.cells_styled = 0
+        self.misses = 0
+
+    def apply(self, cell, font: str = None, fill: str = None, border: str = None, alignment: str = None) -> None:
+        """
+        Style a cell by role - any role left as None keeps the cell's current style for that attribute.
+
+        :param cell: openpyxl Cell, MergedCell or WriteOnlyCell - all cells styled by one registry must belong to the
+            same workbook
+        :param font: key into FONTS
+        :param fill: key into FILLS
+        :param border: key into BORDERS
+        :param alignment: key into ALIGNMENTS
+        """
+        self.cells_styled += 1
+        # cells that have never been styled have no style array yet
+        if cell.has_style:
+            key = (tuple(cell._style), font, fill, border, alignment)
+        else:
+            key = (None, font, fill, border, alignment)
+        style = self.styles.get(key)
+        if style is not None:
+            cell._style = copy.copy(style)
+            return
+
+        self.misses += 1
+        if font is not None:
+            cell.font = FONTS[font]
+        if fill is not None:
+            cell.fill = FILLS[fill]
+        if border is not None:
+            cell.border = BORDERS[border]
+        if alignment is not None:
+            cell.alignment = ALIGNMENTS[alignment]
+        self.styles[key] = copy.copy(cell._style)
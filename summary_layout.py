@@ -0,0 +1,202 @@
+""" Summary sheet layout - works out every cell of a series' standings graphic (value plus font, fill and border role)
+and the merged ranges, without touching any spreadsheet library. The same grid as ChampWorkBook.format_out_sheet,
+write_basic_headers and write_data build cell by cell, so any renderer can stream it out row by row."""
+
+# Border sides for each border role - (left, right, top, bottom) with None for no line
+# "box" is the full outline of the title and week header rows. Every other role is row kind + "_" + column kind.
+BORDER_SIDES = {"box": ("medium", "medium", "medium", "medium")}
+for _row_kind, _top, _bottom in (("header", "medium", "thin"), ("body", "thin", "thin"), ("last", "thin", "medium")):
+    BORDER_SIDES[_row_kind + "_left"] = ("medium", None, _top, _bottom)
+    BORDER_SIDES[_row_kind + "_right"] = (None, "medium", _top, _bottom)
+    BORDER_SIDES[_row_kind + "_interior"] = (None, None, _top, _bottom)
+
+# Font roles for the podium places (both str and int forms) - anything else counted is "black", dropped is "grey"
+MEDAL_FONTS = {"1st": "gold", "2nd": "silver", "3rd": "bronze", 1: "gold", 2: "silver", 3: "bronze"}
+
+# Background fill roles for the top three drivers names each week
+MEDAL_FILLS = ("gold", "silver", "bronze")
+
+
+def calc_00_cells(num_weeks: int) -> list[int]:
+    """
+    Calculate the column for the left of each week sub box
+
+    :param num_weeks: int - number of weeks in the series
+    :return: List of ints - Each int is the index for the leftmost entry for that week (the position column)
+    """
+    week00cells = [0]
+    for i in range(1, num_weeks):
+        week00cells.append(week00cells[i - 1] + 2 + i)
+    return week00cells
+
+
+class SummaryGrid(object):
+    """
+    The shape of a standings graphic - 3 header rows then a row per driver, with a block of driver, points and one
+    finishes column per week raced for every week shown. Sizes, merged ranges and border roles only.
+
+    Every week is shown by default, which makes the width grow with the square of the weeks raced. A window shows just
+    the blocks of the latest weeks (a window of 1 is the current standings only) - each block is still the full
+    standings of its week.
+    """
+
+    def __init__(self, num_weeks: int, num_racers: int, window: int = None) -> None:
+        """
+        :param num_weeks: The number of completed weeks in the corresponding series - Integers 1+
+        :param num_racers:  The number of competitors in the series - Integers 1+
+        :param window: show only the blocks of this many latest weeks (1+) - every week if None
+        """
+        self.num_weeks = num_weeks
+        self.num_racers = num_racers
+        self.window = window
+        # first week shown (1 indexed)
+        if window is None:
+            self.first_shown = 1
+        else:
+            self.first_shown = max(num_weeks - window + 1, 1)
+
+        # 3 lines worth of headers
+        self.height = 3 + self.num_racers
+        # 0 indexed left column of each shown week's block (indexed by week - first_shown) and the total width. Each
+        # block is a driver and pts column then one finishes column per week raced so far.
+        self.week00cells = []
+        self.width = 0
+        for week in range(self.first_shown, self.num_weeks + 1):
+            self.week00cells.append(self.width)
+            self.width += 2 + week
+        # 0 indexed columns that start a new week (the left hand thick line)
+        self.week_breaks = set(cell_index for cell_index in self.week00cells[1:])
+
+    def week_start(self, week: int) -> int:
+        """
+        :param week: 1 indexed week - must be shown
+        :return: 0 indexed left column of that week's block
+        """
+        return self.week00cells[week - self.first_shown]
+
+    def merges(self, first_week: int = None) -> list[tuple[int, int, int, int]]:
+        """
+        All the merged cell ranges - full width title, each week's header and each multi-week finishes header.
+
+        :param first_week: only give the week headers from this week on (the title is always included) - from the
+            first shown week if None
+        :return: list of (start_row, start_column, end_row, end_column) - 1 indexed like openpyxl
+        """
+        if first_week is None:
+            first_week = self.first_shown
+        merges = [(1, 1, 1, self.width)]
+        for i in range(first_week, self.num_weeks + 1):
+            start_week_col = self.week_start(i) + 1
+            merges.append((2, start_week_col, 2, start_week_col + i + 1))
+            if i != 1:
+                merges.append((3, start_week_col + 2, 3, start_week_col + 1 + i))
+        return merges
+
+    def border_role(self, row: int, column: int) -> str:
+        """
+        :param row: 1 indexed row
+        :param column: 0 indexed column
+        :return: key into BORDER_SIDES for this cell
+        """
+        if row <= 2:
+            return "box"
+        if row == self.height:
+            row_kind = "last"
+        elif row == 3:
+            row_kind = "header"
+        else:
+            row_kind = "body"
+        if column == 0:
+            return row_kind + "_left"
+        elif column == self.width - 1:
+            return row_kind + "_right"
+        elif column in self.week_breaks:
+            return row_kind + "_left"
+        elif column + 1 in self.week_breaks:
+            return row_kind + "_right"
+        return row_kind + "_interior"
+
+
+class SummaryLayout(SummaryGrid):
+    """
+    The full standings graphic for one calculated series - every cell's value and style roles on top of the grid.
+    """
+
+    def __init__(self, series, series_name: str, window: int = None, entrant_header: str = "Driver") -> None:
+        """
+        :param series: A calculated and ready for printing series object
+        :param series_name: String of the series name for printing out in the title row
+        :param window: show only the blocks of this many latest weeks - every week if None. See SummaryGrid.
+        :param entrant_header: header of each week's names column - e.g. "Team" for a teams.TeamSeries
+        """
+        super().__init__(series.get_num_weeks(), series.get_num_drivers(), window)
+        self.series = series
+        self.series_name = series_name
+        self.entrant_header = entrant_header
+
+    def rows(self, first_week: int = None):
+        """
+        Generate the grid one row at a time.
+
+        :param first_week: only lay out the columns from this week's block on - the rows then start at that block's
+            left column rather than column 0. From the first shown week if None.
+        :return: generator of rows - each a list with one [value, font role, fill role, border role] per column. A None
+            font role is the default font.
+        """
+        if first_week is None:
+            first_week = self.first_shown
+        start = self.week_start(first_week)
+        for row in range(1, self.height + 1):
+            if row == 1:
+                font = "title"
+            elif row == 2:
+                font = "bold"
+            else:
+                font = None
+            cells = [[None, font, "white", self.border_role(row, column)] for column in range(start, self.width)]
+
+            if row == 1:
+                if start == 0:
+                    cells[0][0] = self.series_name
+            elif row == 2:
+                for week in range(first_week, self.num_weeks + 1):
+                    cells[self.week_start(week) - start][0] = "Week " + str(week)
+            elif row == 3:
+                for week in range(first_week, self.num_weeks + 1):
+                    cell_index = self.week_start(week) - start
+                    cells[cell_index][0] = self.entrant_header
+                    cells[cell_index + 1][0] = "Pts"
+                    cells[cell_index + 2][0] = "Finishes"
+            else:
+                self.fill_driver_row(cells, row - 3, first_week)
+            yield cells
+
+    def fill_driver_row(self, cells: list[list], driver_pos: int, first_week: int) -> None:
+        """
+        Write the name, points and finishes of the driver in driver_pos place for each week into a row of cells.
+
+        :param cells: row of cells as made in rows
+        :param driver_pos: standings position this row is for - 1 indexed
+        :param first_week: first week laid out in the row - cells[0] is the left of this week's block
+        """
+        start = self.week_start(first_week)
+        for week in range(first_week, self.num_weeks + 1):
+            index = week - 1
+            cell_index = self.week_start(week) - start
+            driver = self.series.weekly_sorted_drivers[index][driver_pos - 1]
+            cells[cell_index][0] = driver.name
+            if driver_pos <= len(MEDAL_FILLS):
+                cells[cell_index][2] = MEDAL_FILLS[driver_pos - 1]
+
+            cells[cell_index + 1][0] = driver.weekly_points[index]
+            cells[cell_index + 1][1] = MEDAL_FONTS.get(driver_pos, "black")
+
+            # finishes in week order - grey when dropped, otherwise podium colours or standard black
+            positions = sorted(driver.weekly_results[index], key=lambda y: y[0])
+            for i in range(len(positions)):
+                pos = positions[i]
+                cells[cell_index + 2 + i][0] = pos[2]
+                if pos[4] == 0:
+                    cells[cell_index + 2 + i][1] = "grey"
+                else:
+                    cells[cell_index + 2 + i][1] = MEDAL_FONTS.get(pos[1], "black")
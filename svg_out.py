@@ -0,0 +1,218 @@
+""" SVG / HTML output - streams each series' standings graphic from summary_layout straight to text, so a shareable
+picture of the standings doesn't need a workbook save and a screenshot from Excel. No spreadsheet library is involved -
+every element comes from the templates below, with the same colours as style_cache and the same merged ranges and
+border lines as the summary sheets.
+
+Column widths are worked out from the series up front (names, points and finishes lengths) so the rows can be written
+out one at a time as they are laid out."""
+import math
+import os
+from xml.sax.saxutils import escape
+
+import instrumentation
+import summary_layout
+
+# Pixel sizes - one character of the body font, the padding either side of a cell's text and the row heights
+CHAR_WIDTH = 8
+CELL_PADDING = 8
+ROW_HEIGHT = 22
+TITLE_HEIGHT = 30
+
+# Line widths of the border styles in summary_layout.BORDER_SIDES
+LINE_WIDTHS = {"medium": 2, "thin": 1}
+
+# Same colours as style_cache - text classes by font role (None is the default font) and background fills by fill role
+STYLESHEET = """text{font-family:Calibri,Arial,sans-serif;font-size:14px;text-anchor:middle;dominant-baseline:central}
+.title{font-size:19px;font-weight:bold}
+.bold,.black{font-weight:bold}
+.gold{font-weight:bold;fill:#ffc200}
+.silver{font-weight:bold;fill:#9a9a9a}
+.bronze{font-weight:bold;fill:#cd7f32}
+.grey{fill:#e6e6e6}
+line{stroke:#000}"""
+FILL_COLORS = {"gold": "#ffd700", "silver": "#c0c0c0", "bronze": "#cd7f32"}
+
+# The outer border lines are centred on the graphic's edges, so MARGIN pixels are added around it to show them whole
+MARGIN = 1
+SVG_START = ('<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="%d %d %d %d">\n'
+             '<style>%s</style>\n<rect x="%d" y="%d" width="%d" height="%d" fill="#fff"/>\n')
+SVG_END = "</svg>\n"
+RECT = '<rect x="%d" y="%d" width="%d" height="%d" fill="%s"/>\n'
+TEXT = '<text x="%.1f" y="%.1f"%s>%s</text>\n'
+LINE = '<line x1="%d" y1="%d" x2="%d" y2="%d" stroke-width="%d"/>\n'
+
+HTML_START = ('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>%s</title>\n'
+              '<style>body{font-family:Calibri,Arial,sans-serif} svg{display:block;margin:0 0 24px}</style>\n'
+              '</head>\n<body>\n')
+HTML_END = "</body>\n</html>\n"
+
+# HTML page title unless given one
+DEFAULT_TITLE = "Championship standings"
+
+
+def text_width(text: str) -> int:
+    """
+    :param text: cell text
+    :return: pixel width of a column that fits it
+    """
+    return len(text) * CHAR_WIDTH + 2 * CELL_PADDING
+
+
+class SvgGraphic(object):
+    """
+    One series' standings graphic as SVG - the column and row positions for a layout and the element text for each
+    of its rows.
+    """
+
+    def __init__(self, layout: summary_layout.SummaryLayout) -> None:
+        """
+        :param layout: SummaryLayout of a calculated series
+        """
+        self.layout = layout
+        series = layout.series
+        name_width = max([text_width("Driver")] + [text_width(str(driver.name)) for driver in series.drivers])
+        points_width = max([text_width("Pts")] + [text_width(str(driver.weekly_points[-1]))
+                                                  for driver in series.drivers if len(driver.weekly_points)])
+        finish_width = max([text_width("20th")] + [text_width(position) for driver in series.drivers
+                                                   for position in driver.print_positions])
+
+        # 0 indexed column: left x, with one more entry for the right edge of the last column
+        widths = []
+        for week in range(layout.first_shown, layout.num_weeks + 1):
+            # a week's finishes columns share the "Finishes" header so together they must fit it
+            week_finish_width = max(finish_width, math.ceil(text_width("Finishes") / week))
+            widths.extend([name_width, points_width] + [week_finish_width] * week)
+        self.column_x = [0]
+        for width in widths:
+            self.column_x.append(self.column_x[-1] + width)
+        self.row_y = [0, 0, TITLE_HEIGHT]
+        for row in range(2, layout.height + 1):
+            self.row_y.append(self.row_y[-1] + ROW_HEIGHT)
+        self.width = self.column_x[-1]
+        self.height = self.row_y[-1]
+
+        # 1 indexed (row, column) of each merged range's top left cell: last 1 indexed column, and every other cell
+        # inside a merged range
+        self.merge_ends = {}
+        self.covered = set()
+        for start_row, start_column, end_row, end_column in layout.merges():
+            self.merge_ends[(start_row, start_column)] = end_column
+            for column in range(start_column + 1, end_column + 1):
+                self.covered.add((start_row, column))
+
+    def lines(self):
+        """
+        Generate the SVG document a piece at a time - the opening tags, then each row's fills, text and border lines.
+
+        :return: generator of strings
+        """
+        width = self.width + 2 * MARGIN
+        height = self.height + 2 * MARGIN
+        yield SVG_START % (width, height, -MARGIN, -MARGIN, width, height, STYLESHEET, -MARGIN, -MARGIN, width, height)
+        for row_number, row in enumerate(self.layout.rows(), start=1):
+            yield "".join(self.row_elements(row_number, row))
+        yield SVG_END
+
+    def row_elements(self, row_number: int, row: list[list]):
+        """
+        :param row_number: 1 indexed row
+        :param row: layout row - one [value, font role, fill role, border role] per column
+        :return: generator of the row's element strings - fills, then the text and side lines, then the top and bottom
+            lines
+        """
+        top = self.row_y[row_number]
+        bottom = self.row_y[row_number + 1]
+        elements = []
+        # border side ("top" / "bottom"): list of [x1, x2, style] runs to draw as single lines
+        runs = {"top": [], "bottom": []}
+        for column, (value, font, fill, border) in enumerate(row, start=1):
+            if (row_number, column) in self.covered:
+                continue
+            end_column = self.merge_ends.get((row_number, column), column)
+            left_x = self.column_x[column - 1]
+            right_x = self.column_x[end_column]
+            if fill in FILL_COLORS:
+                yield RECT % (left_x, top, right_x - left_x, bottom - top, FILL_COLORS[fill])
+            if value is not None:
+                css_class = "" if font is None else ' class="%s"' % font
+                elements.append(TEXT % ((left_x + right_x) / 2, (top + bottom) / 2, css_class, escape(str(value))))
+
+            # a merged range takes its left, top and bottom lines from the top left cell and its right from the last
+            left, right, top_side, bottom_side = summary_layout.BORDER_SIDES[border]
+            if end_column != column:
+                right = summary_layout.BORDER_SIDES[row[end_column - 1][3]][1]
+            if left is not None:
+                elements.append(LINE % (left_x, top, left_x, bottom, LINE_WIDTHS[left]))
+            if right is not None:
+                elements.append(LINE % (right_x, top, right_x, bottom, LINE_WIDTHS[right]))
+            for side, style in (("top", top_side), ("bottom", bottom_side)):
+                if style is None:
+                    continue
+                side_runs = runs[side]
+                if side_runs and side_runs[-1][1] == left_x and side_runs[-1][2] == style:
+                    side_runs[-1][1] = right_x
+                else:
+                    side_runs.append([left_x, right_x, style])
+        yield from elements
+        for side, y in (("top", top), ("bottom", bottom)):
+            for x1, x2, style in runs[side]:
+                yield LINE % (x1, y, x2, y, LINE_WIDTHS[style])
+
+
+def write_svg(layout: summary_layout.SummaryLayout, file_path: str, stats: instrumentation.Stats = None) -> None:
+    """
+    Stream one series' standings graphic to an SVG file.
+
+    :param layout: SummaryLayout of a calculated series
+    :param file_path: path to save the SVG to
+    :param stats: instrumentation.Stats to time the graphic in
+    """
+    if stats is None:
+        stats = instrumentation.Stats()
+    with stats.stage("write_svg", layout.series.name):
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.writelines(SvgGraphic(layout).lines())
+
+
+def series_layouts(champ_wb) -> list[tuple[str, summary_layout.SummaryLayout]]:
+    """
+    :param champ_wb: ChampWorkBook that has already had calc_series run
+    :return: list of (summary sheet name, SummaryLayout) for each series, with the same titles and window as the
+        summary sheets
+    """
+    layouts = []
+    for i in range(len(champ_wb.series)):
+        summary_name = champ_wb.raw_data_sheets[i].replace(champ_wb.raw_str, champ_wb.summary_str)
+        layouts.append((summary_name, summary_layout.SummaryLayout(
+            champ_wb.series[i], champ_wb.raw_data_sheets[i][len(champ_wb.raw_str):], champ_wb.window)))
+    return layouts
+
+
+def save_svg(champ_wb, out_dir: str) -> None:
+    """
+    Write every series' standings graphic as <summary sheet name>.svg.
+
+    :param champ_wb: ChampWorkBook that has already had calc_series run
+    :param out_dir: directory to save the SVG files in - created if it doesn't exist
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for summary_name, layout in series_layouts(champ_wb):
+        write_svg(layout, os.path.join(out_dir, summary_name + ".svg"), champ_wb.stats)
+
+
+def save_html(champ_wb, file_path: str, title: str = None) -> None:
+    """
+    Write every series' standings graphic into one static HTML page, one after another.
+
+    :param champ_wb: ChampWorkBook that has already had calc_series run
+    :param file_path: path to save the HTML page to
+    :param title: page title - DEFAULT_TITLE if None
+    """
+    if title is None:
+        title = DEFAULT_TITLE
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(HTML_START % escape(title))
+        for summary_name, layout in series_layouts(champ_wb):
+            with champ_wb.stats.stage("write_svg", layout.series.name):
+                f.writelines(SvgGraphic(layout).lines())
+        f.write(HTML_END)
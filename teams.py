@@ -0,0 +1,111 @@
+""" Team (constructor) championship - each series' drivers grouped into teams, scored from the points the drivers
+already scored rather than by scoring the season again.
+
+A driver's team comes from the raw data sheet's team row (TEAM_LABEL in column A straight under the names) or failing
+that from the teams sheet - driver name, team name and optionally a series name (blank for every series) per row from
+row 2. Drivers without a team are left out.
+
+Each round a team scores the points of its best best_cars drivers (every driver if None) and is placed by those
+points, then by its best finish. The teams are then ranked through the same Driver machinery as the drivers - so the
+drop weeks and the tie-breaks (most points, best dropped places, name) are the same, and a team series lays out as a
+summary sheet just like a driver series."""
+import array
+
+from scoring import Driver, Series, counted_weeks
+
+# Sheet mapping drivers to teams for every raw data sheet without a team row
+TEAMS_SHEET = "teams"
+
+
+def read_teams_sheet(rows) -> dict:
+    """
+    :param rows: iterator of the teams sheet's rows of cell values from row 1 (the headers), as iter_rows(
+        values_only=True) gives
+    :return: dict of series name (None for every series): dict of driver name: team name
+    """
+    mapping = {}
+    next(rows, None)
+    for row in rows:
+        if len(row) < 2 or row[0] is None or row[1] is None:
+            continue
+        series_name = str(row[2]).strip() if len(row) > 2 and row[2] is not None else None
+        mapping.setdefault(series_name, {})[str(row[0]).strip()] = str(row[1]).strip()
+    return mapping
+
+
+def driver_teams(table, series_name: str, sheet_teams: dict = None) -> list:
+    """
+    :param table: scoring.ResultsTable of the raw data sheet
+    :param series_name: raw data sheet name without the prefix
+    :param sheet_teams: read_teams_sheet mapping - None if there is no teams sheet
+    :return: each driver's team name in column order - None for a driver without one
+    """
+    if table.teams is not None:
+        return [None if team is None else str(team).strip() for team in table.teams]
+    if not sheet_teams:
+        return [None] * len(table.names)
+    series_teams = sheet_teams.get(series_name, {})
+    every_series = sheet_teams.get(None, {})
+    teams = []
+    for name in table.names:
+        name = str(name).strip()
+        teams.append(series_teams.get(name, every_series.get(name)))
+    return teams
+
+
+class TeamSeries(Series):
+    """
+    The team championship of one calculated series. Its drivers are the teams (in order of their first driver's
+    column) and each team's results are its places in every round.
+    """
+
+    def __init__(self, series, teams: list, best_cars: int = None, stats=None) -> None:
+        """
+        :param series: A calculated (or loaded) driver series
+        :param teams: each of the series' drivers team name in column order - see driver_teams
+        :param best_cars: count only this many of a team's best scoring drivers each round - all of them if None
+        :param stats: instrumentation.Stats to time the sort into
+        """
+        super().__init__(None, series.drop_weeks, stats=stats, scoring_rules=series.rules)
+        self.name = series.name
+        self.series = series
+        self.best_cars = best_cars
+        # team name: indices of its drivers in the driver series
+        self.members = {}
+        for i in range(len(teams)):
+            if teams[i] is not None:
+                self.members.setdefault(teams[i], []).append(i)
+
+    def runcalc(self):
+        """
+        Total, place and rank the teams week by week from the drivers points and positions.
+        """
+        drivers = self.series.drivers
+        self.weeks = list(self.series.weeks)
+        num_weeks = len(self.weeks)
+        members = list(self.members.values())
+        points = [array.array("q") for team in members]
+        places = [[] for team in members]
+        for week in range(num_weeks):
+            best_finishes = []
+            for team in range(len(members)):
+                scores = sorted((drivers[i].points[week] for i in members[team]), reverse=True)
+                points[team].append(sum(scores[:self.best_cars]))
+                best_finishes.append(min(drivers[i].positions[week] for i in members[team]))
+            # most points then best finish - ties left in column order
+            order = sorted(range(len(members)), key=lambda y: (-points[y][week], best_finishes[y], y))
+            for place in range(len(order)):
+                places[order[place]].append(place + 1)
+
+        self.num_counted = counted_weeks(num_weeks, self.drop_weeks)
+        self.drivers = []
+        for team, name in enumerate(self.members):
+            driver = Driver(name, team + 3)
+            driver.read_results(places[team])
+            driver.points = points[team]
+            driver.rank_points(num_weeks, self.num_counted)
+            self.drivers.append(driver)
+        with self.stats.stage("sort_drivers", self.name):
+            for week in self.weeks:
+                self.sort_drivers(week)
+
@@ -0,0 +1,183 @@
+""" Raw data validation - one pass over each raw data sheet's values that reports every problem with its cell coordinate
+before anything is scored or formatted. Without it bad input only shows up late or not at all - a blank sheet fails an
+assert deep in the scoring, a position past the points table or a mistyped status code just scores 0, and any string
+finish sorts as position 1000."""
+import itertools
+
+import rules
+from rules import STATUS_CODES
+from scoring import TEAM_LABEL
+
+# Issues listed in a ValidationError's message - the rest are only counted
+MESSAGE_ISSUES = 20
+
+
+def get_column_letter(column: int) -> str:
+    """
+    :param column: 1 indexed column number
+    :return: its spreadsheet letters e.g. 1 -> "A", 28 -> "AB" - openpyxl's, imported here on first use so checking
+        results that came from somewhere else than a workbook (the standings service) doesn't load it
+    """
+    from openpyxl.utils.cell import get_column_letter as openpyxl_column_letter
+    return openpyxl_column_letter(column)
+
+
+class ValidationIssue(object):
+    """
+    One problem in a raw data sheet.
+    """
+
+    def __init__(self, sheet: str, coordinate: str, message: str) -> None:
+        """
+        :param sheet: raw data sheet name
+        :param coordinate: cell (e.g. "D5") or range (e.g. "C5:H5") the problem is in
+        :param message: what is wrong
+        """
+        self.sheet = sheet
+        self.coordinate = coordinate
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.sheet + "!" + self.coordinate + ": " + self.message
+
+
+def cell_issue(sheet: str, column: int, row: int, message: str, end_column: int = None) -> ValidationIssue:
+    """
+    :param sheet: raw data sheet name
+    :param column: 1 indexed column of the cell - the first of the range if end_column is given
+    :param row: 1 indexed row
+    :param message: what is wrong
+    :param end_column: 1 indexed last column of a range along the row - None for a single cell
+    :return: the issue
+    """
+    coordinate = get_column_letter(column) + str(row)
+    if end_column is not None:
+        coordinate += ":" + get_column_letter(end_column) + str(row)
+    return ValidationIssue(sheet, coordinate, message)
+
+
+class ValidationError(ValueError):
+    """
+    Raised for a workbook whose raw data sheets have any issues - all of them are in issues.
+    """
+
+    def __init__(self, issues: list[ValidationIssue]) -> None:
+        self.issues = issues
+        lines = [str(issue) for issue in issues[:MESSAGE_ISSUES]]
+        if len(issues) > MESSAGE_ISSUES:
+            lines.append("... and " + str(len(issues) - MESSAGE_ISSUES) + " more")
+        super().__init__(str(len(issues)) + " problem(s) in the raw data:\n" + "\n".join(lines))
+
+
+def validate_rows(sheet: str, rows, status_codes: tuple[str, ...] = STATUS_CODES) -> list[ValidationIssue]:
+    """
+    Check a raw data sheet is in the example layout - driver names along row 1 from column C, week numbers 1, 2, 3...
+    down column A from row 2 and a finishing position (1 to the number of drivers, each used at most once a week with no
+    gaps) or status code for every driver every week, optionally followed by bonus marks (see rules.MARKS) e.g. "1 FL".
+    A team row (TEAM_LABEL in column A) straight under the names pushes the weeks down to start at row 3.
+
+    :param sheet: raw data sheet name, for the issues
+    :param rows: iterator of the sheet's rows of cell values from row 1, as iter_rows(values_only=True) gives
+    :param status_codes: strings accepted in place of a finishing position
+    :return: list of every issue found, in sheet order - empty if the sheet is good
+    """
+    issues = []
+
+    def report(column: int, row: int, message: str, end_column: int = None) -> None:
+        issues.append(cell_issue(sheet, column, row, message, end_column))
+
+    header = next(rows, ())
+    names = []
+    for value in header[2:]:
+        if value is None:
+            break
+        names.append(value)
+    num_drivers = len(names)
+    if num_drivers == 0:
+        report(3, 1, "no driver names - they run along row 1 from column C")
+    for column in range(3 + num_drivers, len(header) + 1):
+        if header[column - 1] is not None:
+            report(column, 1, "driver name after a blank name cell - it and its results are ignored")
+
+    first_week_row = 2
+    first = next(rows, None)
+    if first is not None and len(first) != 0 and first[0] == TEAM_LABEL:
+        first_week_row = 3
+    elif first is not None:
+        rows = itertools.chain((first,), rows)
+
+    num_weeks = 0
+    ended = False
+    for row_number, row in enumerate(rows, start=first_week_row):
+        if ended or len(row) == 0 or row[0] is None:
+            ended = True
+            if any(value is not None for value in row):
+                report(1, row_number, "results below the first blank week cell are ignored")
+            continue
+
+        num_weeks += 1
+        if type(row[0]) is not int or row[0] != num_weeks:
+            report(1, row_number, "week " + repr(row[0]) + " should be " + str(num_weeks)
+                   + " - weeks run 1, 2, 3... down column A")
+        issues.extend(validate_week(sheet, row_number, row[2:2 + num_drivers], names, status_codes))
+
+        for column in range(3 + num_drivers, len(row) + 1):
+            if row[column - 1] is not None:
+                report(column, row_number, "result with no driver name above it is ignored")
+
+    if num_weeks == 0:
+        report(1, first_week_row, "no weeks - week numbers run down column A from row " + str(first_week_row))
+    return issues
+
+
+def validate_week(sheet: str, row_number: int, results, names: list,
+                  status_codes: tuple[str, ...] = STATUS_CODES) -> list[ValidationIssue]:
+    """
+    Check one week's results - a finishing position (1 to the number of drivers, each used at most once with no gaps)
+    or status code for every driver, optionally followed by bonus marks (see rules.MARKS).
+
+    :param sheet: raw data sheet name, for the issues
+    :param row_number: 1 indexed row the week is (or would be) on
+    :param results: the week's raw results in driver column order from column C - missing ones are taken as blank
+    :param names: driver names in column order
+    :param status_codes: strings accepted in place of a finishing position
+    :return: list of every issue found, in column order - empty if the week is good
+    """
+    issues = []
+    num_drivers = len(names)
+
+    def report(column: int, message: str, end_column: int = None) -> None:
+        issues.append(cell_issue(sheet, column, row_number, message, end_column))
+
+    # finishing position: column it was first seen in
+    finishes = {}
+    for column in range(3, 3 + num_drivers):
+        value = results[column - 3] if column - 3 < len(results) else None
+        name = repr(names[column - 3])
+        if isinstance(value, str):
+            value, marks = rules.parse_result(value)
+            unknown = [mark for mark in marks if mark not in rules.MARKS.values()]
+            if unknown:
+                report(column, "unknown bonus mark(s) " + ", ".join(map(repr, unknown)) + " for " + name
+                       + " - expected " + ", ".join(rules.MARKS.values()))
+        if value is None:
+            report(column, "no result for " + name)
+        elif type(value) is int:
+            if not 1 <= value <= num_drivers:
+                report(column, "position " + str(value) + " for " + name + " is outside 1 to " + str(num_drivers))
+            elif value in finishes:
+                report(column, "position " + str(value) + " for " + name + " is also given in "
+                       + get_column_letter(finishes[value]) + str(row_number))
+            else:
+                finishes[value] = column
+        elif isinstance(value, str):
+            if value not in status_codes:
+                report(column, "unknown status code " + repr(value) + " for " + name + " - expected "
+                       + "a finishing position or one of " + ", ".join(status_codes))
+        else:
+            report(column, repr(value) + " for " + name + " is not a finishing position or status code")
+    if finishes:
+        missing = [position for position in range(1, max(finishes) + 1) if position not in finishes]
+        if missing:
+            report(3, "finishing order skips position(s) " + ", ".join(map(str, missing)), 2 + num_drivers)
+    return issues